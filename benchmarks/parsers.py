@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark các hàm parse nguồn trên trang HTML mẫu (không cần mạng)
+Đo thời gian parse, bộ nhớ cấp phát (tracemalloc) và độ chính xác theo nguồn và backend
+
+Lưu ý: fixtures/*.html là trang tổng hợp viết tay theo cấu trúc bảng kết quả của từng
+nguồn, không phải trang tải về từ nguồn thật; biến thể "large" chỉ là trang nhỏ chèn
+thêm FILLER_BLOCK. Số liệu dùng để so sánh backend và phát hiện hồi quy, không phản ánh
+thời gian parse trang thật (trang thật có thể ghi lại bằng `python src/http_replay.py record`).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import lottery_collector
+from lottery_collector import LotteryCollector, make_soup
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+DATE_STR = '08/01/2025'
+BACKENDS = ('html.parser', 'lxml')
+
+# Khối nội dung phụ (tin tức, liên kết) để dựng trang lớn từ trang nhỏ
+FILLER_BLOCK = (
+    '<div class="news-item"><h3>Tin tức xổ số</h3>'
+    '<p>Chuyên mục tổng hợp tin tức, nhận định và thông tin liên quan đến xổ số kiến thiết.</p>'
+    '<ul><li><a href="/tin-tuc">Xem thêm tin tức</a></li><li><a href="/lien-he">Liên hệ</a></li></ul>'
+    '<table class="news-links"><tr><td>Chuyên mục</td><td>Xem chi tiết</td></tr></table></div>\n'
+)
+
+
+def expand_page(html: str, blocks: int) -> str:
+    """Chèn `blocks` khối nội dung phụ tổng hợp vào cuối body để giả lập trang lớn"""
+    index = html.rfind('</body>')
+    return html[:index] + FILLER_BLOCK * blocks + html[index:]
+
+
+@contextmanager
+def parser_backend(backend: str):
+    """Đổi backend mặc định của make_soup (dùng cho parser Selenium tự dựng soup)"""
+    previous = lottery_collector.HTML_PARSER
+    lottery_collector.HTML_PARSER = backend
+    try:
+        yield
+    finally:
+        lottery_collector.HTML_PARSER = previous
+
+
+def build_parsers() -> Dict[str, Callable[[str], Optional[Dict]]]:
+    """Hàm parse cho từng fixture: nhận HTML, trả về bản ghi hoặc None"""
+    collector = LotteryCollector()
+    parsers = {}
+    for source in collector.sources:
+        fixture = source['key']
+        tables_only = source.get('tables_only', False)
+        parsers[fixture] = (
+            lambda html, parse=source['parser'], tables_only=tables_only:
+            parse(make_soup(html, tables_only=tables_only), DATE_STR)
+        )
+
+    try:
+        from selenium_collector import SeleniumLotteryCollector
+    except ImportError:
+        print("⚠️  Selenium không được cài đặt, bỏ qua parser Selenium")
+        return parsers
+
+    # Không khởi tạo WebDriver: parser chỉ cần page source
+    selenium_collector = SeleniumLotteryCollector.__new__(SeleniumLotteryCollector)
+    parsers['xoso123'] = lambda html: selenium_collector._parse_xoso123(html, DATE_STR)
+    parsers['soicaumb'] = lambda html: selenium_collector._parse_soicaumb(html, DATE_STR)
+    return parsers
+
+
+def load_fixtures(large_blocks: int = 2000) -> List[Dict]:
+    """Tải các trang mẫu viết tay và kết quả mong đợi, kèm biến thể trang lớn chèn khối phụ"""
+    with open(FIXTURES_DIR / "expected.json", 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+
+    fixtures = []
+    for name, results in expected.items():
+        html = (FIXTURES_DIR / f"{name}.html").read_text(encoding='utf-8')
+        fixtures.append({'name': name, 'size': 'small', 'html': html, 'expected': results})
+        fixtures.append({'name': name, 'size': 'large', 'html': expand_page(html, large_blocks),
+                         'expected': results})
+    return fixtures
+
+
+def run_parser(parse: Callable[[str], Optional[Dict]], html: str, backend: str) -> Optional[Dict]:
+    """Chạy một lần parse với backend chỉ định"""
+    with parser_backend(backend):
+        return parse(html)
+
+
+def benchmark(parse: Callable[[str], Optional[Dict]], fixture: Dict, backend: str,
+              repeat: int = 5) -> Dict:
+    """Đo thời gian, bộ nhớ và kiểm tra kết quả của một parser trên một fixture"""
+    result = run_parser(parse, fixture['html'], backend)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_parser(parse, fixture['html'], backend)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run_parser(parse, fixture['html'], backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'source': fixture['name'],
+        'size': fixture['size'],
+        'bytes': len(fixture['html'].encode('utf-8')),
+        'backend': backend,
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'correct': bool(result) and result.get('results') == fixture['expected']
+    }
+
+
+def run_benchmarks(repeat: int = 5, backends=BACKENDS, sources: Optional[List[str]] = None,
+                   large_blocks: int = 2000) -> List[Dict]:
+    """Chạy benchmark cho mọi tổ hợp fixture × backend"""
+    parsers = build_parsers()
+    rows = []
+    for fixture in load_fixtures(large_blocks):
+        if fixture['name'] not in parsers or (sources and fixture['name'] not in sources):
+            continue
+        for backend in backends:
+            rows.append(benchmark(parsers[fixture['name']], fixture, backend, repeat))
+    return rows
+
+
+def main():
+    """Chạy benchmark và in bảng kết quả"""
+    parser = argparse.ArgumentParser(description="Benchmark parser nguồn XSMB trên HTML mẫu")
+    parser.add_argument('--repeat', type=int, default=5, help="Số lần đo mỗi tổ hợp")
+    parser.add_argument('--backend', nargs='+', default=list(BACKENDS), help="Backend BeautifulSoup")
+    parser.add_argument('--source', nargs='+', help="Chỉ chạy các nguồn này")
+    parser.add_argument('--large-blocks', type=int, default=2000, help="Số khối nội dung phụ của trang lớn")
+    parser.add_argument('--output', help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    rows = run_benchmarks(args.repeat, args.backend, args.source, args.large_blocks)
+
+    print(f"{'Nguồn':<14}{'Cỡ':<7}{'Bytes':>10}  {'Backend':<12}{'Median ms':>11}{'Min ms':>10}{'Peak KiB':>11}  Đúng")
+    for row in rows:
+        print(f"{row['source']:<14}{row['size']:<7}{row['bytes']:>10}  {row['backend']:<12}"
+              f"{row['median_ms']:>11}{row['min_ms']:>10}{row['peak_kib']:>11}  {'✅' if row['correct'] else '❌'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    return all(row['correct'] for row in rows)
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -5,7 +5,9 @@ Module phân tích dữ liệu xổ số miền Bắc
 Cung cấp các thống kê và phân tích pattern
 """
 
+import hashlib
 import json
+import numpy as np
 import pandas as pd
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
@@ -13,8 +15,296 @@ from typing import Dict, List, Optional, Tuple
 import structlog
 from pathlib import Path
 
+from data_validator import DataValidator, tet_break_ordinals
+from number_scoring import OnlineNumberScorer
+
 logger = structlog.get_logger()
 
+# Mã hóa số đầy đủ theo (số chữ số, giá trị) để '012' và '12' không bị gộp
+NUMBER_CODE_OFFSETS = {2: 0, 3: 100, 4: 1100, 5: 11100}
+NUMBER_CODE_SPACE = 111100
+
+WEEKDAY_LABELS = ['Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật']
+
+# Ký hiệu ngắn của các giải, dùng để đặt tên vị trí (ví dụ 'G3.4')
+PRIZE_SHORT_LABELS = {
+    'Giải Đặc Biệt': 'ĐB',
+    'Giải Nhất': 'G1',
+    'Giải Nhì': 'G2',
+    'Giải Ba': 'G3',
+    'Giải Tư': 'G4',
+    'Giải Năm': 'G5',
+    'Giải Sáu': 'G6',
+    'Giải Bảy': 'G7'
+}
+
+
+def encode_number(num_str: str) -> int:
+    """Mã hóa một số thành chỉ số trong không gian NUMBER_CODE_SPACE, -1 nếu không hợp lệ"""
+    offset = NUMBER_CODE_OFFSETS.get(len(num_str))
+    if offset is None or not num_str.isdigit():
+        return -1
+    return offset + int(num_str)
+
+
+def decode_number(code: int) -> str:
+    """Giải mã chỉ số về chuỗi số với đúng số chữ số ban đầu"""
+    for digits in (5, 4, 3, 2):
+        offset = NUMBER_CODE_OFFSETS[digits]
+        if code >= offset:
+            return f"{code - offset:0{digits}d}"
+    raise ValueError(f"Mã số không hợp lệ: {code}")
+
+
+class CalendarGroupBy:
+    """Đếm số theo nhóm lịch (thứ, tháng, năm, ngày trong tháng)
+    
+    code_space='tail' đếm 2 số cuối vào mảng 100 phần tử mỗi bucket; 'number' giữ số
+    đầy đủ nên dùng Counter thưa theo mã (mỗi tháng chỉ vài nghìn số khác nhau trong
+    không gian NUMBER_CODE_SPACE). Số không hợp lệ được đếm riêng và vẫn tính vào
+    total_numbers.
+    """
+    
+    DIMENSIONS = {
+        'weekday': lambda d: d.weekday(),
+        'month': lambda d: d.month,
+        'year': lambda d: d.year,
+        'day_of_month': lambda d: d.day,
+        'year_month': lambda d: d.strftime('%Y-%m'),
+    }
+    
+    def __init__(self, dimensions: Tuple[str, ...] = ('weekday', 'month', 'year', 'day_of_month'),
+                 code_space: str = 'tail'):
+        unknown = [dim for dim in dimensions if dim not in self.DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Nhóm lịch không hỗ trợ: {unknown}")
+        if code_space not in ('tail', 'number'):
+            raise ValueError(f"Không gian mã không hỗ trợ: {code_space}")
+        
+        self.dimensions = tuple(dimensions)
+        self.code_space = code_space
+        self.bins = 100 if code_space == 'tail' else NUMBER_CODE_SPACE
+        
+        # dimension -> bucket -> mảng 100 phần tử ('tail') hoặc Counter theo mã ('number')
+        self.counts = {dim: {} for dim in self.dimensions}
+        self.draws = {dim: Counter() for dim in self.dimensions}
+        self.invalid = {dim: Counter() for dim in self.dimensions}
+    
+    def _encode(self, numbers: List) -> Tuple[np.ndarray, int]:
+        """Chuyển danh sách số của một kỳ quay thành mảng mã và số lượng số không hợp lệ"""
+        codes = []
+        for num in numbers:
+            num_str = str(num)
+            if self.code_space == 'tail':
+                if len(num_str) >= 2 and num_str.isdigit():
+                    codes.append(int(num_str[-2:]))
+            else:
+                code = encode_number(num_str)
+                if code >= 0:
+                    codes.append(code)
+        return np.asarray(codes, dtype=np.int64), len(numbers) - len(codes)
+    
+    def add_draw(self, date_obj: datetime, numbers: List) -> None:
+        """Cộng dồn một kỳ quay vào các bucket tương ứng"""
+        codes, invalid = self._encode(numbers)
+        draw_counts = Counter(codes.tolist()) if self.code_space == 'number' else None
+        
+        for dim in self.dimensions:
+            bucket = self.DIMENSIONS[dim](date_obj)
+            counts = self.counts[dim].get(bucket)
+            if draw_counts is not None:
+                if counts is None:
+                    counts = self.counts[dim][bucket] = Counter()
+                counts.update(draw_counts)
+            else:
+                if counts is None:
+                    counts = self.counts[dim][bucket] = np.zeros(self.bins, dtype=np.int32)
+                np.add.at(counts, codes, 1)
+            self.draws[dim][bucket] += 1
+            self.invalid[dim][bucket] += invalid
+    
+    def add_record(self, record: Dict) -> bool:
+        """Cộng dồn một bản ghi xổ số, trả về False nếu ngày không hợp lệ"""
+        try:
+            date_obj = datetime.strptime(record['date'], '%d/%m/%Y')
+        except (KeyError, TypeError, ValueError):
+            return False
+        
+        numbers = []
+        for prize_numbers in record.get('results', {}).values():
+            if isinstance(prize_numbers, list):
+                numbers.extend(prize_numbers)
+        
+        self.add_draw(date_obj, numbers)
+        return True
+    
+    def add_records(self, records: List[Dict]) -> int:
+        """Cộng dồn nhiều bản ghi, trả về số bản ghi đã thêm"""
+        return sum(1 for record in records if self.add_record(record))
+    
+    def buckets(self, dimension: str) -> List:
+        """Danh sách bucket đã có dữ liệu của một nhóm"""
+        return sorted(self.counts[dimension])
+    
+    def distribution(self, dimension: str, bucket, normalize: bool = False) -> np.ndarray:
+        """Phân bố số lần xuất hiện (số hợp lệ) trong một bucket, dạng mảng self.bins phần tử"""
+        counts = self.counts[dimension].get(bucket)
+        dense = np.zeros(self.bins, dtype=np.int32)
+        if isinstance(counts, Counter):
+            if counts:
+                dense[list(counts)] = list(counts.values())
+        elif counts is not None:
+            dense[:] = counts
+        if normalize:
+            total = dense.sum()
+            return dense / total if total else dense.astype(float)
+        return dense
+    
+    def top_k(self, dimension: str, bucket, k: int = 5) -> List[Tuple[str, int]]:
+        """Top k số xuất hiện nhiều nhất trong một bucket (hòa thì số nhỏ trước)"""
+        counts = self.counts[dimension].get(bucket)
+        if counts is None:
+            return []
+        
+        if isinstance(counts, Counter):
+            order = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+            return [(decode_number(code), count) for code, count in order]
+        
+        nonzero = np.flatnonzero(counts)
+        order = nonzero[np.lexsort((nonzero, -counts[nonzero]))][:k]
+        return [(f"{code:02d}", int(counts[code])) for code in order]
+    
+    def bucket_summary(self, dimension: str, bucket, k: int = 5) -> Dict:
+        """Thống kê tổng hợp của một bucket"""
+        counts = self.counts[dimension][bucket]
+        if isinstance(counts, Counter):
+            valid, unique = sum(counts.values()), len(counts)
+        else:
+            valid, unique = int(counts.sum()), int(np.count_nonzero(counts))
+        invalid = self.invalid[dimension][bucket]
+        return {
+            'draws_count': self.draws[dimension][bucket],
+            'total_numbers': valid + invalid,
+            'invalid_numbers': invalid,
+            'unique_numbers': unique,
+            'most_common': self.top_k(dimension, bucket, k)
+        }
+
+
+class SlotLayout:
+    """Bố cục cố định 27 vị trí của kết quả XSMB, dựng từ quy tắc validation"""
+    
+    def __init__(self, validation_rules: Dict[str, Dict]):
+        self.prizes = list(validation_rules)
+        self.prize_slices = {}
+        self.prize_digits = {prize: rule['digits'] for prize, rule in validation_rules.items()}
+        self.labels = []
+        digits = []
+        
+        start = 0
+        for prize, rule in validation_rules.items():
+            count = rule['count']
+            self.prize_slices[prize] = slice(start, start + count)
+            short = PRIZE_SHORT_LABELS.get(prize, prize)
+            self.labels.extend(
+                [short] if count == 1 else [f"{short}.{i + 1}" for i in range(count)]
+            )
+            digits.extend([rule['digits']] * count)
+            start += count
+        
+        self.size = start
+        self.digits = np.asarray(digits, dtype=np.int64)
+
+
+class DrawTable:
+    """Kết quả quay thưởng dạng mảng số nguyên (số bản ghi × số vị trí), -1 là thiếu
+    
+    `invalid` đếm số bị bỏ của từng bản ghi theo giải (sai định dạng hoặc thừa so với
+    bố cục); `unknown` giữ nguyên văn các giải không có trong bố cục, theo chỉ số bản ghi.
+    """
+    
+    def __init__(self, dates: List[str], day_ids: np.ndarray, numbers: np.ndarray, layout: SlotLayout,
+                 invalid: Optional[np.ndarray] = None,
+                 unknown: Optional[Dict[int, Dict[str, List[str]]]] = None):
+        self.dates = dates
+        self.day_ids = day_ids
+        self.numbers = numbers
+        self.layout = layout
+        self.invalid = invalid if invalid is not None else np.zeros(
+            (len(day_ids), len(layout.prizes)), dtype=np.int32)
+        self.unknown = unknown or {}
+        
+        self._ordinals = None
+        self._draw_index = None
+        self._fingerprint = None
+        self._primary_rows = None
+    
+    @property
+    def ordinals(self) -> np.ndarray:
+        """Số thứ tự ngày (date ordinal) của từng ngày trong bảng"""
+        if self._ordinals is None:
+            self._ordinals = np.asarray(
+                [datetime.strptime(date, '%d/%m/%Y').toordinal() for date in self.dates],
+                dtype=np.int64
+            )
+        return self._ordinals
+    
+    @property
+    def draw_index(self) -> np.ndarray:
+        """Số thứ tự kỳ quay theo lịch của từng ngày: ordinal trừ số ngày nghỉ Tết trước đó
+        
+        Hai ngày đã lưu là hai kỳ liên tiếp khi chênh nhau đúng 1; chênh lớn hơn nghĩa là
+        thiếu dữ liệu ở giữa (kỳ nghỉ Tết không tính là thiếu).
+        """
+        if self._draw_index is None:
+            ordinals = self.ordinals
+            if ordinals.size:
+                tet = tet_break_ordinals(int(ordinals[0]), int(ordinals[-1]))
+                self._draw_index = ordinals - np.searchsorted(tet, ordinals)
+            else:
+                self._draw_index = ordinals.copy()
+        return self._draw_index
+    
+    def draw_gaps(self) -> np.ndarray:
+        """Số kỳ quay giữa hai ngày liên tiếp trong bảng (1 = liền nhau)"""
+        return np.diff(self.draw_index)
+    
+    @property
+    def fingerprint(self) -> str:
+        """Dấu vân tay nội dung bảng, dùng làm khóa cache cho các phân tích nặng"""
+        if self._fingerprint is None:
+            digest = hashlib.sha1('|'.join(self.dates).encode('utf-8'))
+            digest.update(self.day_ids.tobytes())
+            digest.update(np.ascontiguousarray(self.numbers).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+    
+    @property
+    def primary_rows(self) -> np.ndarray:
+        """Chỉ số một bản ghi đại diện cho mỗi ngày (theo thứ tự ngày)
+        
+        Ngày có nhiều nguồn chỉ được đếm một lần: chọn bản ghi có nhiều số hợp lệ
+        nhất, hòa thì lấy bản ghi đầu tiên.
+        """
+        if self._primary_rows is None:
+            valid_counts = (self.numbers >= 0).sum(axis=1)
+            order = np.lexsort((np.arange(len(self.day_ids)), -valid_counts, self.day_ids))
+            _, first = np.unique(self.day_ids[order], return_index=True)
+            self._primary_rows = order[first]
+        return self._primary_rows
+    
+    def prize_columns(self, prize: str) -> np.ndarray:
+        """Các cột của một giải"""
+        return self.numbers[:, self.layout.prize_slices[prize]]
+    
+    def first_row_per_day(self, column: int) -> np.ndarray:
+        """Giá trị của cột tại bản ghi hợp lệ đầu tiên mỗi ngày, -1 nếu ngày đó thiếu"""
+        values = np.full(len(self.dates), -1, dtype=np.int64)
+        valid = np.flatnonzero(self.numbers[:, column] >= 0)
+        days, first = np.unique(self.day_ids[valid], return_index=True)
+        values[days] = self.numbers[valid[first], column]
+        return values
+
 
 class LotteryAnalytics:
     """Phân tích dữ liệu xổ số miền Bắc"""
@@ -24,6 +314,17 @@ class LotteryAnalytics:
         self.json_file = self.data_dir / "lottery-results.json"
         self.analytics_file = self.data_dir / "analytics-report.json"
         
+        # Bố cục 27 vị trí lấy từ quy tắc validation
+        self.layout = SlotLayout(DataValidator(data_dir).validation_rules)
+        
+        # Cache kết quả sắp xếp theo ngày: (danh sách gốc, độ dài, danh sách đã sắp xếp)
+        self._sorted_cache = None
+        self._table_cache = None
+        
+        # Cache ma trận chuyển trạng thái theo (dấu vân tay dữ liệu, tham số)
+        self._transition_cache = {}
+        self._transition_cache_size = 32
+        
     def load_data(self) -> List[Dict]:
         """Tải dữ liệu từ file JSON"""
         try:
@@ -87,35 +388,94 @@ class LotteryAnalytics:
         }
     
     def analyze_by_prize(self, data: List[Dict]) -> Dict:
-        """Phân tích theo từng loại giải"""
-        prize_analysis = {}
+        """Phân tích theo từng loại giải (mỗi ngày một bản ghi đại diện)
         
-        for record in data:
-            results = record.get('results', {})
-            for prize, numbers in results.items():
-                if prize not in prize_analysis:
-                    prize_analysis[prize] = []
-                
-                if isinstance(numbers, list):
-                    prize_analysis[prize].extend([str(num) for num in numbers])
+        Số sai định dạng vẫn tính vào total_numbers và được báo trong invalid_numbers;
+        giải không thuộc bố cục 27 vị trí được đếm theo nguyên văn như trước.
+        """
+        table = self.build_draw_table(self.sort_by_date(data))
+        rows = table.primary_rows
+        numbers = table.numbers[rows]
+        invalid_counts = table.invalid[rows].sum(axis=0)
         
-        # Phân tích tần suất cho từng giải
         result = {}
-        for prize, numbers in prize_analysis.items():
-            if numbers:
-                frequency = Counter(numbers)
-                total = len(numbers)
-                
-                result[prize] = {
-                    'total_numbers': total,
-                    'unique_numbers': len(frequency),
-                    'most_common': [
-                        {'number': num, 'count': count,
-                         'percentage': round((count / total) * 100, 2)}
-                        for num, count in frequency.most_common(5)
-                    ],
-                    'average_frequency': round(total / len(frequency), 2) if frequency else 0
-                }
+        for index, prize in enumerate(self.layout.prizes):
+            columns = numbers[:, self.layout.prize_slices[prize]]
+            values = columns[columns >= 0]
+            invalid = int(invalid_counts[index])
+            if not values.size and not invalid:
+                continue
+            
+            digits = self.layout.prize_digits[prize]
+            frequency = np.bincount(values, minlength=10 ** digits)
+            total = int(values.size) + invalid
+            unique = int(np.count_nonzero(frequency))
+            
+            seen = np.flatnonzero(frequency)
+            top = seen[np.lexsort((seen, -frequency[seen]))][:5]
+            
+            result[prize] = {
+                'total_numbers': total,
+                'invalid_numbers': invalid,
+                'unique_numbers': unique,
+                'most_common': [
+                    {'number': f"{num:0{digits}d}", 'count': int(frequency[num]),
+                     'percentage': round((frequency[num] / total) * 100, 2)}
+                    for num in top
+                ],
+                'average_frequency': round(total / unique, 2) if unique else 0
+            }
+        
+        # Giải lạ: đếm nguyên văn trên các bản ghi đại diện
+        unknown = defaultdict(Counter)
+        for row in rows.tolist():
+            for prize, prize_numbers in table.unknown.get(row, {}).items():
+                unknown[prize].update(prize_numbers)
+        for prize, frequency in unknown.items():
+            total = sum(frequency.values())
+            if not total:
+                continue
+            result[prize] = {
+                'total_numbers': total,
+                'invalid_numbers': 0,
+                'unique_numbers': len(frequency),
+                'most_common': [
+                    {'number': num, 'count': count,
+                     'percentage': round((count / total) * 100, 2)}
+                    for num, count in frequency.most_common(5)
+                ],
+                'average_frequency': round(total / len(frequency), 2)
+            }
+        
+        return result
+    
+    def analyze_slots(self, data: List[Dict], top_n: int = 3) -> Dict:
+        """Thống kê lô theo từng vị trí cố định (ví dụ 'G3.4'), mỗi ngày một bản ghi"""
+        table = self.build_draw_table(self.sort_by_date(data))
+        numbers = table.numbers[table.primary_rows]
+        valid = numbers >= 0
+        
+        # Đếm lô cho cả 27 vị trí cùng lúc: mã = vị trí * 100 + 2 số cuối
+        slot_index = np.broadcast_to(np.arange(self.layout.size), numbers.shape)
+        codes = slot_index[valid] * 100 + numbers[valid] % 100
+        counts = np.bincount(codes, minlength=self.layout.size * 100).reshape(self.layout.size, 100)
+        draws = valid.sum(axis=0)
+        
+        result = {}
+        for slot, label in enumerate(self.layout.labels):
+            if not draws[slot]:
+                continue
+            row = counts[slot]
+            seen = np.flatnonzero(row)
+            top = seen[np.lexsort((seen, -row[seen]))][:top_n]
+            result[label] = {
+                'draws': int(draws[slot]),
+                'unique_tails': int(seen.size),
+                'most_common_tails': [
+                    {'number': f"{num:02d}", 'count': int(row[num])}
+                    for num in top
+                ]
+            }
         
         return result
     
@@ -165,57 +525,388 @@ class LotteryAnalytics:
         
         return patterns
     
-    def analyze_time_trends(self, data: List[Dict]) -> Dict:
-        """Phân tích xu hướng theo thời gian"""
-        if not data:
-            return {'error': 'Không có dữ liệu'}
+    def sort_by_date(self, data: List[Dict]) -> List[Dict]:
+        """Sắp xếp bản ghi theo ngày, dùng lại kết quả nếu cùng danh sách đầu vào"""
+        cached = self._sorted_cache
+        if cached is not None and cached[0] is data and cached[1] == len(data):
+            return cached[2]
         
-        # Sắp xếp theo ngày
         sorted_data = sorted(
             data,
             key=lambda x: datetime.strptime(x.get('date', '01/01/1900'), '%d/%m/%Y')
         )
+        # Giữ tham chiếu tới danh sách gốc để phép so sánh `is` luôn an toàn
+        self._sorted_cache = (data, len(data), sorted_data)
+        return sorted_data
+    
+    def analyze_time_trends(self, data: List[Dict]) -> Dict:
+        """Phân tích xu hướng theo thời gian"""
+        if not data:
+            return {'error': 'Không có dữ liệu'}
         
-        # Phân tích theo tháng
-        monthly_stats = defaultdict(lambda: {'count': 0, 'numbers': []})
+        # Sắp xếp theo ngày, mỗi ngày một bản ghi
+        sorted_data = self.sort_by_date(data)
+        daily = self.records_per_day(sorted_data)
         
-        for record in sorted_data:
-            try:
-                date_obj = datetime.strptime(record['date'], '%d/%m/%Y')
-                month_key = date_obj.strftime('%Y-%m')
-                
-                monthly_stats[month_key]['count'] += 1
-                
-                # Thu thập số cho tháng này
-                results = record.get('results', {})
-                for numbers in results.values():
-                    if isinstance(numbers, list):
-                        monthly_stats[month_key]['numbers'].extend([str(n) for n in numbers])
-                        
-            except ValueError:
-                continue
+        # Phân tích theo tháng: đếm trực tiếp vào mảng bin thay vì giữ danh sách số
+        monthly_stats = CalendarGroupBy(dimensions=('year_month',), code_space='number')
+        monthly_stats.add_records(daily)
         
         # Tính thống kê cho từng tháng
         monthly_analysis = {}
-        for month, stats in monthly_stats.items():
-            if stats['numbers']:
-                frequency = Counter(stats['numbers'])
-                monthly_analysis[month] = {
-                    'draws_count': stats['count'],
-                    'total_numbers': len(stats['numbers']),
-                    'unique_numbers': len(frequency),
-                    'most_common': frequency.most_common(3)
-                }
+        for month in monthly_stats.buckets('year_month'):
+            stats = monthly_stats.bucket_summary('year_month', month, k=3)
+            if stats['total_numbers']:
+                monthly_analysis[month] = stats
         
         return {
             'date_range': {
                 'earliest': sorted_data[0]['date'],
                 'latest': sorted_data[-1]['date']
             },
-            'total_draws': len(sorted_data),
+            'total_draws': len(daily),
             'monthly_analysis': monthly_analysis
         }
     
+    def build_draw_table(self, sorted_data: List[Dict]) -> DrawTable:
+        """Chuyển bản ghi đã sắp xếp thành bảng số nguyên theo bố cục 27 vị trí
+        
+        Số không đúng định dạng (không phải chữ số hoặc sai độ dài) được coi là thiếu và
+        được đếm vào DrawTable.invalid; giải lạ được giữ trong DrawTable.unknown.
+        """
+        cached = self._table_cache
+        if cached is not None and cached[0] is sorted_data and cached[1] == len(sorted_data):
+            return cached[2]
+        
+        layout = self.layout
+        prize_slots = {
+            prize: (layout.prize_slices[prize].start, layout.prize_slices[prize].stop,
+                    layout.prize_digits[prize])
+            for prize in layout.prizes
+        }
+        
+        prize_index = {prize: i for i, prize in enumerate(layout.prizes)}
+        
+        dates = []
+        day_ids = []
+        flat = []
+        invalid = np.zeros((len(sorted_data), len(layout.prizes)), dtype=np.int32)
+        unknown = {}
+        
+        for index, record in enumerate(sorted_data):
+            date = record.get('date')
+            if not dates or dates[-1] != date:
+                dates.append(date)
+            day_ids.append(len(dates) - 1)
+            
+            row = [-1] * layout.size
+            for prize, numbers in record.get('results', {}).items():
+                if not isinstance(numbers, list):
+                    continue
+                slot = prize_slots.get(prize)
+                if slot is None:
+                    unknown.setdefault(index, {})[prize] = [str(num) for num in numbers]
+                    continue
+                start, stop, digits = slot
+                dropped = max(len(numbers) - (stop - start), 0)
+                for offset, num in enumerate(numbers[:stop - start]):
+                    num_str = str(num)
+                    if len(num_str) == digits and num_str.isdigit():
+                        row[start + offset] = int(num_str)
+                    else:
+                        dropped += 1
+                invalid[index, prize_index[prize]] = dropped
+            flat.extend(row)
+        
+        numbers = np.asarray(flat, dtype=np.int32).reshape(len(day_ids), layout.size)
+        table = DrawTable(dates, np.asarray(day_ids, dtype=np.int64), numbers, layout,
+                          invalid=invalid, unknown=unknown)
+        
+        self._table_cache = (sorted_data, len(sorted_data), table)
+        return table
+    
+    def records_per_day(self, sorted_data: List[Dict]) -> List[Dict]:
+        """Bản ghi đại diện của mỗi ngày (DrawTable.primary_rows) theo thứ tự ngày"""
+        table = self.build_draw_table(sorted_data)
+        return [sorted_data[row] for row in table.primary_rows.tolist()]
+    
+    def build_tail_counts(self, sorted_data: List[Dict]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Đếm số lần về (số ngày × 100) của 2 số cuối và lô giải đặc biệt theo ngày"""
+        table = self.build_draw_table(sorted_data)
+        # Mỗi ngày một bản ghi: hàng thứ i là ngày thứ i
+        numbers = table.numbers[table.primary_rows]
+        valid = numbers >= 0
+        
+        rows = np.broadcast_to(np.arange(len(table.dates))[:, None], numbers.shape)[valid]
+        counts = np.zeros((len(table.dates), 100), dtype=np.int32)
+        np.add.at(counts, (rows, numbers[valid] % 100), 1)
+        
+        # Nhiều nguồn cùng ngày: giữ giải đặc biệt của bản ghi đầu tiên
+        special = table.first_row_per_day(self.layout.prize_slices['Giải Đặc Biệt'].start)
+        special_tails = np.where(special >= 0, special % 100, -1)
+        
+        return table.dates, counts, special_tails
+    
+    def special_tail_transitions(self, data: List[Dict], order: int = 1, key: str = 'number',
+                                 half_life: Optional[float] = None,
+                                 max_gap_days: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Ma trận chuyển trạng thái của lô giải đặc biệt giữa các kỳ quay liên tiếp
+        
+        key='number' dùng cả 2 số cuối (100 trạng thái), 'head'/'tail' dùng chữ số
+        hàng chục/hàng đơn vị (10 trạng thái). Với order=k, trạng thái là k kỳ trước đó
+        nên ma trận có kích thước (alphabet^k × alphabet). half_life (ngày) bật chế độ
+        giảm trọng số theo hàm mũ tính từ kỳ quay mới nhất. Hai ngày cách nhau quá
+        max_gap_days kỳ quay (DrawTable.draw_gaps, không tính nghỉ Tết) không được coi là
+        liên tiếp; mặc định 1 nên dùng cùng quy tắc với analyze_streaks.
+        
+        Trả về (ma trận trọng số, ma trận xác suất đã chuẩn hóa theo hàng).
+        """
+        if key not in ('number', 'head', 'tail'):
+            raise ValueError(f"Khóa trạng thái không hỗ trợ: {key}")
+        if order < 1:
+            raise ValueError(f"Bậc Markov phải >= 1: {order}")
+        
+        table = self.build_draw_table(self.sort_by_date(data))
+        cache_key = (table.fingerprint, order, key, half_life, max_gap_days)
+        cached = self._transition_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        special = table.first_row_per_day(self.layout.prize_slices['Giải Đặc Biệt'].start)
+        tails = np.where(special >= 0, special % 100, -1)
+        if key == 'head':
+            symbols = np.where(tails >= 0, tails // 10, -1)
+        elif key == 'tail':
+            symbols = np.where(tails >= 0, tails % 10, -1)
+        else:
+            symbols = tails
+        alphabet = 100 if key == 'number' else 10
+        
+        n_states = alphabet ** order
+        weights = np.zeros((n_states, alphabet), dtype=np.float64)
+        
+        n_pairs = len(symbols) - order
+        if n_pairs > 0:
+            ordinals = table.ordinals
+            # Cửa sổ trượt (order + 1) kỳ: đủ dữ liệu và không có khoảng trống quá lớn
+            windows = np.lib.stride_tricks.sliding_window_view(symbols, order + 1)
+            gaps = np.lib.stride_tricks.sliding_window_view(table.draw_gaps(), order)
+            valid = (windows >= 0).all(axis=1) & (gaps <= max_gap_days).all(axis=1)
+            
+            windows = windows[valid]
+            powers = alphabet ** np.arange(order - 1, -1, -1)
+            states = windows[:, :order] @ powers
+            targets = windows[:, order]
+            
+            if half_life:
+                ages = ordinals[-1] - ordinals[order:][valid]
+                pair_weights = np.power(0.5, ages / half_life)
+            else:
+                pair_weights = np.ones(len(targets))
+            
+            np.add.at(weights, (states, targets), pair_weights)
+        
+        row_sums = weights.sum(axis=1, keepdims=True)
+        probabilities = np.divide(weights, row_sums, out=np.zeros_like(weights), where=row_sums > 0)
+        
+        if len(self._transition_cache) >= self._transition_cache_size:
+            self._transition_cache.pop(next(iter(self._transition_cache)))
+        self._transition_cache[cache_key] = (weights, probabilities)
+        
+        return weights, probabilities
+    
+    def analyze_transitions(self, data: List[Dict], half_life: Optional[float] = 90,
+                            top_n: int = 5) -> Dict:
+        """Dự báo lô giải đặc biệt kỳ sau dựa trên ma trận chuyển trạng thái bậc 1"""
+        if not data:
+            return {'error': 'Không có dữ liệu'}
+        
+        table = self.build_draw_table(self.sort_by_date(data))
+        special = table.first_row_per_day(self.layout.prize_slices['Giải Đặc Biệt'].start)
+        if special[-1] < 0:
+            return {'error': 'Kỳ quay mới nhất không có giải đặc biệt'}
+        
+        current = int(special[-1] % 100)
+        result = {'current_tail': f"{current:02d}", 'half_life_days': half_life}
+        
+        for key, state in (('number', current), ('head', current // 10), ('tail', current % 10)):
+            weights, probabilities = self.special_tail_transitions(data, key=key, half_life=half_life)
+            row = probabilities[state]
+            seen = np.flatnonzero(row)
+            top = seen[np.lexsort((seen, -row[seen]))][:top_n]
+            width = 2 if key == 'number' else 1
+            result[key] = {
+                'observed_transitions': round(float(weights[state].sum()), 4),
+                'most_likely_next': [
+                    {'value': f"{value:0{width}d}", 'probability': round(float(row[value]), 4)}
+                    for value in top
+                ]
+            }
+        
+        return result
+    
+    def _table_tails_in_range(self, data: List[Dict], start_date: Optional[str],
+                              end_date: Optional[str]) -> Tuple[DrawTable, np.ndarray, np.ndarray, np.ndarray]:
+        """Lấy các ngày trong khoảng [start_date, end_date] cùng chỉ số ngày và 2 số cuối hợp lệ
+        
+        Mỗi ngày chỉ dùng bản ghi đại diện (DrawTable.primary_rows) để ngày có nhiều
+        nguồn không bị đếm nhiều lần.
+        """
+        table = self.build_draw_table(self.sort_by_date(data))
+        
+        in_range = np.ones(len(table.dates), dtype=bool)
+        if start_date:
+            in_range &= table.ordinals >= datetime.strptime(start_date, '%d/%m/%Y').toordinal()
+        if end_date:
+            in_range &= table.ordinals <= datetime.strptime(end_date, '%d/%m/%Y').toordinal()
+        
+        # Đánh lại chỉ số ngày trong khoảng (0..số ngày-1); ngày ngoài khoảng = -1
+        row_days = np.cumsum(in_range) - 1
+        row_days[~in_range] = -1
+        
+        numbers = table.numbers[table.primary_rows]
+        valid = (numbers >= 0) & (row_days >= 0)[:, None]
+        days = np.broadcast_to(row_days[:, None], numbers.shape)[valid]
+        
+        return table, np.flatnonzero(in_range), days, numbers[valid] % 100
+    
+    def head_tail_matrix(self, data: List[Dict], start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> np.ndarray:
+        """Ma trận đầu/đuôi 10×10 của lô trong khoảng ngày: [đầu, đuôi] = số lần về"""
+        _, _, _, tails = self._table_tails_in_range(data, start_date, end_date)
+        return np.bincount(tails, minlength=100).reshape(10, 10)
+    
+    def head_tail_cube(self, data: List[Dict], start_date: Optional[str] = None,
+                       end_date: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+        """Ma trận đầu/đuôi theo từng ngày, dạng khối (số ngày × 10 × 10)"""
+        table, day_indexes, days, tails = self._table_tails_in_range(data, start_date, end_date)
+        n_days = len(day_indexes)
+        cube = np.bincount(days * 100 + tails, minlength=n_days * 100).reshape(n_days, 10, 10)
+        return [table.dates[i] for i in day_indexes], cube
+    
+    def analyze_head_tail(self, data: List[Dict]) -> Dict:
+        """Bảng đầu/đuôi lô tổng hợp và của kỳ quay mới nhất"""
+        if not data:
+            return {'error': 'Không có dữ liệu'}
+        
+        matrix = self.head_tail_matrix(data)
+        table = self.build_draw_table(self.sort_by_date(data))
+        latest_date = table.dates[-1]
+        latest = self.head_tail_matrix(data, start_date=latest_date, end_date=latest_date)
+        
+        return {
+            'matrix': matrix.tolist(),
+            'head_totals': {str(d): int(c) for d, c in enumerate(matrix.sum(axis=1))},
+            'tail_totals': {str(d): int(c) for d, c in enumerate(matrix.sum(axis=0))},
+            'latest_draw': {
+                'date': latest_date,
+                # Bảng lô tô: mỗi đầu liệt kê các đuôi về (lặp lại nếu về nhiều nháy)
+                'heads': {
+                    str(head): [str(tail) for tail in range(10) for _ in range(latest[head, tail])]
+                    for head in range(10)
+                }
+            }
+        }
+    
+    def build_tail_incidence(self, sorted_data: List[Dict]) -> Tuple[List[str], np.ndarray]:
+        """Tạo ma trận xuất hiện (số ngày × 100) của 2 số cuối (lô) theo thứ tự ngày"""
+        dates, counts, _ = self.build_tail_counts(sorted_data)
+        return dates, counts > 0
+    
+    def analyze_streaks(self, data: List[Dict], top_n: int = 10) -> Dict:
+        """Phân tích chuỗi kỳ quay liên tiếp (theo lịch, bỏ nghỉ Tết) về của từng cặp 2 số cuối"""
+        if not data:
+            return {'error': 'Không có dữ liệu'}
+        
+        sorted_data = self.sort_by_date(data)
+        dates, incidence = self.build_tail_incidence(sorted_data)
+        total_days = len(dates)
+        
+        # Hai ngày đã lưu chỉ liên tiếp khi là hai kỳ quay liền nhau (bỏ ngày nghỉ Tết),
+        # ngày thiếu dữ liệu ở giữa sẽ cắt chuỗi
+        draw_gaps = self.build_draw_table(sorted_data).draw_gaps()
+        gaps = np.concatenate(([0], np.cumsum(draw_gaps > 1)))
+        positions = np.arange(total_days) + gaps
+        width = total_days + int(gaps[-1])
+        
+        # Run-length encoding theo từng số: chèn cột 0 ở hai đầu và tại mỗi khoảng trống
+        # rồi lấy sai phân, +1 là điểm bắt đầu chuỗi, -1 là điểm kết thúc (không bao gồm)
+        padded = np.zeros((100, width + 2), dtype=np.int8)
+        padded[:, positions + 1] = incidence.T
+        edges = np.diff(padded, axis=1)
+        
+        # np.nonzero duyệt theo hàng nên các start/end của cùng một số đã khớp thứ tự
+        start_numbers, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        lengths = ends - starts
+        
+        # Chuỗi hiện tại: các chuỗi kéo dài tới ngày cuối cùng
+        current = np.zeros(100, dtype=np.int64)
+        ongoing = ends == width
+        current[start_numbers[ongoing]] = lengths[ongoing]
+        
+        # Đổi vị trí trên trục đã chèn khoảng trống về chỉ số ngày
+        day_at = np.full(width, -1, dtype=np.int64)
+        day_at[positions] = np.arange(total_days)
+        
+        # Chuỗi dài nhất: sắp xếp theo độ dài giảm dần, ưu tiên chuỗi gần đây
+        order = np.lexsort((-ends, -lengths))[:top_n]
+        longest_streaks = [
+            {
+                'number': f"{start_numbers[i]:02d}",
+                'length': int(lengths[i]),
+                'start_date': dates[day_at[starts[i]]],
+                'end_date': dates[day_at[ends[i] - 1]]
+            }
+            for i in order
+        ]
+        
+        distribution = np.bincount(lengths) if lengths.size else np.zeros(1, dtype=np.int64)
+        
+        return {
+            'total_days': total_days,
+            'total_streaks': int(lengths.size),
+            'longest_streaks': longest_streaks,
+            'current_streaks': {
+                f"{num:02d}": int(current[num])
+                for num in np.flatnonzero(current)
+            },
+            'length_distribution': {
+                str(length): int(count)
+                for length, count in enumerate(distribution)
+                if count
+            }
+        }
+    
+    def analyze_calendar(self, data: List[Dict], top_n: int = 5) -> Dict:
+        """Thống kê lô theo thứ trong tuần, tháng, năm và ngày trong tháng"""
+        if not data:
+            return {'error': 'Không có dữ liệu'}
+        
+        engine = CalendarGroupBy()
+        engine.add_records(self.records_per_day(self.sort_by_date(data)))
+        
+        result = {}
+        for dim in engine.dimensions:
+            dim_result = {}
+            for bucket in engine.buckets(dim):
+                stats = engine.bucket_summary(dim, bucket, k=top_n)
+                total = stats['total_numbers']
+                label = WEEKDAY_LABELS[bucket] if dim == 'weekday' else str(bucket)
+                dim_result[label] = {
+                    'draws_count': stats['draws_count'],
+                    'total_numbers': total,
+                    'invalid_numbers': stats['invalid_numbers'],
+                    'most_common': [
+                        {'number': num, 'count': count,
+                         'percentage': round((count / total) * 100, 2) if total else 0}
+                        for num, count in stats['most_common']
+                    ]
+                }
+            result[dim] = dim_result
+        
+        return result
+    
     def generate_report(self) -> Dict:
         """Tạo báo cáo phân tích tổng hợp"""
         logger.info("Bắt đầu tạo báo cáo phân tích")
@@ -225,16 +916,23 @@ class LotteryAnalytics:
         if not data:
             return {'error': 'Không có dữ liệu để phân tích'}
         
+        time_trends = self.analyze_time_trends(data)
+        
         report = {
             'generated_at': datetime.now().isoformat(),
             'data_summary': {
                 'total_records': len(data),
-                'date_range': self.analyze_time_trends(data).get('date_range', {})
+                'date_range': time_trends.get('date_range', {})
             },
             'frequency_analysis': self.analyze_frequency(data),
             'prize_analysis': self.analyze_by_prize(data),
             'pattern_analysis': self.analyze_patterns(data),
-            'time_trends': self.analyze_time_trends(data)
+            'time_trends': time_trends,
+            'slot_analysis': self.analyze_slots(data),
+            'streak_analysis': self.analyze_streaks(data),
+            'transition_analysis': self.analyze_transitions(data),
+            'head_tail_analysis': self.analyze_head_tail(data),
+            'calendar_analysis': self.analyze_calendar(data)
         }
         
         # Lưu báo cáo
@@ -271,6 +969,25 @@ class LotteryAnalytics:
                 even_percent = round((even_odd.get('even', 0) / total) * 100, 1)
                 insights.append(f"Tỷ lệ số chẵn: {even_percent}%, số lẻ: {100-even_percent}%")
         
+        # Insight về chuỗi ngày liên tiếp
+        streak_analysis = report.get('streak_analysis', {})
+        if streak_analysis.get('longest_streaks'):
+            longest = streak_analysis['longest_streaks'][0]
+            insights.append(
+                f"Chuỗi về liên tiếp dài nhất: {longest['number']} "
+                f"({longest['length']} ngày, {longest['start_date']} - {longest['end_date']})"
+            )
+        
+        # Insight về điểm số trực tuyến (đọc trạng thái đã lưu, không tính lại lịch sử)
+        scorer = OnlineNumberScorer(str(self.data_dir))
+        if scorer.load() and scorer.draws_seen:
+            top_tails = ', '.join(item['number'] for item in scorer.top('tail', 5))
+            top_endings = ', '.join(item['number'] for item in scorer.top('ending', 3))
+            insights.append(
+                f"Lô điểm cao nhất (tính đến {scorer.last_date}): {top_tails}; "
+                f"ba càng: {top_endings}"
+            )
+        
         # Insight về xu hướng thời gian
         time_trends = report.get('time_trends', {})
         if 'total_draws' in time_trends:
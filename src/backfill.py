@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module thu thập bù dữ liệu lịch sử theo khoảng ngày
+Chạy song song có giới hạn, ghi theo batch và lưu tiến độ để chạy tiếp khi bị gián đoạn
+"""
+
+import argparse
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import structlog
+
+from data_storage import DataStorage
+from data_validator import tet_break_ordinals
+from lottery_collector import LotteryCollector
+
+logger = structlog.get_logger()
+
+
+def draw_dates(start_date: datetime, end_date: datetime) -> List[datetime]:
+    """Các ngày có quay thưởng trong khoảng [start_date, end_date] (bỏ kỳ nghỉ Tết)"""
+    first, last = start_date.toordinal(), end_date.toordinal()
+    if first > last:
+        return []
+    breaks = set(tet_break_ordinals(first, last).tolist())
+    return [datetime.fromordinal(o) for o in range(first, last + 1) if o not in breaks]
+
+
+class HistoricalBackfill:
+    """Thu thập bù kết quả các ngày cũ và ghi qua DataStorage"""
+
+    def __init__(self, collector: Optional[LotteryCollector] = None,
+                 storage: Optional[DataStorage] = None, max_workers: int = 4,
+                 batch_size: int = 50, max_attempts: int = 3):
+        self.collector = collector or LotteryCollector()
+        self.storage = storage or DataStorage()
+        self.checkpoint_file = self.storage.data_dir / "backfill-checkpoint.json"
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+    def load_checkpoint(self) -> Dict:
+        """Tải tiến độ đã lưu: ngày đã xong và số lần thất bại theo ngày"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            checkpoint = {}
+        return {
+            'done': set(checkpoint.get('done', [])),
+            'failed': dict(checkpoint.get('failed', {}))
+        }
+
+    def save_checkpoint(self, checkpoint: Dict):
+        """Ghi tiến độ ra file (ghi file tạm rồi đổi tên để không hỏng khi bị ngắt)"""
+        state = {
+            'done': sorted(checkpoint['done'], key=lambda d: datetime.strptime(d, '%d/%m/%Y')),
+            'failed': checkpoint['failed'],
+            'updated_at': datetime.now().isoformat()
+        }
+        temp_file = self.checkpoint_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        temp_file.replace(self.checkpoint_file)
+
+    def _stored_dates(self) -> set:
+        """Các ngày đã có kết quả thật trong file JSON"""
+        return {
+            record.get('date') for record in self.storage._load_existing_data()
+            if not record.get('is_fallback')
+        }
+
+    def pending_dates(self, dates: Iterable[datetime], checkpoint: Dict) -> List[datetime]:
+        """Các ngày chưa thu thập, chưa có trong dữ liệu và chưa quá số lần thử"""
+        stored = self._stored_dates()
+        pending = []
+        for date in dates:
+            date_str = date.strftime('%d/%m/%Y')
+            if date_str in checkpoint['done'] or date_str in stored:
+                continue
+            if checkpoint['failed'].get(date_str, 0) >= self.max_attempts:
+                continue
+            pending.append(date)
+        return pending
+
+    def _flush(self, batch: List[Dict], finished: List[str], checkpoint: Dict) -> bool:
+        """Ghi batch rồi mới đánh dấu các ngày là xong trong checkpoint"""
+        if batch and self.storage.save_batch(batch) is None:
+            return False
+        for date_str in finished:
+            checkpoint['done'].add(date_str)
+            checkpoint['failed'].pop(date_str, None)
+        self.save_checkpoint(checkpoint)
+        batch.clear()
+        finished.clear()
+        return True
+
+    def run(self, dates: Iterable[datetime]) -> Dict:
+        """Thu thập bù các ngày chỉ định, trả về thống kê lần chạy"""
+        checkpoint = self.load_checkpoint()
+        pending = self.pending_dates(dates, checkpoint)
+        logger.info("Bắt đầu backfill", pending=len(pending), done=len(checkpoint['done']),
+                    workers=self.max_workers)
+
+        stats = {'pending': len(pending), 'collected': 0, 'failed': 0, 'saved': 0}
+        batch: List[Dict] = []
+        finished: List[str] = []
+        # Batch ghi lỗi vẫn nằm trong `batch`: không ghi lại ở finally để giữ lỗi gốc
+        flush_failed = False
+
+        def handle(date: datetime, result: Optional[Dict]):
+            nonlocal flush_failed
+            date_str = date.strftime('%d/%m/%Y')
+            if result:
+                stats['collected'] += 1
+                batch.append(result)
+                finished.append(date_str)
+            else:
+                stats['failed'] += 1
+                checkpoint['failed'][date_str] = checkpoint['failed'].get(date_str, 0) + 1
+            if len(batch) >= self.batch_size:
+                size = len(batch)
+                if not self._flush(batch, finished, checkpoint):
+                    flush_failed = True
+                    raise RuntimeError("Không thể ghi batch backfill")
+                stats['saved'] += size
+
+        # Giới hạn số ngày đang xử lý để không dựng hàng đợi cho cả khoảng nhiều năm
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backfill') as executor:
+            in_flight = deque()
+            try:
+                for date in pending:
+                    in_flight.append((date, executor.submit(self.collector.fetch_historical, date)))
+                    if len(in_flight) >= self.max_workers * 2:
+                        done_date, future = in_flight.popleft()
+                        handle(done_date, future.result())
+                while in_flight:
+                    done_date, future = in_flight.popleft()
+                    handle(done_date, future.result())
+            finally:
+                # Kể cả khi bị ngắt: ghi những gì đã thu thập được
+                for _, future in in_flight:
+                    future.cancel()
+                size = len(batch)
+                if not flush_failed and self._flush(batch, finished, checkpoint):
+                    stats['saved'] += size
+
+        logger.info("Hoàn thành backfill", **stats)
+        return stats
+
+    def run_range(self, start_date: datetime, end_date: datetime) -> Dict:
+        """Thu thập bù mọi ngày quay thưởng trong khoảng"""
+        return self.run(draw_dates(start_date, end_date))
+
+    def run_gaps(self, gaps_file: Optional[str] = None) -> Dict:
+        """Thu thập bù các ngày trong file missing-dates.json do DataValidator xuất ra
+
+        Chỉ các ngày thiếu ('dates'); ngày trùng có kết quả khác nhau đã có dữ liệu và
+        cần được xử lý thủ công.
+        """
+        path = Path(gaps_file) if gaps_file else self.storage.data_dir / "missing-dates.json"
+        with open(path, 'r', encoding='utf-8') as f:
+            gaps = json.load(f)
+        return self.run(datetime.strptime(date, '%d/%m/%Y') for date in gaps.get('dates', []))
+
+
+def main():
+    """Hàm main để chạy backfill từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Thu thập bù kết quả XSMB theo khoảng ngày")
+    parser.add_argument('--start', help="Ngày bắt đầu (dd/mm/yyyy)")
+    parser.add_argument('--end', help="Ngày kết thúc (dd/mm/yyyy), mặc định hôm qua")
+    parser.add_argument('--gaps', action='store_true', help="Thu thập các ngày trong data/missing-dates.json")
+    parser.add_argument('--workers', type=int, default=4, help="Số ngày thu thập song song")
+    parser.add_argument('--batch-size', type=int, default=50, help="Số bản ghi mỗi lần ghi file")
+    args = parser.parse_args()
+
+    backfill = HistoricalBackfill(max_workers=args.workers, batch_size=args.batch_size)
+
+    try:
+        if args.gaps:
+            stats = backfill.run_gaps()
+        elif args.start:
+            start_date = datetime.strptime(args.start, '%d/%m/%Y')
+            if args.end:
+                end_date = datetime.strptime(args.end, '%d/%m/%Y')
+            else:
+                end_date = backfill.collector.get_vietnam_date(-1).replace(tzinfo=None)
+            stats = backfill.run_range(start_date, end_date)
+        else:
+            parser.error("Cần --start hoặc --gaps")
+    finally:
+        backfill.collector.flush_cache()
+
+    return stats['failed'] == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module kiểm thử chiến lược chơi lô trên toàn bộ lịch sử quay thưởng
+Mọi chiến lược được tính bằng phép toán mảng trên ma trận (số ngày × 100)
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import structlog
+
+from analytics import LotteryAnalytics
+
+logger = structlog.get_logger()
+
+
+def _top_k_mask(scores: np.ndarray, k: int, valid_rows: np.ndarray) -> np.ndarray:
+    """Chọn k số có điểm cao nhất mỗi ngày (hòa điểm thì số nhỏ hơn được chọn)"""
+    days = scores.shape[0]
+    picks = np.zeros((days, 100), dtype=bool)
+    if k <= 0 or days == 0:
+        return picks
+    
+    k = min(k, 100)
+    # Gộp điểm và thứ tự số thành một khóa nguyên để phá hòa ổn định
+    keys = scores.astype(np.int64) * 100 + (99 - np.arange(100))
+    top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+    np.put_along_axis(picks, top, True, axis=1)
+    picks[~valid_rows] = False
+    return picks
+
+
+def _window_counts(counts: np.ndarray, window: int) -> np.ndarray:
+    """Tổng số lần về của mỗi số trong `window` ngày trước ngày t (không gồm ngày t)"""
+    cumulative = np.zeros((counts.shape[0] + 1, 100), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+    ends = np.arange(counts.shape[0])
+    starts = np.maximum(ends - window, 0)
+    return cumulative[ends] - cumulative[starts]
+
+
+def pick_most_overdue(counts: np.ndarray, special_tails: np.ndarray, draw_index: np.ndarray,
+                      k: int = 5) -> np.ndarray:
+    """Chơi k số lâu chưa về nhất tính đến hôm trước"""
+    days = counts.shape[0]
+    day_index = np.arange(days)[:, None]
+    last_seen = np.maximum.accumulate(np.where(counts > 0, day_index, -1), axis=0)
+    
+    # Khoảng cách tại ngày t dựa trên lần về cuối trước ngày t
+    previous = np.full((days, 100), -1, dtype=np.int64)
+    previous[1:] = last_seen[:-1]
+    gaps = day_index - previous
+    
+    return _top_k_mask(gaps, k, valid_rows=np.arange(days) > 0)
+
+
+def pick_previous_special(counts: np.ndarray, special_tails: np.ndarray, draw_index: np.ndarray,
+                          lag: int = 1) -> np.ndarray:
+    """Chơi lô 2 số cuối giải đặc biệt của `lag` kỳ quay trước
+    
+    Chỉ chơi khi ngày cách đó đúng `lag` kỳ quay theo DrawTable.draw_index (cùng quy tắc
+    với analyze_streaks, nghỉ Tết không tính): thiếu dữ liệu ở giữa thì bỏ ngày đó.
+    """
+    days = counts.shape[0]
+    picks = np.zeros((days, 100), dtype=bool)
+    if lag <= 0 or lag >= days:
+        return picks
+    
+    source = special_tails[:-lag]
+    consecutive = draw_index[lag:] - draw_index[:-lag] == lag
+    rows = np.flatnonzero((source >= 0) & consecutive)
+    picks[rows + lag, source[rows]] = True
+    return picks
+
+
+def pick_hot(counts: np.ndarray, special_tails: np.ndarray, draw_index: np.ndarray,
+             k: int = 5, window: int = 30) -> np.ndarray:
+    """Chơi k số về nhiều nhất trong `window` ngày gần nhất"""
+    totals = _window_counts(counts, window)
+    return _top_k_mask(totals, k, valid_rows=np.arange(counts.shape[0]) > 0)
+
+
+def pick_cold(counts: np.ndarray, special_tails: np.ndarray, draw_index: np.ndarray,
+              k: int = 5, window: int = 30) -> np.ndarray:
+    """Chơi k số về ít nhất trong `window` ngày gần nhất"""
+    totals = _window_counts(counts, window)
+    return _top_k_mask(-totals, k, valid_rows=np.arange(counts.shape[0]) > 0)
+
+
+STRATEGIES: Dict[str, Callable[..., np.ndarray]] = {
+    'most_overdue': pick_most_overdue,
+    'previous_special': pick_previous_special,
+    'hot': pick_hot,
+    'cold': pick_cold,
+}
+
+
+def evaluate_picks(counts: np.ndarray, picks: np.ndarray,
+                   stake: float = 23.0, payout: float = 80.0) -> Dict:
+    """Tính tỷ lệ trúng và ROI cho ma trận số chơi (số ngày × 100)"""
+    picks_per_day = picks.sum(axis=1)
+    # Lô trả thưởng theo số nháy: mỗi lần về của số đã chơi được trả một lần
+    hits_per_day = np.where(picks, counts, 0).sum(axis=1)
+    winning_picks = int(np.count_nonzero(picks & (counts > 0)))
+    
+    total_picks = int(picks_per_day.sum())
+    total_hits = int(hits_per_day.sum())
+    cost = total_picks * stake
+    returned = total_hits * payout
+    days_played = int(np.count_nonzero(picks_per_day))
+    
+    return {
+        'total_days': int(counts.shape[0]),
+        'days_played': days_played,
+        'days_won': int(np.count_nonzero(hits_per_day)),
+        'total_picks': total_picks,
+        'winning_picks': winning_picks,
+        'total_hits': total_hits,
+        'hit_rate': round(winning_picks / total_picks * 100, 2) if total_picks else 0,
+        'cost': round(cost, 2),
+        'payout': round(returned, 2),
+        'profit': round(returned - cost, 2),
+        'roi': round((returned - cost) / cost * 100, 2) if cost else 0
+    }
+
+
+def parameter_grid(strategy: str, **param_values: List) -> List[Tuple[str, Dict]]:
+    """Sinh danh sách (chiến lược, tham số) từ tích Descartes các giá trị tham số"""
+    names = list(param_values)
+    return [
+        (strategy, dict(zip(names, combo)))
+        for combo in itertools.product(*(param_values[name] for name in names))
+    ]
+
+
+# Trạng thái dùng chung trong mỗi process con của sweep
+_WORKER_STATE: Dict = {}
+
+
+def _init_worker(counts: np.ndarray, special_tails: np.ndarray, draw_index: np.ndarray,
+                 stake: float, payout: float):
+    """Nạp ma trận lịch sử một lần cho mỗi process con"""
+    _WORKER_STATE.update(counts=counts, special_tails=special_tails, draw_index=draw_index,
+                         stake=stake, payout=payout)
+
+
+def _run_spec(spec: Tuple[str, Dict]) -> Dict:
+    """Chạy một chiến lược trong process con"""
+    name, params = spec
+    picks = STRATEGIES[name](_WORKER_STATE['counts'], _WORKER_STATE['special_tails'],
+                             _WORKER_STATE['draw_index'], **params)
+    result = evaluate_picks(_WORKER_STATE['counts'], picks,
+                            _WORKER_STATE['stake'], _WORKER_STATE['payout'])
+    result.update(strategy=name, params=params)
+    return result
+
+
+class StrategyBacktester:
+    """Kiểm thử chiến lược chơi lô trên toàn bộ lịch sử"""
+    
+    def __init__(self, analytics: Optional[LotteryAnalytics] = None,
+                 stake: float = 23.0, payout: float = 80.0):
+        self.analytics = analytics or LotteryAnalytics()
+        self.stake = stake
+        self.payout = payout
+        
+        self.dates: List[str] = []
+        self.counts = np.zeros((0, 100), dtype=np.int32)
+        self.special_tails = np.zeros(0, dtype=np.int64)
+        # Số thứ tự kỳ quay của từng ngày (DrawTable.draw_index) để nhận ra ngày thiếu
+        self.draw_index = np.zeros(0, dtype=np.int64)
+    
+    def load(self, data: Optional[List[Dict]] = None) -> int:
+        """Nạp lịch sử quay thưởng thành ma trận đếm, trả về số ngày"""
+        if data is None:
+            data = self.analytics.load_data()
+        
+        sorted_data = self.analytics.sort_by_date(data)
+        self.dates, self.counts, self.special_tails = self.analytics.build_tail_counts(sorted_data)
+        self.draw_index = self.analytics.build_draw_table(sorted_data).draw_index
+        return len(self.dates)
+    
+    def run(self, strategy: str, **params) -> Dict:
+        """Chạy một chiến lược trên toàn bộ lịch sử"""
+        if strategy not in STRATEGIES:
+            return {'error': f'Chiến lược không hỗ trợ: {strategy}'}
+        
+        picks = STRATEGIES[strategy](self.counts, self.special_tails, self.draw_index, **params)
+        result = evaluate_picks(self.counts, picks, self.stake, self.payout)
+        result.update(strategy=strategy, params=params)
+        return result
+    
+    def sweep(self, specs: List[Tuple[str, Dict]], max_workers: Optional[int] = None) -> List[Dict]:
+        """Chạy nhiều chiến lược có tham số, song song bằng process pool"""
+        unknown = sorted({name for name, _ in specs if name not in STRATEGIES})
+        if unknown:
+            raise ValueError(f"Chiến lược không hỗ trợ: {unknown}")
+        
+        if max_workers is None:
+            max_workers = min(len(specs), os.cpu_count() or 1)
+        
+        logger.info("Bắt đầu sweep chiến lược", strategies=len(specs), workers=max_workers)
+        
+        if max_workers <= 1 or len(specs) <= 1:
+            return [self.run(name, **params) for name, params in specs]
+        
+        chunksize = max(1, len(specs) // (max_workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(self.counts, self.special_tails, self.draw_index, self.stake, self.payout)
+        ) as executor:
+            return list(executor.map(_run_spec, specs, chunksize=chunksize))
+
+
+def main():
+    """Hàm main để chạy thử một sweep chiến lược mặc định"""
+    backtester = StrategyBacktester()
+    days = backtester.load()
+    
+    if days < 2:
+        logger.error("Không đủ dữ liệu để kiểm thử chiến lược", days=days)
+        return False
+    
+    specs = (
+        parameter_grid('most_overdue', k=[1, 3, 5, 10])
+        + parameter_grid('previous_special', lag=[1, 2, 3])
+        + parameter_grid('hot', k=[1, 3, 5, 10], window=[7, 30, 90])
+        + parameter_grid('cold', k=[1, 3, 5, 10], window=[7, 30, 90])
+    )
+    results = backtester.sweep(specs)
+    results.sort(key=lambda r: r['roi'], reverse=True)
+    
+    for result in results[:5]:
+        logger.info("Kết quả chiến lược",
+                    strategy=result['strategy'], params=result['params'],
+                    hit_rate=result['hit_rate'], roi=result['roi'])
+    
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -16,6 +16,35 @@ from pathlib import Path
 
 logger = structlog.get_logger()
 
+# Mapping các giải thưởng sang tên cột CSV
+PRIZE_COLUMNS = {
+    'Giải Đặc Biệt': 'giai_dac_biet',
+    'Giải Nhất': 'giai_nhat',
+    'Giải Nhì': 'giai_nhi',
+    'Giải Ba': 'giai_ba',
+    'Giải Tư': 'giai_tu',
+    'Giải Năm': 'giai_nam',
+    'Giải Sáu': 'giai_sau',
+    'Giải Bảy': 'giai_bay'
+}
+
+
+def flatten_lottery_data(data: Dict) -> Dict:
+    """Chuyển đổi dữ liệu xổ số thành format phẳng cho CSV"""
+    flattened = {
+        'date': data.get('date', ''),
+        'source': data.get('source', ''),
+        'collected_at': data.get('collected_at', ''),
+    }
+    
+    results = data.get('results', {})
+    
+    for prize_vn, prize_en in PRIZE_COLUMNS.items():
+        numbers = results.get(prize_vn, [])
+        flattened[prize_en] = ','.join(map(str, numbers)) if numbers else ''
+    
+    return flattened
+
 
 class DataStorage:
     """Quản lý lưu trữ dữ liệu xổ số"""
@@ -110,31 +139,7 @@ class DataStorage:
     
     def _flatten_lottery_data(self, data: Dict) -> Dict:
         """Chuyển đổi dữ liệu xổ số thành format phẳng cho CSV"""
-        flattened = {
-            'date': data.get('date', ''),
-            'source': data.get('source', ''),
-            'collected_at': data.get('collected_at', ''),
-        }
-        
-        results = data.get('results', {})
-        
-        # Mapping các giải thưởng
-        prize_mapping = {
-            'Giải Đặc Biệt': 'giai_dac_biet',
-            'Giải Nhất': 'giai_nhat',
-            'Giải Nhì': 'giai_nhi',
-            'Giải Ba': 'giai_ba',
-            'Giải Tư': 'giai_tu',
-            'Giải Năm': 'giai_nam',
-            'Giải Sáu': 'giai_sau',
-            'Giải Bảy': 'giai_bay'
-        }
-        
-        for prize_vn, prize_en in prize_mapping.items():
-            numbers = results.get(prize_vn, [])
-            flattened[prize_en] = ','.join(map(str, numbers)) if numbers else ''
-        
-        return flattened
+        return flatten_lottery_data(data)
     
     def save_to_csv(self, data: Dict) -> bool:
         """Lưu dữ liệu vào file CSV"""
@@ -182,6 +187,66 @@ class DataStorage:
                         json_success=json_success, csv_success=csv_success)
             return False
     
+    def save_batch(self, records: List[Dict]) -> Optional[int]:
+        """Lưu nhiều bản ghi cùng lúc: đọc và ghi mỗi file một lần
+        
+        JSON được ghi ra file tạm, các dòng CSV được ghi nối, rồi file tạm mới thay
+        file JSON; lỗi ở bất kỳ bước nào thì CSV được cắt về kích thước cũ, nên hai
+        file cùng có batch hoặc cùng không có. Trả về số bản ghi mới, hoặc None nếu ghi lỗi.
+        """
+        if not records:
+            return 0
+        
+        try:
+            existing_data = self._load_existing_data()
+            existing_keys = {(item.get('date'), item.get('source')) for item in existing_data}
+            
+            new_records = []
+            for record in records:
+                key = (record.get('date'), record.get('source'))
+                if key not in existing_keys:
+                    existing_keys.add(key)
+                    new_records.append(record)
+            
+            if not new_records:
+                logger.info("Tất cả bản ghi trong batch đã tồn tại, bỏ qua", batch_size=len(records))
+                return 0
+            
+            existing_data.extend(new_records)
+            existing_data.sort(
+                key=lambda x: datetime.strptime(x.get('date', '01/01/1900'), '%d/%m/%Y'),
+                reverse=True
+            )
+            # CSV chỉ ghi nối các dòng chưa có
+            with open(self.csv_file, 'r', newline='', encoding='utf-8') as f:
+                csv_keys = {(row.get('date'), row.get('source')) for row in csv.DictReader(f)}
+            rows = [flatten_lottery_data(record) for record in new_records]
+            rows = [row for row in rows if (row['date'], row['source']) not in csv_keys]
+            
+            temp_json = self.json_file.with_name(self.json_file.name + '.tmp')
+            csv_size = self.csv_file.stat().st_size
+            try:
+                with open(temp_json, 'w', encoding='utf-8') as f:
+                    json.dump(existing_data, f, ensure_ascii=False, indent=2)
+                if rows:
+                    with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
+                        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+                        writer.writerows(rows)
+                os.replace(temp_json, self.json_file)
+            except Exception:
+                with open(self.csv_file, 'r+b') as f:
+                    f.truncate(csv_size)
+                temp_json.unlink(missing_ok=True)
+                raise
+            
+            logger.info("Đã lưu batch dữ liệu", new_records=len(new_records),
+                        total_records=len(existing_data))
+            return len(new_records)
+            
+        except Exception as e:
+            logger.error("Lỗi lưu batch dữ liệu", error=str(e))
+            return None
+    
     def get_statistics(self) -> Dict:
         """Lấy thống kê về dữ liệu đã lưu"""
         try:
@@ -5,153 +5,537 @@ Module kiểm tra và validation dữ liệu xổ số
 Đảm bảo tính chính xác và toàn vẹn của dữ liệu
 """
 
+import argparse
 import json
 import csv
+import hashlib
+import io
+import os
 import re
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import structlog
 from pathlib import Path
+import numpy as np
+import pytz
+
+from data_storage import PRIZE_COLUMNS, flatten_lottery_data
 
 logger = structlog.get_logger()
 
+# Quy tắc validation cho xổ số miền Bắc
+VALIDATION_RULES = {
+    'Giải Đặc Biệt': {'count': 1, 'digits': 5},
+    'Giải Nhất': {'count': 1, 'digits': 5},
+    'Giải Nhì': {'count': 2, 'digits': 5},
+    'Giải Ba': {'count': 6, 'digits': 5},
+    'Giải Tư': {'count': 4, 'digits': 4},
+    'Giải Năm': {'count': 6, 'digits': 4},
+    'Giải Sáu': {'count': 3, 'digits': 3},
+    'Giải Bảy': {'count': 4, 'digits': 2}
+}
 
-class DataValidator:
-    """Kiểm tra và validation dữ liệu xổ số"""
+REQUIRED_FIELDS = ('date', 'source', 'results', 'collected_at')
+
+CSV_HEADERS = ['date', 'source', 'collected_at'] + list(PRIZE_COLUMNS.values())
+
+# Ngày mùng 1 Tết Nguyên Đán (dương lịch); XSMB nghỉ quay từ 30 Tết đến hết mùng 3
+TET_DATES = {
+    2015: (2, 19), 2016: (2, 8), 2017: (1, 28), 2018: (2, 16), 2019: (2, 5),
+    2020: (1, 25), 2021: (2, 12), 2022: (2, 1), 2023: (1, 22), 2024: (2, 10),
+    2025: (1, 29), 2026: (2, 17), 2027: (2, 6), 2028: (1, 26), 2029: (2, 13),
+    2030: (2, 3), 2031: (1, 23), 2032: (2, 11), 2033: (1, 31), 2034: (2, 19),
+    2035: (2, 8)
+}
+TET_BREAK = (-1, 2)  # Số ngày trước/sau mùng 1 không quay thưởng
+
+# Giờ quay xong kỳ trong ngày (giờ Việt Nam); trước giờ này kỳ gần nhất là hôm qua
+DRAW_COMPLETE_TIME = dt_time(18, 35)
+VN_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+
+
+def latest_draw_date(now: Optional[datetime] = None) -> str:
+    """Ngày (dd/mm/YYYY) của kỳ quay gần nhất đã có kết quả, theo giờ Việt Nam"""
+    now = now or datetime.now(VN_TZ)
+    if now.time() < DRAW_COMPLETE_TIME:
+        now -= timedelta(days=1)
+    return now.strftime('%d/%m/%Y')
+
+
+def tet_break_ordinals(first_ordinal: int, last_ordinal: int) -> np.ndarray:
+    """Các ngày nghỉ Tết (ordinal) nằm trong khoảng [first_ordinal, last_ordinal]"""
+    before, after = TET_BREAK
+    ordinals = [
+        datetime(year, month, day).toordinal() + offset
+        for year, (month, day) in TET_DATES.items()
+        for offset in range(before, after + 1)
+    ]
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    return ordinals[(ordinals >= first_ordinal) & (ordinals <= last_ordinal)]
+
+# Lỗi được thu thập dưới dạng tuple (mã lỗi, tham số...) và chỉ format khi cần
+ERROR_MESSAGES = {
+    'missing_field': "Thiếu trường bắt buộc: {0}",
+    'bad_date': "Format ngày không hợp lệ: {0}",
+    'results_not_dict': "Trường 'results' phải là dictionary",
+    'numbers_not_list': "{0}: Danh sách số phải là array",
+    'unknown_prize': "Giải thưởng không hợp lệ: {0}",
+    'bad_count': "{0}: Số lượng không đúng. Mong đợi {1}, nhận được {2}",
+    'bad_number': "{0}: Số thứ {1} không hợp lệ: {2}. Mong đợi {3} chữ số",
+    'csv_bad_date': "Dòng {0}: Format ngày không hợp lệ: {1}",
+    'csv_bad_count': "Dòng {0}, {1}: Số lượng không đúng. Mong đợi {2}, có {3}",
+    'csv_bad_number': "Dòng {0}, {1}: Số không hợp lệ: {2}",
+}
+
+# Tương đương '%d/%m/%Y' của strptime (ngày/tháng 1-2 chữ số, năm 4 chữ số)
+DATE_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+
+def format_error(error: Tuple) -> str:
+    """Chuyển lỗi dạng tuple thành thông báo"""
+    code, *args = error
+    if code == 'record':
+        index, record_error = args
+        return f"Bản ghi {index + 1}: {format_error(record_error)}"
+    return ERROR_MESSAGES[code].format(*args)
+
+
+# Bộ kiểm tra riêng của mỗi process con khi validate song song
+_WORKER_VALIDATOR = None
+
+
+def _init_chunk_worker(validation_rules: Dict[str, Dict]):
+    """Dựng bộ kiểm tra một lần cho mỗi process con"""
+    global _WORKER_VALIDATOR
+    _WORKER_VALIDATOR = CompiledRecordValidator(validation_rules)
+
+
+def _check_chunk_in_worker(task: Tuple) -> Tuple[List[Tuple], int]:
+    """Kiểm tra một chunk trong process con"""
+    return _WORKER_VALIDATOR.check_chunk(*task)
+
+
+class CompiledRecordValidator:
+    """Bộ kiểm tra bản ghi dựng sẵn một lần từ quy tắc validation"""
     
-    def __init__(self, data_dir: str = "data"):
-        self.data_dir = Path(data_dir)
-        self.json_file = self.data_dir / "lottery-results.json"
-        self.csv_file = self.data_dir / "lottery-results.csv"
-        
-        # Quy tắc validation cho xổ số miền Bắc
-        self.validation_rules = {
-            'Giải Đặc Biệt': {'count': 1, 'digits': 5},
-            'Giải Nhất': {'count': 1, 'digits': 5},
-            'Giải Nhì': {'count': 2, 'digits': 5},
-            'Giải Ba': {'count': 6, 'digits': 5},
-            'Giải Tư': {'count': 4, 'digits': 4},
-            'Giải Năm': {'count': 6, 'digits': 4},
-            'Giải Sáu': {'count': 3, 'digits': 3},
-            'Giải Bảy': {'count': 4, 'digits': 2}
+    def __init__(self, validation_rules: Dict[str, Dict] = VALIDATION_RULES):
+        # Bảng tra (số lượng, số chữ số) theo tên giải
+        self.rules = {
+            prize: (rule['count'], rule['digits'])
+            for prize, rule in validation_rules.items()
         }
+        self._valid_dates = {}
+        self._required = frozenset(REQUIRED_FIELDS)
+        
+        # Đường nhanh: bản ghi đủ giải theo đúng thứ tự được nối thành một chuỗi
+        # 'giải1;giải2;...' (các số cách nhau bởi dấu phẩy) và khớp bằng một regex.
+        # Số lượng mỗi giải được kiểm tra trước khi nối, nên một phần tử chứa dấu
+        # phân cách (ví dụ '11111,11111') làm thừa số và không khớp regex
+        self._prize_order = tuple(self.rules)
+        self._prize_counts = tuple(count for count, _ in self.rules.values())
+        self._record_pattern = re.compile(';'.join(
+            rf'\d{{{digits}}}' + rf'(?:,\d{{{digits}}}){{{count - 1}}}'
+            for count, digits in self.rules.values()
+        ))
     
-    def validate_number_format(self, number: str, expected_digits: int) -> bool:
-        """Kiểm tra format của một số"""
-        if not isinstance(number, str):
+    @staticmethod
+    def is_digits(number) -> bool:
+        """Kiểm tra chuỗi chỉ gồm chữ số (tương đương regex ^[0-9]+$ với chữ số Unicode)"""
+        if type(number) is not str:
             number = str(number)
-        
-        # Kiểm tra chỉ chứa số
-        if not re.match(r'^\d+$', number):
-            return False
-        
-        # Kiểm tra số chữ số
-        if len(number) != expected_digits:
-            return False
-        
-        return True
+        return number.isdecimal()
     
-    def validate_prize_numbers(self, prize_name: str, numbers: List[str]) -> Tuple[bool, List[str]]:
-        """Kiểm tra số lượng và format của các số trong một giải"""
-        errors = []
+    @staticmethod
+    def is_valid_number(number, digits: int) -> bool:
+        """Kiểm tra số chỉ gồm chữ số và đúng độ dài"""
+        if type(number) is not str:
+            number = str(number)
+        return len(number) == digits and number.isdecimal()
+    
+    def is_valid_date(self, date) -> bool:
+        """Kiểm tra ngày theo format dd/mm/YYYY (có cache theo chuỗi ngày)"""
+        cached = self._valid_dates.get(date) if type(date) is str else False
+        if cached is not None:
+            return cached
         
-        if prize_name not in self.validation_rules:
-            errors.append(f"Giải thưởng không hợp lệ: {prize_name}")
-            return False, errors
+        match = DATE_PATTERN.fullmatch(date)
+        valid = False
+        if match:
+            day, month, year = map(int, match.groups())
+            try:
+                datetime(year, month, day)
+                valid = True
+            except ValueError:
+                pass
         
-        rule = self.validation_rules[prize_name]
-        expected_count = rule['count']
-        expected_digits = rule['digits']
+        # Giới hạn kích thước cache để không tăng vô hạn với dữ liệu lỗi
+        if len(self._valid_dates) < 100000:
+            self._valid_dates[date] = valid
+        return valid
+    
+    def check_prize(self, prize_name: str, numbers: List, errors: List[Tuple]) -> None:
+        """Kiểm tra số lượng và format các số của một giải, thêm lỗi vào `errors`"""
+        rule = self.rules.get(prize_name)
+        if rule is None:
+            errors.append(('unknown_prize', prize_name))
+            return
         
-        # Kiểm tra số lượng
+        expected_count, expected_digits = rule
         if len(numbers) != expected_count:
-            errors.append(
-                f"{prize_name}: Số lượng không đúng. "
-                f"Mong đợi {expected_count}, nhận được {len(numbers)}"
-            )
+            errors.append(('bad_count', prize_name, expected_count, len(numbers)))
         
-        # Kiểm tra format từng số
         for i, number in enumerate(numbers):
-            if not self.validate_number_format(number, expected_digits):
-                errors.append(
-                    f"{prize_name}: Số thứ {i+1} không hợp lệ: {number}. "
-                    f"Mong đợi {expected_digits} chữ số"
-                )
-        
-        return len(errors) == 0, errors
+            if type(number) is not str:
+                number = str(number)
+            if len(number) != expected_digits or not number.isdecimal():
+                errors.append(('bad_number', prize_name, i + 1, number, expected_digits))
     
-    def validate_single_record(self, record: Dict) -> Tuple[bool, List[str]]:
-        """Kiểm tra một bản ghi dữ liệu"""
+    def is_complete(self, results: Dict) -> bool:
+        """Kết quả có đủ mọi giải, đúng số lượng và số chữ số (27 số với XSMB)"""
+        if not isinstance(results, dict) or results.keys() != self.rules.keys():
+            return False
+        errors = []
+        for prize_name, numbers in results.items():
+            self.check_prize(prize_name, numbers, errors)
+            if errors:
+                return False
+        return True
+    
+    def check_record(self, record: Dict) -> List[Tuple]:
+        """Kiểm tra một bản ghi, trả về danh sách lỗi dạng tuple"""
+        results = record.get('results')
+        if (type(results) is dict and tuple(results) == self._prize_order
+                and record.keys() >= self._required and self.is_valid_date(record['date'])):
+            joined = None
+            if all(type(numbers) is list and len(numbers) == count
+                   for numbers, count in zip(results.values(), self._prize_counts)):
+                try:
+                    joined = ';'.join(map(','.join, results.values()))
+                except TypeError:
+                    pass
+            if joined is not None and self._record_pattern.fullmatch(joined):
+                return []
+        
         errors = []
         
-        # Kiểm tra các trường bắt buộc
-        required_fields = ['date', 'source', 'results', 'collected_at']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in record:
-                errors.append(f"Thiếu trường bắt buộc: {field}")
+                errors.append(('missing_field', field))
         
-        # Kiểm tra format ngày
-        if 'date' in record:
-            try:
-                datetime.strptime(record['date'], '%d/%m/%Y')
-            except ValueError:
-                errors.append(f"Format ngày không hợp lệ: {record['date']}")
+        if 'date' in record and not self.is_valid_date(record['date']):
+            errors.append(('bad_date', record['date']))
         
-        # Kiểm tra kết quả xổ số
         if 'results' in record:
             results = record['results']
             if not isinstance(results, dict):
-                errors.append("Trường 'results' phải là dictionary")
+                errors.append(('results_not_dict',))
             else:
                 for prize_name, numbers in results.items():
                     if not isinstance(numbers, list):
-                        errors.append(f"{prize_name}: Danh sách số phải là array")
+                        errors.append(('numbers_not_list', prize_name))
                         continue
-                    
-                    is_valid, prize_errors = self.validate_prize_numbers(
-                        prize_name, numbers
-                    )
-                    errors.extend(prize_errors)
+                    self.check_prize(prize_name, numbers, errors)
         
-        return len(errors) == 0, errors
+        return errors
+    
+    def check_csv_row(self, i: int, row: Dict, errors: List[Tuple]) -> None:
+        """Kiểm tra một dòng CSV (dòng thứ i), thêm lỗi vào `errors`"""
+        # Kiểm tra ngày
+        date = row.get('date')
+        if date and not self.is_valid_date(date):
+            errors.append(('csv_bad_date', i, date))
+        
+        # Kiểm tra các giải thưởng
+        for prize, (expected_count, expected_digits) in self.rules.items():
+            prize_col = PRIZE_COLUMNS[prize]
+            value = row.get(prize_col)
+            if value:
+                numbers = [n.strip() for n in value.split(',') if n.strip()]
+                
+                if len(numbers) != expected_count:
+                    errors.append(('csv_bad_count', i, prize_col, expected_count, len(numbers)))
+                
+                for number in numbers:
+                    if len(number) != expected_digits or not number.isdecimal():
+                        errors.append(('csv_bad_number', i, prize_col, number))
+    
+    def check_chunk(self, kind: str, start: int, items: List, max_errors: int) -> Tuple[List[Tuple], int]:
+        """Kiểm tra một chunk bản ghi JSON ('json') hoặc dòng CSV ('csv')
+        
+        Trả về (tối đa max_errors lỗi dạng tuple, tổng số lỗi tìm thấy).
+        """
+        errors = []
+        total = 0
+        
+        for i, item in enumerate(items, start):
+            if kind == 'json':
+                item_errors = [('record', i, error) for error in self.check_record(item)]
+            else:
+                item_errors = []
+                self.check_csv_row(i, item, item_errors)
+            
+            if item_errors:
+                total += len(item_errors)
+                room = max_errors - len(errors)
+                if room > 0:
+                    errors.extend(item_errors[:room])
+        
+        return errors, total
+    
+    def find_non_digit(self, results: Dict) -> Optional[Tuple[str, object]]:
+        """Tìm số đầu tiên không chỉ gồm chữ số, trả về (giải, số) hoặc None"""
+        for prize, numbers in results.items():
+            for number in numbers:
+                if not self.is_digits(number):
+                    return prize, number
+        return None
+
+
+class HashingReader(io.RawIOBase):
+    """Luồng đọc bọc file nhị phân, cập nhật digest với mọi byte đọc qua"""
+    
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+        self.size = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        count = self.f.readinto(buffer)
+        if count:
+            self.digest.update(memoryview(buffer)[:count])
+            self.size += count
+        return count
+
+
+class DataValidator:
+    """Kiểm tra và validation dữ liệu xổ số"""
+    
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = Path(data_dir)
+        self.json_file = self.data_dir / "lottery-results.json"
+        self.csv_file = self.data_dir / "lottery-results.csv"
+        self.checkpoint_file = self.data_dir / "validation-checkpoint.json"
+        
+        # Quy tắc validation cho xổ số miền Bắc
+        self.validation_rules = {prize: dict(rule) for prize, rule in VALIDATION_RULES.items()}
+        
+        # Bộ kiểm tra dựng sẵn từ quy tắc, dùng chung cho JSON và CSV
+        self.compiled = CompiledRecordValidator(self.validation_rules)
+    
+    def validate_number_format(self, number: str, expected_digits: int) -> bool:
+        """Kiểm tra format của một số"""
+        return self.compiled.is_valid_number(number, expected_digits)
+    
+    def validate_prize_numbers(self, prize_name: str, numbers: List[str]) -> Tuple[bool, List[str]]:
+        """Kiểm tra số lượng và format của các số trong một giải"""
+        errors = []
+        self.compiled.check_prize(prize_name, numbers, errors)
+        return len(errors) == 0, [format_error(error) for error in errors]
+    
+    def validate_single_record(self, record: Dict) -> Tuple[bool, List[str]]:
+        """Kiểm tra một bản ghi dữ liệu"""
+        errors = self.compiled.check_record(record)
+        return len(errors) == 0, [format_error(error) for error in errors]
+    
+    def _load_checkpoint(self) -> Dict:
+        """Tải checkpoint validation đã lưu"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+                return checkpoint if isinstance(checkpoint, dict) else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _save_checkpoint(self, section: str, state: Dict):
+        """Lưu checkpoint của một file (json hoặc csv)"""
+        checkpoint = self._load_checkpoint()
+        checkpoint[section] = state
+        try:
+            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning("Không thể lưu checkpoint validation", error=str(e))
+    
+    @staticmethod
+    def _record_fingerprint(record) -> str:
+        """Dấu vân tay ngắn của bản ghi (khóa, thời gian thu thập và các số theo giải)
+        
+        Tính từ dữ liệu đã parse nên không phụ thuộc cách định dạng file JSON;
+        bản ghi không đúng cấu trúc trả về chuỗi rỗng (luôn được kiểm tra lại).
+        """
+        if not isinstance(record, dict) or not isinstance(record.get('results'), dict):
+            return ''
+        parts = ['\x1f'.join(str(record.get(field)) for field in ('date', 'source', 'collected_at'))]
+        for prize, numbers in record['results'].items():
+            values = map(str, numbers) if isinstance(numbers, list) else [repr(numbers)]
+            parts.append('\x1f'.join([str(prize), *values]))
+        return hashlib.sha1('\x1e'.join(parts).encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _json_pending(fingerprints: List[str], checkpoint: Optional[Dict]) -> List[int]:
+        """Vị trí các bản ghi chưa được validate (mới hoặc đã sửa) theo checkpoint
+        
+        Checkpoint giữ dấu vân tay của mọi bản ghi đã validate, nên bản ghi mới ở
+        bất kỳ vị trí nào trong file đều được nhận ra, không cần giả định thứ tự.
+        """
+        validated = Counter(checkpoint.get('fingerprints', [])) if checkpoint else Counter()
+        pending = []
+        for i, fingerprint in enumerate(fingerprints):
+            if validated[fingerprint] > 0:
+                validated[fingerprint] -= 1
+            else:
+                pending.append(i)
+        return pending
+    
+    def load_json(self) -> Tuple[bytes, object]:
+        """Đọc và parse file JSON một lần, trả về (nội dung thô, dữ liệu)
+        
+        Kết quả có thể truyền cho validate_json_file, check_consistency và
+        detect_calendar_anomalies để mỗi lần chạy chỉ parse file một lần.
+        """
+        raw = self.json_file.read_bytes()
+        return raw, json.loads(raw.decode('utf-8'))
     
-    def validate_json_file(self) -> Tuple[bool, List[str]]:
-        """Kiểm tra file JSON"""
+    def validate_json_file(self, incremental: bool = False, workers: Optional[int] = None,
+                           chunk_size: int = 5000, max_errors: int = 1000,
+                           progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                           loaded: Optional[Tuple[bytes, object]] = None
+                           ) -> Tuple[bool, List[str]]:
+        """Kiểm tra file JSON
+        
+        Với incremental=True chỉ kiểm tra các bản ghi mới hoặc đã bị sửa so với
+        checkpoint (so theo dấu vân tay từng bản ghi). File lớn được chia chunk và
+        kiểm tra song song; chỉ tối đa max_errors thông báo lỗi được giữ lại.
+        `loaded` là kết quả load_json() đã có, để không đọc lại file.
+        """
         errors = []
         
-        if not self.json_file.exists():
+        if loaded is None and not self.json_file.exists():
             errors.append(f"File JSON không tồn tại: {self.json_file}")
             return False, errors
         
         try:
-            with open(self.json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            _, data = loaded if loaded is not None else self.load_json()
             
             if not isinstance(data, list):
                 errors.append("Dữ liệu JSON phải là array")
                 return False, errors
             
-            logger.info("Bắt đầu kiểm tra JSON", total_records=len(data))
+            pending = range(len(data))
+            if incremental:
+                fingerprints = [self._record_fingerprint(record) for record in data]
+                pending = self._json_pending(fingerprints, self._load_checkpoint().get('json'))
+            
+            logger.info("Bắt đầu kiểm tra JSON", total_records=len(data),
+                        pending_records=len(pending), skipped_records=len(data) - len(pending))
             
-            for i, record in enumerate(data):
-                is_valid, record_errors = self.validate_single_record(record)
-                if not is_valid:
-                    errors.extend([f"Bản ghi {i+1}: {error}" for error in record_errors])
+            record_errors, total_errors, _ = self._validate_chunks(
+                'json', (data[i] for i in pending), 0, len(pending),
+                workers, chunk_size, max_errors, progress
+            )
+            # Vị trí trong lỗi tính theo danh sách cần kiểm tra: đổi về vị trí trong file
+            errors.extend(format_error((code, pending[index], error))
+                          for code, index, error in record_errors)
+            if total_errors > len(record_errors):
+                errors.append(f"Đã dừng thu thập sau {len(record_errors)} lỗi, tổng số lỗi: {total_errors}")
             
             if errors:
                 logger.error("Tìm thấy lỗi trong JSON", error_count=len(errors))
             else:
                 logger.info("JSON hợp lệ", total_records=len(data))
+                if incremental and data:
+                    self._save_checkpoint('json', {
+                        'records': len(data),
+                        'fingerprints': sorted(fingerprints),
+                        'validated_at': datetime.now().isoformat()
+                    })
             
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
             errors.append(f"Lỗi parse JSON: {e}")
         except Exception as e:
             errors.append(f"Lỗi đọc file JSON: {e}")
         
         return len(errors) == 0, errors
     
-    def validate_csv_file(self) -> Tuple[bool, List[str]]:
-        """Kiểm tra file CSV"""
+    def _validate_chunks(self, kind: str, items: Iterable, start: int, total_items: Optional[int],
+                         workers: Optional[int], chunk_size: int, max_errors: int,
+                         progress: Optional[Callable[[int, Optional[int]], None]]) -> Tuple[List[Tuple], int, int]:
+        """Chia dữ liệu thành chunk và kiểm tra, song song nếu đủ lớn
+        
+        Kết quả được gộp theo đúng thứ tự ban đầu. Trả về (lỗi đã thu thập,
+        tổng số lỗi, số phần tử đã kiểm tra).
+        """
+        iterator = iter(items)
+        chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+        
+        if workers is None:
+            # Chỉ dựng process pool khi dữ liệu đủ lớn để bù chi phí khởi tạo;
+            # chưa biết số phần tử (CSV đọc dần) thì đọc trước tối đa 3 chunk để quyết định
+            if total_items is None:
+                head = list(islice(chunks, 3))
+                large = len(head) > 2
+                chunks = chain(head, chunks)
+            else:
+                large = total_items > chunk_size * 2
+            workers = (os.cpu_count() or 1) if large else 1
+        
+        errors = []
+        total_errors = 0
+        checked = 0
+        
+        def merge(chunk_errors: List[Tuple], chunk_total: int, chunk_length: int):
+            nonlocal total_errors, checked
+            total_errors += chunk_total
+            checked += chunk_length
+            room = max_errors - len(errors)
+            if room > 0:
+                errors.extend(chunk_errors[:room])
+            logger.info("Đã kiểm tra chunk", kind=kind, checked=checked, total=total_items,
+                        errors=total_errors)
+            if progress:
+                progress(checked, total_items)
+        
+        position = start
+        if workers <= 1:
+            for chunk in chunks:
+                merge(*self.compiled.check_chunk(kind, position, chunk, max_errors), len(chunk))
+                position += len(chunk)
+            return errors, total_errors, checked
+        
+        # Giữ số chunk đang xử lý có giới hạn để không nạp toàn bộ file vào hàng đợi
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                                 initargs=(self.validation_rules,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((executor.submit(_check_chunk_in_worker,
+                                                (kind, position, chunk, max_errors)), len(chunk)))
+                position += len(chunk)
+                if len(pending) >= workers * 2:
+                    future, length = pending.popleft()
+                    merge(*future.result(), length)
+            while pending:
+                future, length = pending.popleft()
+                merge(*future.result(), length)
+        
+        return errors, total_errors, checked
+    
+    def validate_csv_file(self, incremental: bool = False, workers: Optional[int] = None,
+                          chunk_size: int = 5000, max_errors: int = 1000,
+                          progress: Optional[Callable[[int, Optional[int]], None]] = None
+                          ) -> Tuple[bool, List[str]]:
+        """Kiểm tra file CSV
+        
+        Dòng mới luôn được ghi nối vào cuối file nên phần đã validate là đoạn byte
+        đầu file; với incremental=True chỉ các dòng sau đoạn đó được kiểm tra.
+        Các tham số chia chunk/song song giống validate_json_file.
+        """
         errors = []
         
         if not self.csv_file.exists():
@@ -159,78 +543,331 @@ class DataValidator:
             return False, errors
         
         try:
-            with open(self.csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                
+            with open(self.csv_file, 'rb') as f:
                 # Kiểm tra headers
-                expected_headers = [
-                    'date', 'source', 'collected_at',
-                    'giai_dac_biet', 'giai_nhat', 'giai_nhi',
-                    'giai_ba', 'giai_tu', 'giai_nam', 'giai_sau', 'giai_bay'
-                ]
-                
-                if reader.fieldnames != expected_headers:
+                header_line = f.readline()
+                header_end = len(header_line)
+                header = next(csv.reader(io.StringIO(header_line.decode('utf-8'), newline='')), None)
+                if header != CSV_HEADERS:
                     errors.append("Headers CSV không đúng format")
                 
-                # Kiểm tra từng dòng
-                row_count = 0
-                for i, row in enumerate(reader, 1):
-                    row_count = i
-                    
-                    # Kiểm tra ngày
-                    if row.get('date'):
-                        try:
-                            datetime.strptime(row['date'], '%d/%m/%Y')
-                        except ValueError:
-                            errors.append(f"Dòng {i}: Format ngày không hợp lệ: {row['date']}")
-                    
-                    # Kiểm tra các giải thưởng
-                    prize_checks = [
-                        ('giai_dac_biet', 1, 5),
-                        ('giai_nhat', 1, 5),
-                        ('giai_nhi', 2, 5),
-                        ('giai_ba', 6, 5),
-                        ('giai_tu', 4, 4),
-                        ('giai_nam', 6, 4),
-                        ('giai_sau', 3, 3),
-                        ('giai_bay', 4, 2)
-                    ]
-                    
-                    for prize_col, expected_count, expected_digits in prize_checks:
-                        if row.get(prize_col):
-                            numbers = row[prize_col].split(',')
-                            numbers = [n.strip() for n in numbers if n.strip()]
-                            
-                            if len(numbers) != expected_count:
-                                errors.append(
-                                    f"Dòng {i}, {prize_col}: Số lượng không đúng. "
-                                    f"Mong đợi {expected_count}, có {len(numbers)}"
-                                )
-                            
-                            for number in numbers:
-                                if not self.validate_number_format(number, expected_digits):
-                                    errors.append(
-                                        f"Dòng {i}, {prize_col}: Số không hợp lệ: {number}"
-                                    )
+                offset, start_row = header_end, 1
+                digest = hashlib.sha256(header_line)
+                if incremental:
+                    checkpoint = self._load_checkpoint().get('csv') or {}
+                    prefix_length = checkpoint.get('offset', 0)
+                    prefix_digest = self._hash_prefix(f, prefix_length) if prefix_length >= header_end else None
+                    if prefix_digest is not None and prefix_digest.hexdigest() == checkpoint.get('prefix_hash'):
+                        offset, start_row, digest = prefix_length, checkpoint.get('rows', 0) + 1, prefix_digest
                 
-                if errors:
-                    logger.error("Tìm thấy lỗi trong CSV", error_count=len(errors))
-                else:
-                    logger.info("CSV hợp lệ", total_rows=row_count)
+                logger.info("Bắt đầu kiểm tra CSV", skipped_rows=start_row - 1)
                 
+                # Đọc dần từ offset, không nạp toàn bộ file vào bộ nhớ; phần mới được băm
+                # tiếp vào digest của phần đầu trong lúc đọc nên file chỉ được đọc một lần
+                f.seek(offset)
+                tail = HashingReader(f, digest)
+                text = io.TextIOWrapper(io.BufferedReader(tail), encoding='utf-8', newline='')
+                reader = csv.DictReader(text, fieldnames=header or CSV_HEADERS)
+                row_errors, total_errors, checked = self._validate_chunks(
+                    'csv', reader, start_row, None,
+                    workers, chunk_size, max_errors, progress
+                )
+                file_size = offset + tail.size
+            row_count = start_row - 1 + checked
+            
+            errors.extend(format_error(error) for error in row_errors)
+            if total_errors > len(row_errors):
+                errors.append(f"Đã dừng thu thập sau {len(row_errors)} lỗi, tổng số lỗi: {total_errors}")
+            
+            if errors:
+                logger.error("Tìm thấy lỗi trong CSV", error_count=len(errors))
+            else:
+                logger.info("CSV hợp lệ", total_rows=row_count)
+                if incremental:
+                    self._save_checkpoint('csv', {
+                        'rows': row_count,
+                        'offset': file_size,
+                        'prefix_hash': digest.hexdigest(),
+                        'validated_at': datetime.now().isoformat()
+                    })
+            
         except Exception as e:
             errors.append(f"Lỗi đọc file CSV: {e}")
         
         return len(errors) == 0, errors
     
-    def validate_all(self) -> bool:
-        """Kiểm tra tất cả dữ liệu"""
-        logger.info("Bắt đầu validation toàn bộ dữ liệu")
+    @staticmethod
+    def _hash_prefix(f, length: int, block_size: int = 1 << 20):
+        """Băm `length` byte đầu file theo từng khối; None nếu file ngắn hơn"""
+        f.seek(0)
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                return None
+            digest.update(block)
+            remaining -= len(block)
+        return digest
+    
+    @staticmethod
+    def _prize_digest(row: Dict) -> str:
+        """Digest của các cột giải thưởng đã làm phẳng (không gồm collected_at)"""
+        joined = '\x1f'.join(row.get(column) or '' for column in PRIZE_COLUMNS.values())
+        return hashlib.sha1(joined.encode('utf-8')).hexdigest()
+    
+    def check_consistency(self, max_errors: int = 1000, data: Optional[List[Dict]] = None) -> Tuple[bool, Dict]:
+        """Đối chiếu JSON và CSV theo khóa (date, source) trong một lượt
+        
+        Bản ghi JSON được làm phẳng như khi ghi CSV rồi băm các cột giải thưởng;
+        CSV được đọc tuần tự từng dòng và so khớp với bảng băm đó. Trả về
+        (nhất quán hay không, báo cáo các bản ghi thiếu/lệch/trùng). `data` là dữ
+        liệu JSON đã parse (nếu có) để không đọc lại file.
+        """
+        report = {
+            'json_records': 0,
+            'csv_rows': 0,
+            'matched': 0,
+            'missing_in_csv': [],
+            'missing_in_json': [],
+            'mismatched': [],
+            'duplicates': []
+        }
+        
+        if data is None:
+            try:
+                with open(self.json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                report['error'] = f"Không thể đọc file JSON: {e}"
+                return False, report
+        
+        json_digests: Dict[Tuple[str, str], str] = {}
+        for record in data if isinstance(data, list) else []:
+            if not isinstance(record, dict):
+                continue
+            flattened = flatten_lottery_data(record)
+            key = (flattened['date'], flattened['source'])
+            if key in json_digests:
+                report['duplicates'].append({'file': 'json', 'date': key[0], 'source': key[1]})
+            json_digests[key] = self._prize_digest(flattened)
+        report['json_records'] = len(json_digests)
+        
+        seen = set()
+        try:
+            with open(self.csv_file, 'r', newline='', encoding='utf-8') as f:
+                for row_number, row in enumerate(csv.DictReader(f), 1):
+                    report['csv_rows'] += 1
+                    key = (row.get('date') or '', row.get('source') or '')
+                    if key in seen:
+                        report['duplicates'].append({'file': 'csv', 'row': row_number,
+                                                     'date': key[0], 'source': key[1]})
+                        continue
+                    seen.add(key)
+                    
+                    expected = json_digests.get(key)
+                    if expected is None:
+                        report['missing_in_json'].append({'row': row_number, 'date': key[0],
+                                                          'source': key[1]})
+                    elif expected != self._prize_digest(row):
+                        report['mismatched'].append({'row': row_number, 'date': key[0],
+                                                     'source': key[1]})
+                    else:
+                        report['matched'] += 1
+        except FileNotFoundError as e:
+            report['error'] = f"Không thể đọc file CSV: {e}"
+            return False, report
+        
+        report['missing_in_csv'] = [
+            {'date': date, 'source': source}
+            for date, source in json_digests if (date, source) not in seen
+        ]
+        
+        problems = ('missing_in_csv', 'missing_in_json', 'mismatched', 'duplicates')
+        totals = {name: len(report[name]) for name in problems}
+        for name in problems:
+            del report[name][max_errors:]
+        
+        is_consistent = not any(totals.values())
+        if is_consistent:
+            logger.info("JSON và CSV nhất quán", records=report['matched'])
+        else:
+            logger.error("JSON và CSV không nhất quán", **totals)
+        report['totals'] = totals
+        return is_consistent, report
+    
+    def validate_consistency(self, data: Optional[List[Dict]] = None) -> Tuple[bool, List[str]]:
+        """Kiểm tra JSON và CSV chứa cùng các kỳ quay, trả về thông báo lỗi"""
+        is_consistent, report = self.check_consistency(data=data)
+        if 'error' in report:
+            return False, [report['error']]
+        
+        errors = []
+        for item in report['missing_in_csv']:
+            errors.append(f"Thiếu trong CSV: {item['date']} ({item['source']})")
+        for item in report['missing_in_json']:
+            errors.append(f"Dòng {item['row']}: Thiếu trong JSON: {item['date']} ({item['source']})")
+        for item in report['mismatched']:
+            errors.append(f"Dòng {item['row']}: Kết quả khác JSON: {item['date']} ({item['source']})")
+        for item in report['duplicates']:
+            errors.append(f"Trùng lặp trong {item['file'].upper()}: {item['date']} ({item['source']})")
+        return is_consistent, errors
+    
+    def detect_calendar_anomalies(self, data: Optional[List[Dict]] = None,
+                                  end_date: Optional[str] = None) -> Dict:
+        """Phát hiện ngày thiếu, ngày trùng có kết quả khác nhau và dữ liệu giả lập
+        
+        Ngày có kết quả thật được đưa về mảng ordinal đã sắp xếp rồi trừ tập hợp với
+        lịch quay hằng ngày (bỏ kỳ nghỉ Tết), nên chi phí tuyến tính theo số bản ghi.
+        Ngày chỉ có dữ liệu fallback được tính là ngày thiếu để thu thập lại.
+        """
+        if data is None:
+            try:
+                with open(self.json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                logger.warning("Không thể tải dữ liệu để kiểm tra lịch", error=str(e))
+                data = []
         
-        json_valid, json_errors = self.validate_json_file()
-        csv_valid, csv_errors = self.validate_csv_file()
+        real_ordinals = []
+        fallback_records = []
+        invalid_dates = []
+        by_ordinal: Dict[int, List[Dict]] = {}
+        for record in data if isinstance(data, list) else []:
+            if not isinstance(record, dict):
+                continue
+            date = record.get('date')
+            if not date or not self.compiled.is_valid_date(date):
+                invalid_dates.append(date)
+                continue
+            if record.get('is_fallback'):
+                fallback_records.append({'date': date, 'source': record.get('source')})
+                continue
+            ordinal = datetime.strptime(date, '%d/%m/%Y').toordinal()
+            real_ordinals.append(ordinal)
+            by_ordinal.setdefault(ordinal, []).append(record)
+        
+        ordinals = np.asarray(real_ordinals, dtype=np.int64)
+        unique_ordinals, counts = np.unique(ordinals, return_counts=True)
+        
+        # Ngày có nhiều nguồn: chỉ báo khi kết quả các nguồn khác nhau
+        conflicts = []
+        for ordinal in unique_ordinals[counts > 1].tolist():
+            records = by_ordinal[ordinal]
+            digests = {self._prize_digest(flatten_lottery_data(r)) for r in records}
+            if len(digests) > 1:
+                conflicts.append({
+                    'date': records[0]['date'],
+                    'sources': [r.get('source') for r in records]
+                })
+        
+        report = {
+            'first_date': None,
+            'last_date': None,
+            'expected_draws': 0,
+            'actual_draws': int(unique_ordinals.size),
+            'missing_dates': [],
+            'gaps': [],
+            'conflicting_duplicates': conflicts,
+            'fallback_records': fallback_records,
+            'invalid_dates': invalid_dates
+        }
+        
+        fallback_ordinals = [
+            datetime.strptime(item['date'], '%d/%m/%Y').toordinal() for item in fallback_records
+        ]
+        known = np.concatenate([unique_ordinals, np.asarray(fallback_ordinals, dtype=np.int64)])
+        if known.size == 0:
+            return report
+        
+        first = int(known.min())
+        last = int(known.max())
+        if end_date:
+            last = max(last, datetime.strptime(end_date, '%d/%m/%Y').toordinal())
+        
+        calendar = np.setdiff1d(np.arange(first, last + 1), tet_break_ordinals(first, last),
+                                assume_unique=True)
+        missing = np.setdiff1d(calendar, unique_ordinals, assume_unique=True)
+        
+        # Gộp các ngày thiếu liên tiếp thành khoảng (ngày nghỉ Tết không cắt khoảng)
+        gaps = []
+        if missing.size:
+            breaks = np.flatnonzero(np.diff(np.searchsorted(calendar, missing)) != 1) + 1
+            for run in np.split(missing, breaks):
+                gaps.append({
+                    'start': datetime.fromordinal(int(run[0])).strftime('%d/%m/%Y'),
+                    'end': datetime.fromordinal(int(run[-1])).strftime('%d/%m/%Y'),
+                    'days': int(run.size)
+                })
+        
+        report.update(
+            first_date=datetime.fromordinal(first).strftime('%d/%m/%Y'),
+            last_date=datetime.fromordinal(last).strftime('%d/%m/%Y'),
+            expected_draws=int(calendar.size),
+            missing_dates=[datetime.fromordinal(o).strftime('%d/%m/%Y') for o in missing.tolist()],
+            gaps=gaps
+        )
+        return report
+    
+    def export_gaps(self, report: Optional[Dict] = None, output_file: Optional[str] = None) -> Path:
+        """Ghi danh sách ngày cần thu thập lại ra file JSON cho collector
+        
+        Không truyền `report` thì khoảng kiểm tra kéo dài đến kỳ quay gần nhất (hôm nay
+        nếu đã quay xong), để các ngày thiếu sau bản ghi cuối cùng cũng được thu thập bù.
+        """
+        if report is None:
+            report = self.detect_calendar_anomalies(end_date=latest_draw_date())
+        path = Path(output_file) if output_file else self.data_dir / "missing-dates.json"
+        
+        payload = {
+            'generated_at': datetime.now().isoformat(),
+            'first_date': report['first_date'],
+            'last_date': report['last_date'],
+            'dates': report['missing_dates'],
+            'gaps': report['gaps'],
+            'conflicting_dates': [item['date'] for item in report['conflicting_duplicates']]
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        
+        logger.info("Đã xuất danh sách ngày cần thu thập lại",
+                    file=str(path), missing=len(payload['dates']))
+        return path
+    
+    def validate_all(self, incremental: bool = True, check_consistency: bool = False,
+                     check_calendar: bool = False,
+                     loaded: Optional[Tuple[bytes, object]] = None) -> bool:
+        """Kiểm tra tất cả dữ liệu (mặc định chỉ kiểm tra phần mới sau checkpoint)
+        
+        Đối chiếu JSON/CSV và kiểm tra lịch quay duyệt toàn bộ dữ liệu nên chỉ chạy khi
+        được bật. File JSON chỉ được parse một lần (hoặc dùng `loaded` đã có) cho mọi bước.
+        """
+        logger.info("Bắt đầu validation toàn bộ dữ liệu", incremental=incremental,
+                    check_consistency=check_consistency, check_calendar=check_calendar)
+        
+        if loaded is None:
+            try:
+                loaded = self.load_json()
+            except (OSError, ValueError):
+                # validate_json_file báo lỗi đọc/parse
+                loaded = None
+        data = loaded[1] if loaded is not None and isinstance(loaded[1], list) else []
+        
+        json_valid, json_errors = self.validate_json_file(incremental=incremental, loaded=loaded)
+        csv_valid, csv_errors = self.validate_csv_file(incremental=incremental)
         
         all_errors = json_errors + csv_errors
+        if check_consistency:
+            all_errors += self.validate_consistency(data)[1]
+        
+        # Bất thường về lịch quay chỉ là cảnh báo, không làm validation thất bại
+        if check_calendar:
+            anomalies = self.detect_calendar_anomalies(data)
+            if anomalies['missing_dates'] or anomalies['conflicting_duplicates'] or anomalies['fallback_records']:
+                logger.warning("Phát hiện bất thường lịch quay",
+                               missing_dates=len(anomalies['missing_dates']),
+                               conflicting_duplicates=len(anomalies['conflicting_duplicates']),
+                               fallback_records=len(anomalies['fallback_records']))
         
         if all_errors:
             logger.error("Validation thất bại", total_errors=len(all_errors))
@@ -244,8 +881,22 @@ class DataValidator:
 
 def main():
     """Hàm main để chạy validation"""
+    parser = argparse.ArgumentParser(description="Validation dữ liệu xổ số")
+    parser.add_argument('--full', action='store_true',
+                        help="Kiểm tra lại toàn bộ file và đối chiếu JSON/CSV (bỏ qua checkpoint)")
+    args = parser.parse_args()
+    
     validator = DataValidator()
-    success = validator.validate_all()
+    try:
+        loaded = validator.load_json()
+    except (OSError, ValueError):
+        loaded = None
+    success = validator.validate_all(incremental=not args.full, check_consistency=args.full,
+                                     loaded=loaded)
+    
+    # Danh sách ngày thiếu cho backfill (đến kỳ gần nhất), tính trên dữ liệu đã parse ở trên
+    data = loaded[1] if loaded is not None and isinstance(loaded[1], list) else []
+    validator.export_gaps(validator.detect_calendar_anomalies(data, end_date=latest_draw_date()))
     return success
 
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module cache HTTP trên đĩa cho các trang nguồn
+Lưu body kèm ETag/Last-Modified, gửi request có điều kiện và coi 304 là "không đổi"
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import structlog
+
+from run_timing import response_ttfb
+
+logger = structlog.get_logger()
+
+
+class CachedResponse:
+    """Kết quả tải một URL qua cache"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, not_modified: bool = False,
+                 ttfb: Optional[float] = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.not_modified = not_modified
+        self.content_hash = hashlib.sha256(content).hexdigest()
+        # Thời gian đến byte đầu tiên của request cuối cùng (None nếu không đo được)
+        self.ttfb = ttfb
+
+
+class HttpCache:
+    """Cache HTTP có giới hạn dung lượng, loại bỏ mục ít được dùng gần đây nhất"""
+
+    def __init__(self, cache_dir: str = "data/http-cache", max_bytes: int = 20 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.index: Dict[str, Dict] = self._load_index()
+        # Chỉ mục thay đổi trong bộ nhớ chưa ghi: ghi khi xóa mục hoặc khi flush()
+        self.dirty = False
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Tải chỉ mục cache, bỏ các mục mất file body"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if not isinstance(index, dict):
+            return {}
+        return {url: entry for url, entry in index.items()
+                if (self.cache_dir / entry.get('file', '')).is_file()}
+
+    def _save_index(self):
+        """Ghi chỉ mục cache (gọi khi đang giữ lock)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        self.dirty = False
+
+    def flush(self):
+        """Ghi chỉ mục nếu có thay đổi chưa ghi (gọi khi kết thúc lần chạy)"""
+        with self.lock:
+            if self.dirty:
+                self._save_index()
+
+    @property
+    def total_bytes(self) -> int:
+        """Tổng dung lượng body đang lưu"""
+        return sum(entry['size'] for entry in self.index.values())
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Header If-None-Match / If-Modified-Since cho URL đã có trong cache"""
+        entry = self.index.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_body(self, url: str) -> Optional[bytes]:
+        """Đọc body đã lưu của URL"""
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        try:
+            return (self.cache_dir / entry['file']).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def forget(self, url: str):
+        """Bỏ mục của URL khỏi chỉ mục (ví dụ khi mất file body)"""
+        with self.lock:
+            if self.index.pop(url, None) is not None:
+                self.dirty = True
+
+    def store(self, url: str, content: bytes, etag: Optional[str], last_modified: Optional[str]):
+        """Lưu body cùng validator; chỉ lưu khi server trả ETag hoặc Last-Modified"""
+        if not etag and not last_modified:
+            return
+        if len(content) > self.max_bytes:
+            return
+
+        file_name = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html'
+        with self.lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / file_name).write_bytes(content)
+            self.index[url] = {
+                'file': file_name,
+                'etag': etag,
+                'last_modified': last_modified,
+                'size': len(content),
+                'accessed_at': time.time()
+            }
+            self.dirty = True
+            # File body đã bị xóa: ghi chỉ mục ngay để không trỏ tới file không còn
+            if self._evict():
+                self._save_index()
+
+    def touch(self, url: str):
+        """Đánh dấu URL vừa được dùng lại"""
+        with self.lock:
+            if url in self.index:
+                self.index[url]['accessed_at'] = time.time()
+                self.dirty = True
+
+    def _evict(self) -> int:
+        """Xóa các mục dùng lâu nhất đến khi tổng dung lượng nằm trong giới hạn, trả về số mục đã xóa"""
+        total = self.total_bytes
+        evicted = 0
+        for url in sorted(self.index, key=lambda u: self.index[u]['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            entry = self.index.pop(url)
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+            total -= entry['size']
+            evicted += 1
+            logger.info("Đã xóa mục cache HTTP", url=url, size=entry['size'])
+        return evicted
+
+    def fetch(self, session, url: str, headers: Optional[Dict[str, str]] = None,
+              timeout: float = 30) -> CachedResponse:
+        """GET có điều kiện qua `session`; 304 trả lại body đã lưu
+
+        Lỗi HTTP khác được ném ra qua raise_for_status() như khi gọi session.get.
+        """
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(url))
+
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304:
+            body = self.load_body(url)
+            if body is not None:
+                self.touch(url)
+                logger.info("Trang không đổi (304), dùng bản cache", url=url)
+                return CachedResponse(url, 304, body, not_modified=True, ttfb=response_ttfb(response))
+            # Mất body trong cache: tải lại không điều kiện
+            self.forget(url)
+            response = session.get(url, headers=headers, timeout=timeout)
+
+        response.raise_for_status()
+        self.store(url, response.content,
+                   response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return CachedResponse(url, response.status_code, response.content, ttfb=response_ttfb(response))
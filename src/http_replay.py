@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module ghi lại và phát lại response của các trang nguồn
+Collector ghi response thật ra thư mục; server HTTP cục bộ phát lại với độ trễ, lỗi,
+429/503 và timeout cấu hình được để kiểm thử tải retry/backoff/song song không cần mạng
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import structlog
+
+logger = structlog.get_logger()
+
+# Kết quả server có thể trả cho một request
+OUTCOMES = ('ok', 'error', '429', '503', 'timeout')
+
+
+def replay_key(url: str) -> str:
+    """Khóa của URL trong bản ghi: host + path + query (bỏ scheme)"""
+    parts = urlsplit(url)
+    return parts.netloc + (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+
+def replay_url(base_url: str, url: str) -> str:
+    """URL trên server phát lại tương ứng với URL nguồn"""
+    return base_url.rstrip('/') + '/' + replay_key(url)
+
+
+class ResponseRecorder:
+    """Ghi body và status của response nguồn ra thư mục (một file body mỗi URL)"""
+
+    def __init__(self, record_dir: str = "data/recordings"):
+        self.record_dir = Path(record_dir)
+        self.index_file = self.record_dir / "index.json"
+        self.lock = threading.Lock()
+        self.index: Dict[str, Dict] = self.load_index(self.record_dir)
+
+    @staticmethod
+    def load_index(record_dir: Path) -> Dict[str, Dict]:
+        """Tải chỉ mục bản ghi"""
+        try:
+            with open(Path(record_dir) / "index.json", 'r', encoding='utf-8') as f:
+                index = json.load(f)
+                return index if isinstance(index, dict) else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def record(self, url: str, status_code: int, content: bytes,
+               content_type: str = 'text/html; charset=utf-8'):
+        """Lưu response của `url` (ghi đè bản ghi cũ)"""
+        key = replay_key(url)
+        file_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.body'
+        with self.lock:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+            (self.record_dir / file_name).write_bytes(content)
+            self.index[key] = {
+                'url': url,
+                'file': file_name,
+                'status': status_code,
+                'content_type': content_type,
+                'size': len(content),
+                'recorded_at': time.time()
+            }
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2)
+
+
+class ReplayServer:
+    """Server HTTP cục bộ phát lại các response đã ghi
+
+    Mỗi request nhận một kết quả trong OUTCOMES: theo `script` (danh sách kết quả
+    theo thứ tự cho từng khóa URL, hoặc '*' cho mọi URL) nếu còn, ngược lại chọn ngẫu
+    nhiên theo các tỷ lệ `*_rate` với `seed` cố định để chạy lại giống hệt.
+    """
+
+    def __init__(self, record_dir: str = "data/recordings", host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, unavailable_rate: float = 0.0,
+                 timeout_rate: float = 0.0, hang_seconds: float = 35.0, retry_after: int = 1,
+                 script: Optional[Dict[str, List[str]]] = None, seed: Optional[int] = None):
+        self.record_dir = Path(record_dir)
+        self.index = ResponseRecorder.load_index(self.record_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.rates = (
+            ('error', error_rate),
+            ('429', throttle_rate),
+            ('503', unavailable_rate),
+            ('timeout', timeout_rate),
+        )
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.script = {key: list(outcomes) for key, outcomes in (script or {}).items()}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: Counter = Counter()
+        self.requests: List[Dict] = []
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def next_outcome(self, key: str) -> str:
+        """Kết quả cho request tiếp theo tới `key`"""
+        with self.lock:
+            for script_key in (key, '*'):
+                if self.script.get(script_key):
+                    return self.script[script_key].pop(0)
+            roll = self.rng.random()
+            for outcome, rate in self.rates:
+                if roll < rate:
+                    return outcome
+                roll -= rate
+            return 'ok'
+
+    def delay(self) -> float:
+        """Độ trễ trước khi trả response"""
+        with self.lock:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _handler_class(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                key = self.path.lstrip('/')
+                outcome = server.next_outcome(key)
+                entry = server.index.get(key)
+                if outcome == 'ok' and entry is None:
+                    outcome = 'not_found'
+
+                with server.lock:
+                    server.stats[outcome] += 1
+                    server.requests.append({'key': key, 'outcome': outcome, 'at': time.time()})
+
+                time.sleep(server.delay())
+                if outcome == 'timeout':
+                    # Giữ kết nối không trả lời đến khi client hết thời gian chờ
+                    time.sleep(server.hang_seconds)
+                    return
+                if outcome in ('429', '503'):
+                    self.send_response(int(outcome))
+                    self.send_header('Retry-After', str(server.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if outcome in ('error', 'not_found'):
+                    self.send_response(500 if outcome == 'error' else 404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = (server.record_dir / entry['file']).read_bytes()
+                self.send_response(entry.get('status', 200))
+                self.send_header('Content-Type', entry.get('content_type', 'text/html; charset=utf-8'))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Đã ghi nhận trong server.stats, không in ra stderr
+                pass
+
+        return ReplayHandler
+
+    def start(self) -> str:
+        """Chạy server trong thread nền, trả về base URL"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='replay-server', daemon=True)
+        self.thread.start()
+        logger.info("Server phát lại đang chạy", base_url=self.base_url, recordings=len(self.index))
+        return self.base_url
+
+    def stop(self):
+        """Dừng server"""
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join(timeout=5)
+            self.thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    """Ghi response nguồn hoặc chạy server phát lại"""
+    parser = argparse.ArgumentParser(description="Ghi và phát lại response các trang nguồn XSMB")
+    parser.add_argument('--dir', default='data/recordings', help="Thư mục bản ghi")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('record', help="Thu thập một lần từ nguồn thật và ghi lại response")
+
+    serve = subparsers.add_parser('serve', help="Phát lại response đã ghi")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--latency', type=float, default=0.0, help="Độ trễ (giây)")
+    serve.add_argument('--jitter', type=float, default=0.0, help="Dao động độ trễ (giây)")
+    serve.add_argument('--error-rate', type=float, default=0.0, help="Tỷ lệ trả 500")
+    serve.add_argument('--throttle-rate', type=float, default=0.0, help="Tỷ lệ trả 429")
+    serve.add_argument('--unavailable-rate', type=float, default=0.0, help="Tỷ lệ trả 503")
+    serve.add_argument('--timeout-rate', type=float, default=0.0, help="Tỷ lệ không trả lời")
+    serve.add_argument('--retry-after', type=int, default=1, help="Giá trị header Retry-After")
+    serve.add_argument('--seed', type=int, help="Seed để chạy lại giống hệt")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from lottery_collector import LotteryCollector
+        collector = LotteryCollector()
+        collector.http_cache = None
+        collector.recorder = ResponseRecorder(args.dir)
+        # Tải mọi nguồn (không dừng ở nguồn đầu tiên) để có đủ bản ghi
+        date_str = collector.get_vietnam_date().strftime('%d/%m/%Y')
+        for source in collector.sources:
+            collector._fetch_from_source(source, date_str, max_retries=1)
+        logger.info("Đã ghi response", count=len(collector.recorder.index), dir=args.dir)
+        return bool(collector.recorder.index)
+
+    server = ReplayServer(args.dir, port=args.port, latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                          unavailable_rate=args.unavailable_rate, timeout_rate=args.timeout_rate,
+                          retry_after=args.retry_after, seed=args.seed)
+    server.start()
+    print(f"Đặt XSMB_REPLAY_URL={server.base_url} để collector dùng server phát lại (Ctrl+C để dừng)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(json.dumps(dict(server.stats), ensure_ascii=False))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module HTTP transport dùng chung cho collector và hệ thống thông báo
+Session với pool kết nối keep-alive, timeout mặc định và retry urllib3 (tắt cho collector)
+"""
+
+import threading
+from typing import Dict, Optional, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (timeout kết nối, timeout đọc) tính bằng giây
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 30.0)
+
+# Số host giữ pool riêng và số kết nối giữ lại mỗi host; đủ cho các nguồn chạy song
+# song, backfill nhiều worker trên cùng host và webhook
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 16
+
+
+# Mã trạng thái chắc chắn chưa được server xử lý (an toàn để gửi lại cả POST)
+RETRY_STATUS_CODES = (429, 503)
+
+
+def connection_retry(connect: int = 2, status: int = 2, backoff_factor: float = 0.2) -> Retry:
+    """Chính sách retry của urllib3 cho nơi gọi không có vòng retry riêng (webhook...)
+
+    Thử lại lỗi kết nối (xảy ra trước khi request được gửi) và 429/503 theo
+    Retry-After; không thử lại lỗi đọc vì request có thể đã được xử lý.
+    connect=0, status=0 tắt retry ở tầng này (xem shared_session(retries=False)).
+    """
+    return Retry(
+        total=connect + status,
+        connect=connect,
+        read=0,
+        status=status,
+        other=0,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+class PooledSession(requests.Session):
+    """Session luôn có timeout: request không truyền timeout dùng giá trị mặc định"""
+
+    def __init__(self, timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                   max_retries: Optional[Retry] = None,
+                   timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT) -> PooledSession:
+    """Tạo session với adapter đã chỉnh kích thước pool và retry cho http/https"""
+    session = PooledSession(timeout)
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries if max_retries is not None else connection_retry()
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Hai session dùng chung cùng một pool kết nối, chỉ khác chính sách retry:
+# True - có retry (webhook, lệnh gọi một lần); False - không retry (collector tự retry
+# theo ngân sách thời gian, retry thêm ở urllib3 sẽ nhân số lần gửi request)
+_shared_sessions: Dict[bool, PooledSession] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_session(retries: bool = True) -> PooledSession:
+    """Session dùng chung trong process (tạo lần đầu khi được gọi)
+
+    Session có và không có retry dùng chung pool kết nối keep-alive của nhau.
+    """
+    with _shared_lock:
+        session = _shared_sessions.get(retries)
+        if session is None:
+            policy = connection_retry() if retries else connection_retry(connect=0, status=0)
+            session = create_session(max_retries=policy)
+            other = _shared_sessions.get(not retries)
+            if other is not None:
+                adapter = session.get_adapter('https://')
+                adapter.poolmanager.clear()
+                adapter.poolmanager = other.get_adapter('https://').poolmanager
+            _shared_sessions[retries] = session
+        return session
+
+
+def close_shared_session():
+    """Đóng các kết nối đang giữ của các session dùng chung"""
+    with _shared_lock:
+        for session in _shared_sessions.values():
+            session.close()
+        _shared_sessions.clear()
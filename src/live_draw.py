@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module theo dõi trực tiếp buổi quay XSMB (khoảng 18:15 - 18:35)
+Poll các nguồn dạng bảng trong khung giờ quay, so sánh với lần parse trước và phát sự kiện
+cho từng giải vừa quay xong; dừng khi một nguồn có đủ 27 số hợp lệ của ngày hôm nay
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import structlog
+
+from data_validator import VALIDATION_RULES
+from lottery_collector import LotteryCollector, make_soup
+from number_scoring import OnlineNumberScorer
+from source_registry import page_shows_date
+
+logger = structlog.get_logger()
+
+# Khung giờ poll (giờ Việt Nam), rộng hơn giờ quay thực tế một chút
+WINDOW_START = dt_time(18, 10)
+WINDOW_END = dt_time(18, 45)
+
+
+class LiveDrawPoller:
+    """Poll các nguồn trong lúc quay thưởng và phát sự kiện theo từng giải
+
+    Dùng lại một collector (session, cache, rate limiter) cho mọi vòng poll và không
+    dùng Selenium hay dữ liệu giả lập.
+    """
+
+    def __init__(self, collector: Optional[LotteryCollector] = None, interval: float = 5.0,
+                 window_start: dt_time = WINDOW_START, window_end: dt_time = WINDOW_END,
+                 on_prize: Optional[Callable[[Dict], None]] = None,
+                 events_file: Optional[str] = None,
+                 now: Optional[Callable[[], datetime]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.collector = collector or LotteryCollector()
+        self.interval = interval
+        self.window_start = window_start
+        self.window_end = window_end
+        self.on_prize = on_prize
+        self.events_file = Path(events_file) if events_file else None
+        self.now = now or (lambda: datetime.now(self.collector.vn_tz))
+        self.sleep = sleep
+
+        # Giải đã quay xong (đã phát sự kiện): tên giải -> {'numbers', 'source'}
+        self.completed: Dict[str, Dict] = {}
+        # Các giải mới nhất đọc được của từng nguồn (đã bỏ giải còn của kỳ trước)
+        self.latest: Dict[str, Dict[str, List[str]]] = {}
+        # Bảng kết quả kỳ trước còn trên trang khi bắt đầu poll, theo nguồn
+        self.baseline: Dict[str, Dict[str, List[str]]] = {}
+        # Hash nội dung lần tải trước theo nguồn, để bỏ qua parse khi trang chưa đổi
+        self._last_hash: Dict[str, str] = {}
+        self.polls = 0
+
+    def is_complete_prize(self, prize_name: str, numbers: List[str]) -> bool:
+        """Giải đã có đủ số, đúng số chữ số"""
+        errors = []
+        self.collector.record_validator.check_prize(prize_name, numbers, errors)
+        return not errors
+
+    def _parse_partial(self, source: Dict, content: bytes, date_str: str) -> Optional[Dict]:
+        """Parse trang nguồn, chấp nhận kết quả mới có một phần giải
+
+        Chỉ giữ các giải chắc chắn thuộc kỳ `date_str`: trang ghi đúng ngày đó, hoặc giải
+        khác với bảng kết quả kỳ trước còn trên trang lúc bắt đầu poll.
+        """
+        soup = make_soup(content, tables_only=source.get('tables_only', False))
+        if source.get('key'):
+            result = self.collector.registry.get(source['key']).parse(
+                soup, date_str, self.now().isoformat(), min_prizes=1
+            )
+        else:
+            result = source['parser'](soup, date_str)
+        if result is None:
+            return None
+
+        name = source['name']
+        results = result['results']
+        if not page_shows_date(soup, date_str):
+            baseline = self.baseline.get(name)
+            if baseline is None:
+                if self.collector.record_validator.is_complete(results):
+                    # Bảng đủ giải nhưng không ghi ngày hôm nay: coi là kết quả kỳ trước
+                    logger.info("Trang nguồn còn kết quả kỳ trước, dùng làm mốc", source=name)
+                    self.baseline[name] = results
+                    return None
+                # Trang đã đang quay dở: không có giải nào của kỳ trước
+                self.baseline[name] = {}
+            else:
+                results = {prize: numbers for prize, numbers in results.items()
+                           if baseline.get(prize) != numbers}
+                if not results:
+                    return None
+        return dict(result, results=results)
+
+    def poll_source(self, source: Dict, date_str: str) -> Optional[Dict]:
+        """Tải và parse một nguồn một lần; None nếu lỗi, hết lượt request hoặc trang không đổi"""
+        url = source['url']
+        if self.collector.rate_limiter.bucket(url).try_acquire() > 0:
+            return None
+
+        try:
+            _, content, content_hash = self.collector._download(
+                url, self.collector._request_headers(self.polls), timeout=min(10, self.interval * 2)
+            )
+        except Exception as e:
+            logger.warning("Lỗi poll nguồn", source=source['name'], error=str(e))
+            return None
+
+        if self._last_hash.get(url) == content_hash:
+            return None
+        self._last_hash[url] = content_hash
+        return self._parse_partial(source, content, date_str)
+
+    def merge(self, result: Dict, date_str: str) -> List[Dict]:
+        """Lưu kết quả mới nhất của nguồn, trả về sự kiện cho giải mới quay xong"""
+        source = result.get('source')
+        self.latest[source] = dict(result.get('results', {}))
+
+        events = []
+        for prize_name, numbers in result.get('results', {}).items():
+            if not self.is_complete_prize(prize_name, numbers):
+                continue
+
+            known = self.completed.get(prize_name)
+            if known is not None:
+                if known['numbers'] != numbers:
+                    logger.warning("Nguồn báo kết quả khác", prize=prize_name,
+                                   source=source, numbers=numbers,
+                                   first_source=known['source'], first_numbers=known['numbers'])
+                continue
+
+            self.completed[prize_name] = {'numbers': list(numbers), 'source': source}
+            events.append({
+                'date': date_str,
+                'prize': prize_name,
+                'numbers': list(numbers),
+                'source': source,
+                'detected_at': self.now().isoformat()
+            })
+        return events
+
+    def _emit(self, event: Dict):
+        """Ghi log, file sự kiện (JSON Lines) và gọi callback"""
+        logger.info("Giải mới quay xong", prize=event['prize'], numbers=event['numbers'],
+                    source=event['source'])
+        if self.events_file is not None:
+            self.events_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.events_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        if self.on_prize is not None:
+            self.on_prize(event)
+
+    def record(self, date_str: str) -> Optional[Dict]:
+        """Bản ghi đầy đủ của một nguồn duy nhất đã có đủ 27 số hợp lệ, None nếu chưa có"""
+        for source, results in self.latest.items():
+            if not self.collector.record_validator.is_complete(results):
+                continue
+            record = {
+                'date': date_str,
+                'source': source,
+                'results': {prize: list(results[prize]) for prize in VALIDATION_RULES},
+                'collected_at': self.now().isoformat()
+            }
+            if not self.collector.record_validator.check_record(record):
+                return record
+        return None
+
+    def _window_bounds(self, now: datetime):
+        start = now.replace(hour=self.window_start.hour, minute=self.window_start.minute,
+                            second=0, microsecond=0)
+        end = now.replace(hour=self.window_end.hour, minute=self.window_end.minute,
+                          second=0, microsecond=0)
+        return start, end
+
+    def run(self, wait_for_window: bool = True) -> Optional[Dict]:
+        """Poll đến khi đủ 27 số hợp lệ hoặc hết khung giờ quay
+
+        Trả về bản ghi đầy đủ, hoặc None nếu hết giờ mà chưa đủ giải.
+        """
+        now = self.now()
+        start, end = self._window_bounds(now)
+        date_str = now.strftime('%d/%m/%Y')
+
+        if now >= end:
+            logger.warning("Đã qua khung giờ quay thưởng", window_end=end.isoformat())
+            return None
+        if wait_for_window and now < start:
+            wait = (start - now).total_seconds()
+            logger.info("Chờ đến giờ quay thưởng", wait_seconds=round(wait))
+            self.sleep(wait)
+
+        # Nguồn đọc bảng xác định giải theo nhãn từng dòng; nguồn text/sequence xếp số
+        # theo vị trí nên có thể gán nhầm khi trang mới có một phần kết quả
+        sources = [source for source in self.collector._ordered_sources() if source.get('tables_only')]
+        if not sources:
+            logger.warning("Không có nguồn dạng bảng để theo dõi")
+            return None
+        logger.info("Bắt đầu theo dõi quay thưởng", date=date_str, sources=len(sources),
+                    interval=self.interval)
+
+        # Thread pool tạo một lần, dùng cho mọi vòng poll
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='live') as executor:
+            while self.now() < end:
+                self.polls += 1
+                cycle_started = self.now()
+
+                results = executor.map(lambda source: self.poll_source(source, date_str), sources)
+                for result in results:
+                    if result is None:
+                        continue
+                    for event in self.merge(result, date_str):
+                        self._emit(event)
+
+                record = self.record(date_str)
+                if record is not None:
+                    logger.info("Đã đủ 27 số", source=record['source'], polls=self.polls)
+                    return record
+
+                elapsed = (self.now() - cycle_started).total_seconds()
+                self.sleep(max(0.0, self.interval - elapsed))
+
+        logger.warning("Hết khung giờ quay thưởng khi chưa đủ giải",
+                       completed=list(self.completed), polls=self.polls)
+        return None
+
+
+def main():
+    """Chạy theo dõi trực tiếp rồi lưu kết quả khi đủ giải"""
+    parser = argparse.ArgumentParser(description="Theo dõi trực tiếp buổi quay XSMB")
+    parser.add_argument('--interval', type=float, default=5.0, help="Số giây giữa hai vòng poll")
+    parser.add_argument('--events-file', default='data/live-events.jsonl',
+                        help="File JSON Lines ghi sự kiện từng giải")
+    parser.add_argument('--no-wait', action='store_true', help="Không chờ đến giờ quay")
+    args = parser.parse_args()
+
+    poller = LiveDrawPoller(interval=args.interval, events_file=args.events_file)
+    try:
+        record = poller.run(wait_for_window=not args.no_wait)
+    finally:
+        # Mỗi vòng poll nhận 304 chỉ cập nhật chỉ mục cache trong bộ nhớ
+        poller.collector.flush_cache()
+    if record is None:
+        return False
+
+    from data_storage import DataStorage
+
+    storage = DataStorage()
+    storage.save_data(record)
+    OnlineNumberScorer(str(storage.data_dir)).record_draw(record)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -7,18 +7,32 @@ Ngày tạo: 2025-01-08
 """
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import json
 import csv
+import hashlib
 import os
+import re
 import logging
 from datetime import datetime, timedelta
 import pytz
 import time
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from typing import Dict, List, Optional, Tuple
 import structlog
 
+from data_validator import CompiledRecordValidator
+from http_cache import HttpCache
+from http_replay import ResponseRecorder, replay_url
+from http_transport import DEFAULT_TIMEOUT, shared_session
+from number_scoring import OnlineNumberScorer
+from rate_limiter import Deadline, HostRateLimiter, backoff_delay, parse_retry_after
+from run_timing import RunTimer, response_ttfb
+from source_registry import SourceRegistry, page_shows_date
+from source_stats import SourceStats
+
 # Cấu hình logging
 structlog.configure(
     processors=[
@@ -40,46 +54,86 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# lxml nhanh hơn nhiều so với html.parser; dùng html.parser nếu chưa cài lxml
+try:
+    from lxml import etree
+    HTML_PARSER = 'lxml'
+except ImportError:
+    etree = None
+    HTML_PARSER = 'html.parser'
+
+# Kích thước mỗi lần đọc khi tải trang theo luồng
+STREAM_CHUNK_SIZE = 16 * 1024
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+
+# Chỉ dựng cây cho các bảng khi nguồn chỉ cần đọc bảng kết quả
+TABLES_ONLY = SoupStrainer('table')
+
+
+def make_soup(content, tables_only: bool = False, backend: Optional[str] = None) -> BeautifulSoup:
+    """Parse HTML dùng chung cho mọi parser nguồn"""
+    return BeautifulSoup(content, backend or HTML_PARSER,
+                         parse_only=TABLES_ONLY if tables_only else None)
+
+
 class LotteryCollector:
     """Thu thập dữ liệu xổ số miền Bắc"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        # Session dùng chung (pool keep-alive) không retry ở urllib3: _fetch_with_retries lo
+        # retry; header trình duyệt gửi theo request
+        self.session = shared_session(retries=False)
+        
+        # Bộ kiểm tra bản ghi dùng chung với DataValidator
+        self.record_validator = CompiledRecordValidator()
+        
+        # Giới hạn tốc độ theo host: chỉ chờ khi host đã dùng hết lượt
+        self.rate_limiter = HostRateLimiter(rate=0.5, burst=2)
+        
+        # Cache HTTP trên đĩa (request có điều kiện) và kết quả parse theo hash nội dung
+        self.http_cache: Optional[HttpCache] = HttpCache(os.path.join('data', 'http-cache'))
+        self._parsed: Dict[str, Tuple[str, str, Optional[Dict]]] = {}
+        
+        # Ghi thống kê/bộ nhớ parse của nguồn chạy song song và lệnh hủy loại trừ nhau:
+        # sau khi nguồn bị hủy, nó không ghi thêm gì (xem _cancel_sources)
+        self._commit_lock = threading.Lock()
+        
+        # Ghi lại response nguồn / gửi request tới server phát lại (kiểm thử tải không cần mạng)
+        record_dir = os.getenv('XSMB_RECORD_DIR')
+        self.recorder: Optional[ResponseRecorder] = ResponseRecorder(record_dir) if record_dir else None
+        self.replay_base: Optional[str] = os.getenv('XSMB_REPLAY_URL')
+        
+        # Tải trang theo luồng, dừng sớm khi bảng kết quả đã đủ (chỉ nguồn đọc bảng)
+        self.stream_pages = True
+        
+        # Thời gian từng giai đoạn (kết nối, tải, parse, validate, chờ...) theo nguồn và lần thử
+        self.timer = RunTimer()
+        
+        # Thống kê độ trễ/tỷ lệ thành công để sắp xếp và ngắt mạch nguồn
+        self.source_stats: Optional[SourceStats] = SourceStats(os.path.join('data', 'source-stats.json'))
+        # Thu thập ngày cũ (backfill) thống kê riêng: trang theo ngày trả 404 với ngày không có
+        # kết quả, không được làm ngắt mạch hay lệch độ trễ của nguồn trong lần chạy hằng ngày
+        self.historical_stats: Optional[SourceStats] = SourceStats(
+            os.path.join('data', 'source-stats-historical.json')
+        )
         
         # Múi giờ Việt Nam
         self.vn_tz = pytz.timezone('Asia/Ho_Chi_Minh')
         
-        # URLs để scrape (sử dụng nhiều nguồn để đảm bảo độ tin cậy)
-        self.sources = [
-            {
-                'name': 'XoSo.com.vn',
-                'url': 'https://xoso.com.vn/xsmb-c1.html',
-                'parser': self._parse_xoso_com_vn
-            },
-            {
-                'name': 'VTCNews',
-                'url': 'https://vtcnews.vn/xo-so/xsmb',
-                'parser': self._parse_vtcnews
-            },
-            {
-                'name': 'XoSoDaiPhat',
-                'url': 'https://xosodaiphat.com/xsmb-xo-so-mien-bac.html',
-                'parser': self._parse_xosodaiphat
-            },
-            {
-                'name': 'XoSoYenBai',
-                'url': 'https://xosoyenbai.vn/index.php/ketqua',
-                'parser': self._parse_xosoyenbai
+        # URLs để scrape (sử dụng nhiều nguồn để đảm bảo độ tin cậy), khai báo trong source_registry
+        self.registry = SourceRegistry()
+        self.sources = []
+        for compiled in self.registry:
+            source = {
+                'key': compiled.key,
+                'name': compiled.name,
+                'url': compiled.spec['url'],
+                'parser': partial(self._parse_registered, compiled.key),
+                'tables_only': compiled.tables_only
             }
-        ]
+            if compiled.spec.get('date_url'):
+                source['date_url'] = compiled.spec['date_url']
+            self.sources.append(source)
         
         # Đảm bảo thư mục data tồn tại
         os.makedirs('data', exist_ok=True)
@@ -89,272 +143,375 @@ class LotteryCollector:
         now = datetime.now(self.vn_tz)
         return now + timedelta(days=offset_days)
     
-    def _parse_xoso_com_vn(self, soup: BeautifulSoup, date_str: str) -> Optional[Dict]:
-        """Parse dữ liệu từ XoSo.com.vn"""
-        try:
-            results = {}
-
-            # Tìm các element chứa kết quả xổ số
-            # XoSo.com.vn thường có class 'kqxs-table' hoặc tương tự
-            tables = soup.find_all('table')
-
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        prize_text = cells[0].get_text(strip=True)
-                        numbers_text = cells[1].get_text(strip=True)
-
-                        # Chuẩn hóa tên giải thưởng
-                        if any(keyword in prize_text.lower() for keyword in ['đặc biệt', 'db']):
-                            prize_name = 'Giải Đặc Biệt'
-                        elif any(keyword in prize_text.lower() for keyword in ['nhất', '1']):
-                            prize_name = 'Giải Nhất'
-                        elif any(keyword in prize_text.lower() for keyword in ['nhì', '2']):
-                            prize_name = 'Giải Nhì'
-                        elif any(keyword in prize_text.lower() for keyword in ['ba', '3']):
-                            prize_name = 'Giải Ba'
-                        elif any(keyword in prize_text.lower() for keyword in ['tư', '4']):
-                            prize_name = 'Giải Tư'
-                        elif any(keyword in prize_text.lower() for keyword in ['năm', '5']):
-                            prize_name = 'Giải Năm'
-                        elif any(keyword in prize_text.lower() for keyword in ['sáu', '6']):
-                            prize_name = 'Giải Sáu'
-                        elif any(keyword in prize_text.lower() for keyword in ['bảy', '7']):
-                            prize_name = 'Giải Bảy'
-                        else:
-                            continue
-
-                        # Trích xuất số
-                        numbers = re.findall(r'\d{2,5}', numbers_text)
-                        if numbers:
-                            results[prize_name] = numbers
-
-            if len(results) >= 3:  # Ít nhất 3 giải thưởng
-                return {
-                    'date': date_str,
-                    'source': 'XoSo.com.vn',
-                    'results': results,
-                    'collected_at': datetime.now(self.vn_tz).isoformat()
-                }
-
-        except Exception as e:
-            logger.error("Lỗi parse XoSo.com.vn", error=str(e))
-
-        return None
+    def _parse_registered(self, key: str, soup: BeautifulSoup, date_str: str) -> Optional[Dict]:
+        """Parse trang của nguồn theo spec đã biên dịch trong registry"""
+        return self.registry.get(key).parse(soup, date_str, datetime.now(self.vn_tz).isoformat())
     
-    def _parse_vtcnews(self, soup: BeautifulSoup, date_str: str) -> Optional[Dict]:
-        """Parse dữ liệu từ VTCNews"""
-        try:
-            results = {}
-
-            # VTCNews có thể có cấu trúc khác, tìm các pattern chung
-            # Tìm tất cả text có chứa số và từ khóa giải thưởng
-            text_content = soup.get_text()
-
-            # Pattern để tìm kết quả xổ số
-            patterns = {
-                'Giải Đặc Biệt': r'(?:đặc biệt|ĐB)[:\s]*(\d{5})',
-                'Giải Nhất': r'(?:giải nhất|G1)[:\s]*(\d{5})',
-                'Giải Nhì': r'(?:giải nhì|G2)[:\s]*(\d{5}(?:\s*-\s*\d{5})*)',
-                'Giải Ba': r'(?:giải ba|G3)[:\s]*(\d{5}(?:\s*-\s*\d{5})*)',
-                'Giải Tư': r'(?:giải tư|G4)[:\s]*(\d{4}(?:\s*-\s*\d{4})*)',
-                'Giải Năm': r'(?:giải năm|G5)[:\s]*(\d{4}(?:\s*-\s*\d{4})*)',
-                'Giải Sáu': r'(?:giải sáu|G6)[:\s]*(\d{3}(?:\s*-\s*\d{3})*)',
-                'Giải Bảy': r'(?:giải bảy|G7)[:\s]*(\d{2}(?:\s*-\s*\d{2})*)'
-            }
-
-            for prize_name, pattern in patterns.items():
-                matches = re.findall(pattern, text_content, re.IGNORECASE)
-                if matches:
-                    # Lấy match đầu tiên và tách các số
-                    numbers_str = matches[0]
-                    numbers = re.findall(r'\d+', numbers_str)
-                    if numbers:
-                        results[prize_name] = numbers
-
-            if len(results) >= 3:
-                return {
-                    'date': date_str,
-                    'source': 'VTCNews',
-                    'results': results,
-                    'collected_at': datetime.now(self.vn_tz).isoformat()
-                }
-
-        except Exception as e:
-            logger.error("Lỗi parse VTCNews", error=str(e))
-
-        return None
-
-    def _parse_xosodaiphat(self, soup: BeautifulSoup, date_str: str) -> Optional[Dict]:
-        """Parse dữ liệu từ XoSoDaiPhat"""
+    # Rotate User-Agent để tránh bị detect
+    USER_AGENTS = [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    ]
+    
+    def _pause(self, seconds: float, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Chờ `seconds` giây, trả về True nếu bị hủy trong lúc chờ"""
+        if cancel_event is None:
+            time.sleep(seconds)
+            return False
+        return cancel_event.wait(seconds)
+    
+    def _request_headers(self, retry: int) -> Dict[str, str]:
+        """Header cho từng request (không sửa header của session dùng chung giữa các thread)"""
+        return {
+            'User-Agent': self.USER_AGENTS[retry % len(self.USER_AGENTS)],
+            'Referer': 'https://www.google.com/',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Upgrade-Insecure-Requests': '1',
+            # Luôn hỏi lại server nhưng cho phép trả 304 khi trang chưa đổi
+            'Cache-Control': 'max-age=0'
+        }
+    
+    def _request_url(self, url: str) -> str:
+        """URL thực sự được gửi request (server phát lại nếu có `replay_base`)"""
+        return replay_url(self.replay_base, url) if self.replay_base else url
+    
+    def _record_transfer(self, started: float, ttfb: Optional[float], size: int,
+                         excluded: float = 0.0, **fields):
+        """Ghi span kết nối/TTFB và tải body của một request bắt đầu lúc `started`
+        
+        `excluded` là thời gian xen giữa không thuộc về tải (ví dụ parse khi đọc theo luồng).
+        """
+        total = self.timer.clock() - started - excluded
+        if ttfb is None:
+            self.timer.record('download', total, start=started, bytes=size, **fields)
+            return
+        self.timer.record('connect', ttfb, start=started)
+        self.timer.record('download', max(0.0, total - ttfb), start=started + ttfb, bytes=size, **fields)
+    
+    def _download(self, url: str, headers: Dict[str, str], timeout) -> Tuple[int, bytes, str]:
+        """Tải trang (qua cache nếu có), trả về (status, body, hash nội dung)
+        
+        Với `replay_base` request được gửi tới server phát lại thay cho trang nguồn;
+        với `recorder` body tải được ghi lại theo URL nguồn.
+        """
+        request_url = self._request_url(url)
+        started = self.timer.clock()
+        
+        if self.http_cache is not None:
+            cached = self.http_cache.fetch(self.session, request_url, headers=headers, timeout=timeout)
+            status_code, content, content_hash = cached.status_code, cached.content, cached.content_hash
+            ttfb = cached.ttfb
+        else:
+            response = self.session.get(request_url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            status_code, content = response.status_code, response.content
+            content_hash = hashlib.sha256(content).hexdigest()
+            ttfb = response_ttfb(response)
+        self._record_transfer(started, ttfb, len(content), status_code=status_code)
+        
+        if self.recorder is not None:
+            self.recorder.record(url, 200, content)
+        return status_code, content, content_hash
+    
+    def _stream_source(self, source: Dict, url: str, headers: Dict[str, str], timeout,
+                       date_str: str, cancel_event: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Tải trang theo từng chunk và dừng đọc khi bảng kết quả đã đủ 27 số hợp lệ
+        
+        Bộ parse luồng của lxml báo mỗi thẻ </table> vừa đóng; chỉ riêng bảng đó được
+        parse, nên mỗi byte của trang chỉ được parse một lần. Bảng đầu tiên đủ số là kết
+        quả của trang (cùng quy tắc với CompiledSource._parse_tables), nên có thể đóng kết
+        nối và bỏ phần còn lại. Trang đọc hết thì được lưu vào cache và parse như
+        `_download`. Cần lxml để nhận biết bảng đã đóng.
+        """
+        request_url = self._request_url(url)
+        request_headers = dict(headers)
+        if self.http_cache is not None:
+            request_headers.update(self.http_cache.conditional_headers(request_url))
+        
+        started = self.timer.clock()
+        response = self.session.get(request_url, headers=request_headers, timeout=timeout, stream=True)
+        if response.status_code == 304 and self.http_cache is not None:
+            body = self.http_cache.load_body(request_url)
+            response.close()
+            if body is not None:
+                self.http_cache.touch(request_url)
+                logger.info("Trang không đổi (304), dùng bản cache", url=request_url)
+                self._record_transfer(started, response_ttfb(response), 0, status_code=304)
+                return self._parse_source(source, body, hashlib.sha256(body).hexdigest(), date_str,
+                                          cancel_event)
+            # Mất body trong cache: tải lại không điều kiện như HttpCache.fetch
+            self.http_cache.forget(request_url)
+            response = self.session.get(request_url, headers=headers, timeout=timeout, stream=True)
+        
+        chunks = []
+        bytes_read = 0
+        parse_time = 0.0
+        early_stop = False
         try:
-            results = {}
-
-            # Tìm bảng kết quả
-            tables = soup.find_all('table')
-
-            for table in tables:
-                # Kiểm tra xem table có chứa dữ liệu xổ số không
-                if 'xsmb' in str(table).lower() or 'miền bắc' in str(table).lower():
-                    rows = table.find_all('tr')
-
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if len(cells) >= 2:
-                            prize_cell = cells[0].get_text(strip=True)
-                            numbers_cell = cells[1].get_text(strip=True)
-
-                            # Mapping tên giải thưởng
-                            prize_mapping = {
-                                'ĐB': 'Giải Đặc Biệt',
-                                'G1': 'Giải Nhất',
-                                'G2': 'Giải Nhì',
-                                'G3': 'Giải Ba',
-                                'G4': 'Giải Tư',
-                                'G5': 'Giải Năm',
-                                'G6': 'Giải Sáu',
-                                'G7': 'Giải Bảy'
-                            }
-
-                            prize_name = prize_mapping.get(prize_cell, None)
-                            if prize_name:
-                                numbers = re.findall(r'\d{2,5}', numbers_cell)
-                                if numbers:
-                                    results[prize_name] = numbers
-
-            if len(results) >= 3:
-                return {
-                    'date': date_str,
-                    'source': 'XoSoDaiPhat',
-                    'results': results,
-                    'collected_at': datetime.now(self.vn_tz).isoformat()
-                }
+            response.raise_for_status()
+            
+            pull_parser = None
+            if etree is not None:
+                # Charset theo header, mặc định UTF-8 (các trang nguồn đều là tiếng Việt UTF-8)
+                match = CHARSET_PATTERN.search(response.headers.get('Content-Type', ''))
+                pull_parser = etree.HTMLPullParser(events=('end',), tag='table',
+                                                   encoding=match.group(1) if match else 'utf-8')
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                chunks.append(chunk)
+                bytes_read += len(chunk)
+                if pull_parser is None:
+                    continue
+                pull_parser.feed(chunk)
+                for _, table in pull_parser.read_events():
+                    parse_started = self.timer.clock()
+                    with self.timer.span('parse', bytes=bytes_read, partial=True):
+                        result = source['parser'](make_soup(etree.tostring(table), tables_only=True), date_str)
+                    parse_time += self.timer.clock() - parse_started
+                    if result and self.record_validator.is_complete(result['results']):
+                        logger.info("Đã đủ bảng kết quả, dừng tải trang", source=source['name'],
+                                    bytes_read=bytes_read,
+                                    content_length=response.headers.get('Content-Length'))
+                        early_stop = True
+                        return result
+            content = b''.join(chunks)
+        finally:
+            response.close()
+            self._record_transfer(started, response_ttfb(response), bytes_read, excluded=parse_time,
+                                  status_code=response.status_code, early_stop=early_stop)
+        
+        logger.info("Kết nối thành công", status_code=response.status_code, content_length=len(content))
+        if self.http_cache is not None:
+            self.http_cache.store(request_url, content,
+                                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return self._parse_source(source, content, hashlib.sha256(content).hexdigest(), date_str,
+                                  cancel_event)
+    
+    def _parse_source(self, source: Dict, content: bytes, content_hash: str, date_str: str,
+                      cancel_event: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Parse trang nguồn, dùng lại kết quả nếu nội dung giống lần parse trước
+        
+        Nguồn đã bị hủy không ghi kết quả parse vào bộ nhớ tạm dùng chung.
+        """
+        previous = self._parsed.get(source['url'])
+        if previous and previous[:2] == (content_hash, date_str):
+            logger.info("Nội dung không đổi, bỏ qua parse", source=source['name'])
+            result = previous[2]
+            return dict(result, collected_at=datetime.now(self.vn_tz).isoformat()) if result else None
+        
+        with self.timer.span('parse', bytes=len(content)):
+            soup = make_soup(content, tables_only=source.get('tables_only', False))
+            result = source['parser'](soup, date_str)
+        with self._commit_lock:
+            if cancel_event is None or not cancel_event.is_set():
+                self._parsed[source['url']] = (content_hash, date_str, result)
+        return result
+    
+    def _fetch_from_source(self, source: Dict, date_str: str, max_retries: int = 3,
+                           cancel_event: Optional[threading.Event] = None,
+                           deadline: Optional[Deadline] = None,
+                           url: Optional[str] = None, historical: bool = False) -> Optional[Dict]:
+        """Thu thập từ một nguồn với retry và ghi nhận thống kê nguồn
+        
+        Dừng sớm nếu `cancel_event` được set hoặc hết ngân sách thời gian `deadline`.
+        `url` thay cho trang "hôm nay" của nguồn khi thu thập ngày cũ; với
+        historical=True kết quả được ghi vào thống kê riêng của backfill và trang phải ghi
+        đúng ngày `date_str` (trang ngày cũ có thể chuyển hướng về kết quả hôm nay).
+        """
+        started = time.monotonic()
+        with self.timer.context(source['name'], cancel_event=cancel_event):
+            result = self._fetch_with_retries(source, date_str, max_retries, cancel_event, deadline, url,
+                                              require_date=historical)
+        
+        # Nguồn bị hủy vì nguồn khác đã thắng không tính là thất bại, và không ghi gì
+        # thêm vào timer/thống kê có thể đã được lưu
+        with self._commit_lock:
+            if cancel_event is not None and cancel_event.is_set():
+                return result
+            self.timer.record_result(source['name'], result is not None)
+            stats = self.historical_stats if historical else self.source_stats
+            if stats is not None:
+                stats.record(source['name'], result is not None, time.monotonic() - started)
+        return result
+    
+    def _fetch_with_retries(self, source: Dict, date_str: str, max_retries: int,
+                            cancel_event: Optional[threading.Event], deadline: Optional[Deadline],
+                            url: Optional[str], require_date: bool = False) -> Optional[Dict]:
+        """Vòng retry cho một nguồn (xem _fetch_from_source)"""
+        deadline = deadline or Deadline(None)
+        url = url or source['url']
+        
+        for retry in range(max_retries):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            
+            self.timer.set_attempt(retry + 1)
+            
+            # Chỉ chờ khi host đã hết lượt trong token bucket
+            wait_started = self.timer.clock()
+            acquired = self.rate_limiter.acquire(url, cancel_event, deadline)
+            waited = self.timer.clock() - wait_started
+            if waited > 0.001:
+                self.timer.record('sleep', waited, start=wait_started, reason='rate_limit')
+            if not acquired:
+                logger.warning("Hết thời gian chờ lượt request", source=source['name'])
+                return None
+            
+            if deadline.expired():
+                logger.warning("Hết ngân sách thời gian, dừng retry", source=source['name'])
+                return None
+            
+            retry_after = None
+            self.timer.record_attempt(source['name'])
+            try:
+                # Timeout kết nối và đọc theo transport, không vượt ngân sách còn lại
+                remaining = deadline.remaining()
+                timeout = tuple(min(limit, remaining) for limit in DEFAULT_TIMEOUT)
+                logger.info("Đang kết nối", url=url, retry=retry + 1, timeout=round(timeout[1], 1))
+
+                # Trang chỉ cần bảng kết quả: đọc theo luồng và dừng khi đủ số (khi đang ghi
+                # response hoặc cần kiểm tra ngày trên trang thì luôn tải trọn trang)
+                if (self.stream_pages and source.get('tables_only') and self.recorder is None
+                        and not require_date):
+                    result = self._stream_source(source, url, self._request_headers(retry), timeout, date_str,
+                                                 cancel_event)
+                else:
+                    status_code, content, content_hash = self._download(
+                        url, self._request_headers(retry), timeout
+                    )
 
-        except Exception as e:
-            logger.error("Lỗi parse XoSoDaiPhat", error=str(e))
+                    logger.info("Kết nối thành công", status_code=status_code, content_length=len(content))
 
+                    # Parse HTML
+                    result = self._parse_source(source, content, content_hash, date_str, cancel_event)
+                    
+                    if result and require_date and not page_shows_date(make_soup(content), date_str):
+                        # Chuyển hướng về trang khác ngày: thử lại cũng không đổi
+                        logger.warning("Trang không ghi ngày yêu cầu, bỏ qua nguồn",
+                                       source=source['name'], date=date_str, url=url)
+                        return None
+
+                valid = False
+                if result:
+                    with self.timer.span('validate'):
+                        valid = self.validate_lottery_data(result)
+
+                if valid:
+                    logger.info("Thu thập và validation thành công",
+                              source=source['name'],
+                              prizes_count=len(result.get('results', {})))
+                    return result
+                else:
+                    logger.warning("Dữ liệu không hợp lệ hoặc không đầy đủ",
+                                 source=source['name'],
+                                 has_result=result is not None)
+
+            except requests.exceptions.Timeout:
+                logger.warning("Timeout kết nối", source=source['name'], retry=retry + 1)
+            except requests.exceptions.ConnectionError:
+                logger.warning("Lỗi kết nối", source=source['name'], retry=retry + 1)
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code in (429, 503):
+                    retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+                logger.warning("HTTP Error", source=source['name'], status_code=status_code,
+                               retry_after=retry_after, retry=retry + 1)
+            except Exception as e:
+                logger.error("Lỗi không xác định", source=source['name'], error=str(e), retry=retry + 1)
+
+            # Nếu không phải retry cuối cùng, chờ trước khi thử lại
+            if retry < max_retries - 1:
+                wait_time = retry_after if retry_after is not None else backoff_delay(retry)
+                if wait_time >= deadline.remaining():
+                    logger.warning("Hết ngân sách thời gian, dừng retry",
+                                   source=source['name'], wait_seconds=round(wait_time, 2))
+                    return None
+                logger.info("Chờ trước khi thử lại", wait_seconds=round(wait_time, 2))
+                with self.timer.span('sleep', reason='retry_after' if retry_after is not None else 'backoff'):
+                    cancelled = self._pause(wait_time, cancel_event)
+                if cancelled:
+                    return None
+
+        logger.error("Nguồn thất bại sau tất cả retry", source=source['name'], max_retries=max_retries)
         return None
-
-    def _parse_xosoyenbai(self, soup: BeautifulSoup, date_str: str) -> Optional[Dict]:
-        """Parse dữ liệu từ XoSoYenBai"""
+    
+    def _ordered_sources(self) -> List[Dict]:
+        """Nguồn theo thứ tự thời gian kỳ vọng đến kết quả, bỏ nguồn đang ngắt mạch"""
+        if self.source_stats is None:
+            return list(self.sources)
+        return self.source_stats.order(self.sources)
+    
+    def _fetch_concurrently(self, date_str: str, max_retries: int,
+                            deadline: Optional[Deadline] = None,
+                            sources: Optional[List[Dict]] = None) -> Optional[Dict]:
+        """Gửi request tới tất cả nguồn song song, lấy kết quả hợp lệ đầu tiên
+        
+        Khi có kết quả, các nguồn còn lại được báo hủy: chúng dừng ở lần chờ hoặc
+        retry kế tiếp thay vì chạy hết ngân sách retry. Request đang chạy dở có thể kéo
+        dài tới hết timeout đọc, nên không chờ chúng: từ lúc bị hủy, nguồn không ghi gì
+        thêm vào timer, thống kê nguồn hay bộ nhớ parse (xem _cancel_sources).
+        """
+        cancel_event = threading.Event()
+        sources = sources or self.sources
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='source')
+        futures = {}
         try:
-            results = {}
-
-            # Tìm các div hoặc span chứa kết quả
-            all_text = soup.get_text()
-
-            # Sử dụng regex để tìm pattern số xổ số
-            number_patterns = re.findall(r'\d{2,5}', all_text)
-
-            # Lọc và phân loại số theo độ dài
-            five_digit = [n for n in number_patterns if len(n) == 5]
-            four_digit = [n for n in number_patterns if len(n) == 4]
-            three_digit = [n for n in number_patterns if len(n) == 3]
-            two_digit = [n for n in number_patterns if len(n) == 2]
-
-            # Gán số vào các giải thưởng dựa trên quy tắc XSMB
-            if len(five_digit) >= 8:  # Đủ số cho các giải 5 chữ số
-                results['Giải Đặc Biệt'] = five_digit[:1]
-                results['Giải Nhất'] = five_digit[1:2]
-                results['Giải Nhì'] = five_digit[2:4]
-                results['Giải Ba'] = five_digit[4:10] if len(five_digit) >= 10 else five_digit[4:]
-
-            if len(four_digit) >= 10:  # Đủ số cho các giải 4 chữ số
-                results['Giải Tư'] = four_digit[:4]
-                results['Giải Năm'] = four_digit[4:10]
-
-            if len(three_digit) >= 3:
-                results['Giải Sáu'] = three_digit[:3]
-
-            if len(two_digit) >= 4:
-                results['Giải Bảy'] = two_digit[:4]
-
-            if len(results) >= 3:
-                return {
-                    'date': date_str,
-                    'source': 'XoSoYenBai',
-                    'results': results,
-                    'collected_at': datetime.now(self.vn_tz).isoformat()
-                }
-
-        except Exception as e:
-            logger.error("Lỗi parse XoSoYenBai", error=str(e))
-
+            for source in sources:
+                futures[executor.submit(self._fetch_from_source, source, date_str, max_retries,
+                                        cancel_event, deadline)] = source
+            for future in as_completed(futures):
+                result = future.result()
+                if result:
+                    logger.info("Nguồn nhanh nhất có kết quả hợp lệ", source=futures[future]['name'])
+                    return result
+        finally:
+            self._cancel_sources(cancel_event)
+            executor.shutdown(wait=False, cancel_futures=True)
         return None
     
-    def fetch_lottery_data(self, target_date: Optional[datetime] = None, max_retries: int = 3) -> Optional[Dict]:
-        """Thu thập dữ liệu xổ số cho ngày chỉ định với retry mechanism"""
+    def _cancel_sources(self, cancel_event: threading.Event):
+        """Hủy các nguồn đang chạy song song
+        
+        Sự kiện được set khi giữ cả _commit_lock và lock của timer, nên mọi lần ghi của
+        nguồn hoặc đã xong trước đó, hoặc thấy sự kiện và bị bỏ.
+        """
+        with self._commit_lock:
+            self.timer.cancel(cancel_event)
+    
+    def fetch_lottery_data(self, target_date: Optional[datetime] = None, max_retries: int = 3,
+                           concurrent: bool = True, time_budget: Optional[float] = 180.0) -> Optional[Dict]:
+        """Thu thập dữ liệu xổ số cho ngày chỉ định với retry mechanism
+        
+        Với concurrent=True tất cả nguồn được thử song song và kết quả hợp lệ đầu
+        tiên được dùng; concurrent=False thử lần lượt từng nguồn theo thứ tự.
+        Mọi retry dừng khi hết `time_budget` giây (None: không giới hạn).
+        """
+        deadline = Deadline(time_budget)
         if target_date is None:
             target_date = self.get_vietnam_date()
 
         date_str = target_date.strftime('%d/%m/%Y')
-        logger.info("Bắt đầu thu thập dữ liệu xổ số", date=date_str, sources=len(self.sources))
+        logger.info("Bắt đầu thu thập dữ liệu xổ số", date=date_str, sources=len(self.sources),
+                    concurrent=concurrent)
 
-        # Thử từng nguồn với retry mechanism
-        for source_idx, source in enumerate(self.sources):
-            logger.info("Thử nguồn", source_name=source['name'], attempt=f"{source_idx + 1}/{len(self.sources)}")
-
-            for retry in range(max_retries):
-                try:
-                    # Thêm delay để tránh bị block, tăng delay theo retry
-                    delay = 2 + retry * 2
-                    time.sleep(delay)
-
-                    # Rotate User-Agent để tránh bị detect
-                    user_agents = [
-                        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    ]
-
-                    self.session.headers.update({
-                        'User-Agent': user_agents[retry % len(user_agents)],
-                        'Referer': 'https://www.google.com/',
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                        'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
-                        'Cache-Control': 'no-cache',
-                        'Pragma': 'no-cache'
-                    })
-
-                    logger.info("Đang kết nối", url=source['url'], retry=retry + 1, delay=delay)
-
-                    response = self.session.get(source['url'], timeout=30)
-                    response.raise_for_status()
-
-                    logger.info("Kết nối thành công", status_code=response.status_code, content_length=len(response.content))
-
-                    # Parse HTML
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    result = source['parser'](soup, date_str)
-
-                    if result and self.validate_lottery_data(result):
-                        logger.info("Thu thập và validation thành công",
-                                  source=source['name'],
-                                  prizes_count=len(result.get('results', {})))
+        sources = self._ordered_sources()
+        try:
+            if concurrent and len(sources) > 1:
+                result = self._fetch_concurrently(date_str, max_retries, deadline, sources)
+                if result:
+                    return result
+            else:
+                # Thử từng nguồn với retry mechanism
+                for source_idx, source in enumerate(sources):
+                    logger.info("Thử nguồn", source_name=source['name'], attempt=f"{source_idx + 1}/{len(sources)}")
+                    result = self._fetch_from_source(source, date_str, max_retries, deadline=deadline)
+                    if result:
                         return result
-                    else:
-                        logger.warning("Dữ liệu không hợp lệ hoặc không đầy đủ",
-                                     source=source['name'],
-                                     has_result=result is not None)
-
-                except requests.exceptions.Timeout:
-                    logger.warning("Timeout kết nối", source=source['name'], retry=retry + 1)
-                except requests.exceptions.ConnectionError:
-                    logger.warning("Lỗi kết nối", source=source['name'], retry=retry + 1)
-                except requests.exceptions.HTTPError as e:
-                    logger.warning("HTTP Error", source=source['name'], status_code=e.response.status_code, retry=retry + 1)
-                except Exception as e:
-                    logger.error("Lỗi không xác định", source=source['name'], error=str(e), retry=retry + 1)
-
-                # Nếu không phải retry cuối cùng, chờ trước khi thử lại
-                if retry < max_retries - 1:
-                    wait_time = 5 + retry * 5
-                    logger.info("Chờ trước khi thử lại", wait_seconds=wait_time)
-                    time.sleep(wait_time)
-
-            logger.error("Nguồn thất bại sau tất cả retry", source=source['name'], max_retries=max_retries)
+        finally:
+            if self.source_stats is not None:
+                self.source_stats.save()
 
         logger.error("Không thể thu thập dữ liệu từ bất kỳ nguồn nào", total_sources=len(self.sources))
 
@@ -368,18 +525,55 @@ class LotteryCollector:
         logger.warning("Sử dụng mock data làm fallback cuối cùng")
         return self._generate_fallback_data(date_str)
 
+    def fetch_historical(self, target_date: datetime, max_retries: int = 2,
+                         time_budget: Optional[float] = 120.0) -> Optional[Dict]:
+        """Thu thập kết quả một ngày cũ từ các nguồn có trang theo ngày
+        
+        Không dùng Selenium hay dữ liệu giả lập: trả về None nếu không nguồn nào có kết quả.
+        """
+        date_str = target_date.strftime('%d/%m/%Y')
+        deadline = Deadline(time_budget)
+        
+        # Xoay vòng thứ tự nguồn theo ngày để chia tải giữa các host khi backfill; không lọc
+        # theo circuit breaker của lần chạy hằng ngày (ngắt mạch đó chỉ áp dụng cho trang "hôm nay")
+        dated_sources = [source for source in self.sources if source.get('date_url')]
+        if dated_sources:
+            shift = target_date.toordinal() % len(dated_sources)
+            dated_sources = dated_sources[shift:] + dated_sources[:shift]
+        
+        for source in dated_sources:
+            url = target_date.strftime(source['date_url'])
+            result = self._fetch_from_source(source, date_str, max_retries, deadline=deadline, url=url,
+                                             historical=True)
+            if result or deadline.expired():
+                break
+        else:
+            result = None
+        
+        if self.historical_stats is not None:
+            self.historical_stats.save()
+        if not result:
+            logger.warning("Không thu thập được kết quả ngày cũ", date=date_str)
+        return result
+
     def _try_selenium_fallback(self, target_date: datetime) -> Optional[Dict]:
         """Thử sử dụng Selenium làm fallback"""
         try:
             from selenium_collector import SeleniumLotteryCollector
 
-            selenium_collector = SeleniumLotteryCollector()
+            selenium_collector = SeleniumLotteryCollector(timer=self.timer)
 
             if selenium_collector.driver:
-                result = selenium_collector.fetch_with_selenium(target_date)
+                with self.timer.context('Selenium'), self.timer.span('selenium_fetch'):
+                    result = selenium_collector.fetch_with_selenium(target_date)
                 selenium_collector.cleanup()
 
-                if result and self.validate_lottery_data(result):
+                valid = False
+                if result:
+                    with self.timer.context(result.get('source')), self.timer.span('validate'):
+                        valid = self.validate_lottery_data(result)
+
+                if valid:
                     logger.info("Selenium fallback thành công")
                     return result
                 else:
@@ -423,6 +617,11 @@ class LotteryCollector:
             'is_fallback': True
         }
 
+    def flush_cache(self):
+        """Ghi chỉ mục cache HTTP còn thay đổi chưa ghi (gọi một lần khi kết thúc lần chạy)"""
+        if self.http_cache is not None:
+            self.http_cache.flush()
+
     def validate_lottery_data(self, data: Dict) -> bool:
         """Kiểm tra tính hợp lệ của dữ liệu xổ số"""
         if not data or 'results' not in data:
@@ -438,36 +637,63 @@ class LotteryCollector:
                 return False
 
         # Kiểm tra format số
-        for prize, numbers in results.items():
-            for number in numbers:
-                if not re.match(r'^\d+$', str(number)):
-                    logger.warning("Số không hợp lệ",
-                                   prize=prize, number=number)
-                    return False
+        invalid = self.record_validator.find_non_digit(results)
+        if invalid is not None:
+            prize, number = invalid
+            logger.warning("Số không hợp lệ",
+                           prize=prize, number=number)
+            return False
 
         return True
 
 
+def write_timing(timer: RunTimer, summary_file: str = os.path.join('data', 'run-timing.json')):
+    """Ghi tóm tắt thời gian lần chạy và cộng dồn histogram nếu có XSMB_TIMING_HISTOGRAM"""
+    try:
+        summary = timer.write_summary(summary_file)
+        histogram_file = os.getenv('XSMB_TIMING_HISTOGRAM')
+        if histogram_file:
+            from run_timing import TimingHistogram
+            histogram = TimingHistogram(histogram_file)
+            histogram.add_run(summary)
+            histogram.save()
+        logger.info("Đã ghi thời gian các giai đoạn", duration=summary['duration'],
+                    result_source=summary['result_source'])
+    except Exception as e:
+        logger.error("Lỗi ghi thời gian các giai đoạn", error=str(e))
+
+
 def main():
     """Hàm main để chạy thu thập dữ liệu"""
     collector = LotteryCollector()
-
-    # Thu thập dữ liệu cho ngày hôm nay
-    data = collector.fetch_lottery_data()
-
-    if data and collector.validate_lottery_data(data):
-        # Import data storage module
-        from data_storage import DataStorage
-        storage = DataStorage()
-
-        # Lưu dữ liệu
-        storage.save_data(data)
-        logger.info("Hoàn thành thu thập và lưu trữ dữ liệu")
-
-        return True
-    else:
-        logger.error("Thu thập dữ liệu thất bại hoặc dữ liệu không hợp lệ")
-        return False
+    timer = collector.timer
+
+    try:
+        # Thu thập dữ liệu cho ngày hôm nay
+        data = collector.fetch_lottery_data()
+        timer.result_source = data.get('source') if data else None
+
+        if data and collector.validate_lottery_data(data):
+            # Import data storage module
+            from data_storage import DataStorage
+            storage = DataStorage()
+
+            # Lưu dữ liệu
+            with timer.context('storage'), timer.span('storage_write', target='results'):
+                storage.save_data(data)
+            logger.info("Hoàn thành thu thập và lưu trữ dữ liệu")
+            
+            # Cập nhật điểm số trực tuyến với kỳ quay mới
+            with timer.context('storage'), timer.span('storage_write', target='scores'):
+                OnlineNumberScorer(str(storage.data_dir)).record_draw(data)
+
+            return True
+        else:
+            logger.error("Thu thập dữ liệu thất bại hoặc dữ liệu không hợp lệ")
+            return False
+    finally:
+        collector.flush_cache()
+        write_timing(timer)
 
 
 if __name__ == "__main__":
@@ -107,7 +107,8 @@ class NotificationSystem:
             return False
         
         try:
-            import requests
+            # Session dùng chung: tái sử dụng kết nối thay vì bắt tay TCP+TLS mỗi tin nhắn
+            from http_transport import shared_session
             
             if webhook_type == 'discord':
                 payload = {'content': message}
@@ -116,7 +117,7 @@ class NotificationSystem:
             else:
                 payload = {'message': message}
             
-            response = requests.post(webhook_url, json=payload, timeout=10)
+            response = shared_session().post(webhook_url, json=payload, timeout=(5, 10))
             response.raise_for_status()
             
             logger.info(f"Đã gửi {webhook_type} notification")
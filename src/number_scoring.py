@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module chấm điểm trực tuyến các số lô (2 số cuối) và ba càng (3 số cuối)
+Trạng thái được lưu ra file và cập nhật theo từng kỳ quay mới, không tính lại lịch sử
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# Số lượng số mỗi kỳ có ít nhất 2 / 3 chữ số trong kết quả XSMB
+EXPECTED_PER_DRAW = {'tail': 27, 'ending': 23}
+KIND_SIZES = {'tail': 100, 'ending': 1000}
+
+
+class OnlineNumberScorer:
+    """Chấm điểm 100 lô và 1000 ba càng bằng bộ đếm giảm dần theo hàm mũ
+
+    Với mỗi chu kỳ bán rã h (ngày), bộ đếm được nhân 0.5^(Δngày/h) rồi cộng số lần
+    về của kỳ mới, nên chi phí mỗi kỳ là hằng số. Điểm là trung bình có trọng số của
+    tần suất ước lượng so với kỳ vọng (1.0 = đúng kỳ vọng), cộng thêm một hạng mục
+    "mới về" giảm dần theo số ngày kể từ lần về gần nhất.
+    """
+
+    def __init__(self, data_dir: str = "data", half_lives: Tuple[float, ...] = (7, 30, 90),
+                 weights: Optional[Tuple[float, ...]] = None,
+                 recency_half_life: float = 3.0, recency_weight: float = 0.5):
+        self.data_dir = Path(data_dir)
+        self.json_file = self.data_dir / "lottery-results.json"
+        self.state_file = self.data_dir / "number-scores.json"
+
+        self.half_lives = np.asarray(half_lives, dtype=np.float64)
+        self.weights = np.asarray(weights or [1.0 / len(half_lives)] * len(half_lives))
+        self.recency_half_life = recency_half_life
+        self.recency_weight = recency_weight
+
+        self.reset()
+
+    def reset(self):
+        """Xóa trạng thái về ban đầu"""
+        self.last_ordinal: Optional[int] = None
+        self.draws_seen = 0
+        self.counts = {
+            kind: np.zeros((len(self.half_lives), size))
+            for kind, size in KIND_SIZES.items()
+        }
+        self.last_seen = {
+            kind: np.full(size, -1, dtype=np.int64)
+            for kind, size in KIND_SIZES.items()
+        }
+
+    @property
+    def last_date(self) -> Optional[str]:
+        """Ngày của kỳ quay gần nhất đã được chấm điểm"""
+        if self.last_ordinal is None:
+            return None
+        return datetime.fromordinal(self.last_ordinal).strftime('%d/%m/%Y')
+
+    def _extract(self, record: Dict) -> Dict[str, np.ndarray]:
+        """Lấy 2 số cuối và 3 số cuối của tất cả các số trong một kỳ"""
+        tails, endings = [], []
+        for numbers in record.get('results', {}).values():
+            if not isinstance(numbers, list):
+                continue
+            for num in numbers:
+                num_str = str(num)
+                if len(num_str) >= 2 and num_str.isdigit():
+                    value = int(num_str)
+                    tails.append(value % 100)
+                    if len(num_str) >= 3:
+                        endings.append(value % 1000)
+        return {
+            'tail': np.asarray(tails, dtype=np.int64),
+            'ending': np.asarray(endings, dtype=np.int64)
+        }
+
+    def update(self, record: Dict) -> bool:
+        """Cập nhật trạng thái với một kỳ quay mới, bỏ qua nếu không mới hơn kỳ cuối"""
+        # Dữ liệu giả lập không phản ánh kết quả thật, không đưa vào trạng thái lưu trữ
+        if record.get('is_fallback'):
+            return False
+
+        try:
+            ordinal = datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Ngày không hợp lệ, bỏ qua chấm điểm", date=record.get('date'))
+            return False
+
+        if self.last_ordinal is not None and ordinal <= self.last_ordinal:
+            return False
+
+        if self.last_ordinal is not None:
+            decay = np.power(0.5, (ordinal - self.last_ordinal) / self.half_lives)[:, None]
+            for counts in self.counts.values():
+                counts *= decay
+
+        for kind, values in self._extract(record).items():
+            hits = np.bincount(values, minlength=KIND_SIZES[kind])
+            self.counts[kind] += hits
+            self.last_seen[kind][hits > 0] = ordinal
+
+        self.last_ordinal = ordinal
+        self.draws_seen += 1
+        return True
+
+    def rebuild(self, records: List[Dict]) -> int:
+        """Dựng lại trạng thái từ lịch sử (khi chưa có trạng thái hoặc có kỳ quay bổ sung)"""
+        self.reset()
+        dated = []
+        for record in records:
+            try:
+                dated.append((datetime.strptime(record['date'], '%d/%m/%Y'), record))
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Ngày không hợp lệ, bỏ qua khi dựng điểm số",
+                               date=record.get('date') if isinstance(record, dict) else None)
+        dated.sort(key=lambda item: item[0])
+        return sum(1 for _, record in dated if self.update(record))
+
+    def bootstrap(self) -> int:
+        """Dựng trạng thái ban đầu từ file dữ liệu JSON"""
+        try:
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.warning("Không thể tải dữ liệu để dựng điểm số", error=str(e))
+            data = []
+        return self.rebuild(data if isinstance(data, list) else [])
+
+    def scores(self, kind: str = 'tail') -> np.ndarray:
+        """Điểm hiện tại của tất cả các số thuộc loại `kind` ('tail' hoặc 'ending')"""
+        # Bộ đếm ổn định ở mức rate / (1 - 0.5^(1/h)), quy về tần suất mỗi kỳ
+        retention = np.power(0.5, 1.0 / self.half_lives)[:, None]
+        rates = self.counts[kind] * (1.0 - retention)
+        expected = EXPECTED_PER_DRAW[kind] / KIND_SIZES[kind]
+        frequency_score = self.weights @ (rates / expected)
+
+        recency = np.zeros(KIND_SIZES[kind])
+        if self.last_ordinal is not None:
+            seen = self.last_seen[kind] >= 0
+            ages = self.last_ordinal - self.last_seen[kind][seen]
+            recency[seen] = np.power(0.5, ages / self.recency_half_life)
+
+        return frequency_score + self.recency_weight * recency
+
+    def top(self, kind: str = 'tail', n: int = 5) -> List[Dict]:
+        """Các số có điểm cao nhất"""
+        scores = self.scores(kind)
+        width = 2 if kind == 'tail' else 3
+        order = np.lexsort((np.arange(scores.size), -scores))[:n]
+        return [{'number': f"{num:0{width}d}", 'score': round(float(scores[num]), 4)} for num in order]
+
+    def save(self) -> bool:
+        """Lưu trạng thái ra file"""
+        state = {
+            'half_lives': self.half_lives.tolist(),
+            'last_date': self.last_date,
+            'draws_seen': self.draws_seen,
+            'counts': {kind: counts.tolist() for kind, counts in self.counts.items()},
+            'last_seen': {kind: seen.tolist() for kind, seen in self.last_seen.items()}
+        }
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            return True
+        except Exception as e:
+            logger.error("Lỗi lưu trạng thái điểm số", error=str(e))
+            return False
+
+    def load(self) -> bool:
+        """Tải trạng thái từ file, trả về False nếu chưa có hoặc không dùng được
+
+        File cắt dở hoặc định dạng cũ (thiếu khóa, sai kích thước mảng) được coi như
+        chưa có trạng thái để nơi gọi dựng lại từ lịch sử.
+        """
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+        if not isinstance(state, dict):
+            logger.warning("Trạng thái điểm số không đọc được, cần dựng lại")
+            return False
+        if state.get('half_lives') != self.half_lives.tolist():
+            logger.warning("Chu kỳ bán rã thay đổi, cần dựng lại trạng thái điểm số")
+            return False
+
+        self.reset()
+        try:
+            if state.get('last_date'):
+                self.last_ordinal = datetime.strptime(state['last_date'], '%d/%m/%Y').toordinal()
+            self.draws_seen = int(state.get('draws_seen', 0))
+            for kind, size in KIND_SIZES.items():
+                counts = np.asarray(state['counts'][kind], dtype=np.float64)
+                last_seen = np.asarray(state['last_seen'][kind], dtype=np.int64)
+                if counts.shape != (len(self.half_lives), size) or last_seen.shape != (size,):
+                    raise ValueError(f"Kích thước trạng thái '{kind}' không khớp")
+                self.counts[kind] = counts
+                self.last_seen[kind] = last_seen
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Trạng thái điểm số không đọc được, cần dựng lại", error=str(e))
+            self.reset()
+            return False
+        return True
+
+    def record_draw(self, record: Dict) -> bool:
+        """Cập nhật trạng thái đã lưu với kỳ quay mới
+
+        Tự dựng lại từ lịch sử khi chưa có trạng thái dùng được, hoặc khi kỳ quay cũ
+        hơn kỳ cuối đã chấm điểm (ví dụ ngày bị thiếu vừa được bổ sung) vì bộ đếm
+        giảm dần không thể chèn kỳ quay vào giữa.
+        """
+        if self.load():
+            if self._is_backdated(record):
+                logger.info("Kỳ quay cũ hơn trạng thái, dựng lại điểm số",
+                            date=record.get('date'), last_date=self.last_date)
+                updated = self.bootstrap() > 0
+            else:
+                updated = self.update(record)
+        else:
+            updated = self.bootstrap() > 0
+            logger.info("Đã dựng trạng thái điểm số từ lịch sử", draws=self.draws_seen)
+        return self.save() and updated
+
+    def _is_backdated(self, record: Dict) -> bool:
+        """Kỳ quay thật (không phải giả lập) có ngày trước kỳ cuối đã chấm điểm"""
+        if record.get('is_fallback') or self.last_ordinal is None:
+            return False
+        try:
+            ordinal = datetime.strptime(record['date'], '%d/%m/%Y').toordinal()
+        except (KeyError, TypeError, ValueError):
+            return False
+        return ordinal < self.last_ordinal
+
+
+def main():
+    """Hàm main để dựng lại và hiển thị điểm số hiện tại"""
+    scorer = OnlineNumberScorer()
+    draws = scorer.bootstrap()
+    scorer.save()
+
+    logger.info("Đã dựng trạng thái điểm số", draws=draws, last_date=scorer.last_date)
+    for kind in KIND_SIZES:
+        logger.info("Top điểm số", kind=kind, top=scorer.top(kind))
+
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module giới hạn tốc độ request theo từng host
+Token bucket cho mỗi host, backoff hàm mũ có jitter, Retry-After và ngân sách thời gian
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+import structlog
+
+logger = structlog.get_logger()
+
+
+class Deadline:
+    """Ngân sách thời gian tổng cho một lần thu thập"""
+
+    def __init__(self, seconds: Optional[float], clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.expires_at = None if seconds is None else clock() + seconds
+
+    def remaining(self) -> float:
+        """Số giây còn lại (vô hạn nếu không đặt ngân sách)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self) -> bool:
+        """Đã hết ngân sách thời gian hay chưa"""
+        return self.remaining() <= 0
+
+
+class TokenBucket:
+    """Token bucket an toàn với thread: `rate` token mỗi giây, tối đa `capacity` token"""
+
+    def __init__(self, rate: float, capacity: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Nạp thêm token theo thời gian đã trôi qua"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> float:
+        """Lấy một token nếu có; trả về 0 khi thành công, ngược lại số giây cần chờ"""
+        with self.lock:
+            self._refill(self.clock())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, cancel_event: Optional[threading.Event] = None,
+                deadline: Optional[Deadline] = None) -> bool:
+        """Chờ đến khi có token; trả về False nếu bị hủy hoặc vượt ngân sách thời gian"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None and wait > deadline.remaining():
+                return False
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Một token bucket cho mỗi host; chỉ ngủ khi host đã dùng hết lượt"""
+
+    def __init__(self, rate: float = 0.5, burst: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Token bucket của host trong `url`"""
+        host = urlparse(url).netloc or url
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst, self.clock)
+            return self.buckets[host]
+
+    def acquire(self, url: str, cancel_event: Optional[threading.Event] = None,
+                deadline: Optional[Deadline] = None) -> bool:
+        """Xin lượt gửi request tới host của `url`"""
+        return self.bucket(url).acquire(cancel_event, deadline)
+
+
+def backoff_delay(retry: int, base: float = 1.0, cap: float = 30.0,
+                  rng: Optional[random.Random] = None) -> float:
+    """Thời gian chờ trước lần thử thứ retry+2: full jitter trong [0, min(cap, base * 2^retry)]"""
+    rng = rng or random
+    return rng.uniform(0, min(cap, base * (2 ** retry)))
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Đọc header Retry-After (số giây hoặc HTTP-date), trả về số giây cần chờ"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module đo thời gian từng giai đoạn của một lần thu thập
+Ghi span (kết nối/TTFB, tải, parse, validate, chờ, ghi file...) theo nguồn và lần thử,
+xuất tóm tắt JSON cho mỗi lần chạy và cộng dồn histogram qua nhiều lần chạy (p50/p95)
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+# Cận trên các bucket histogram (giây): tăng theo cấp số nhân √2 từ 10ms đến ~4 phút
+BUCKET_BOUNDS = [round(0.01 * 2 ** (i / 2), 4) for i in range(30)]
+
+
+def response_ttfb(response) -> Optional[float]:
+    """Thời gian từ lúc gửi request đến khi nhận xong header (gồm cả kết nối), nếu có"""
+    elapsed = getattr(response, 'elapsed', None)
+    return elapsed.total_seconds() if elapsed is not None else None
+
+
+class RunTimer:
+    """Thu thập span thời gian của một lần chạy, an toàn với nhiều thread
+
+    Nguồn và lần thử của span lấy từ `context()` của thread hiện tại, nên các hàm tải
+    và parse không cần nhận thêm tham số. Context gắn `cancel_event` thì mọi ghi nhận
+    trong context đó bị bỏ sau khi `cancel()` được gọi.
+    """
+
+    def __init__(self, max_spans: int = 5000, clock=time.perf_counter):
+        self.clock = clock
+        self.max_spans = max_spans
+        self.started = clock()
+        self.started_at = datetime.now().isoformat()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.spans: List[Dict] = []
+        self.dropped_spans = 0
+        self.sources: Dict[str, Dict] = {}
+        self.result_source: Optional[str] = None
+
+    @contextmanager
+    def context(self, source: Optional[str] = None, attempt: Optional[int] = None,
+                cancel_event: Optional[threading.Event] = None):
+        """Gắn nguồn/lần thử (và sự kiện hủy) cho các span ghi trong thread hiện tại"""
+        previous = getattr(self.local, 'context', (None, None))
+        previous_cancel = getattr(self.local, 'cancel_event', None)
+        self.local.context = (source, attempt)
+        self.local.cancel_event = cancel_event
+        try:
+            yield
+        finally:
+            self.local.context = previous
+            self.local.cancel_event = previous_cancel
+
+    def set_attempt(self, attempt: int):
+        """Đổi lần thử trong context hiện tại (giữ nguyên nguồn)"""
+        source, _ = getattr(self.local, 'context', (None, None))
+        self.local.context = (source, attempt)
+
+    def cancel(self, cancel_event: threading.Event):
+        """Set sự kiện hủy khi giữ lock: sau lời gọi này context gắn sự kiện không ghi thêm gì"""
+        with self.lock:
+            cancel_event.set()
+
+    def _cancelled(self) -> bool:
+        """Context của thread hiện tại đã bị hủy (gọi khi đang giữ lock)"""
+        cancel_event = getattr(self.local, 'cancel_event', None)
+        return cancel_event is not None and cancel_event.is_set()
+
+    def _source_stats(self, source: str) -> Dict:
+        """Thống kê của nguồn (gọi khi đang giữ lock)"""
+        return self.sources.setdefault(source, {
+            'attempts': 0, 'success': False, 'time_to_result': None, 'stages': {}
+        })
+
+    def record(self, stage: str, duration: float, start: Optional[float] = None, **fields):
+        """Ghi một span đã đo xong"""
+        source, attempt = getattr(self.local, 'context', (None, None))
+        source = fields.pop('source', source) or 'unknown'
+        attempt = fields.pop('attempt', attempt)
+        if start is None:
+            start = self.clock() - duration
+
+        span = {
+            'stage': stage,
+            'source': source,
+            'attempt': attempt,
+            'start': round(start - self.started, 4),
+            'duration': round(duration, 4),
+        }
+        span.update(fields)
+
+        with self.lock:
+            if self._cancelled():
+                return
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped_spans += 1
+            stage_stats = self._source_stats(source)['stages'].setdefault(
+                stage, {'count': 0, 'total': 0.0, 'max': 0.0}
+            )
+            stage_stats['count'] += 1
+            stage_stats['total'] += duration
+            stage_stats['max'] = max(stage_stats['max'], duration)
+
+    @contextmanager
+    def span(self, stage: str, **fields):
+        """Đo thời gian khối lệnh như một span"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.clock() - start, start=start, **fields)
+
+    def record_attempt(self, source: str):
+        """Đếm một lần thử request tới nguồn"""
+        with self.lock:
+            if self._cancelled():
+                return
+            self._source_stats(source)['attempts'] += 1
+
+    def record_result(self, source: str, success: bool):
+        """Ghi nhận nguồn có kết quả hợp lệ: thời gian từ đầu lần chạy đến khi có kết quả"""
+        elapsed = self.clock() - self.started
+        with self.lock:
+            if self._cancelled():
+                return
+            stats = self._source_stats(source)
+            if success and not stats['success']:
+                stats['success'] = True
+                stats['time_to_result'] = round(elapsed, 4)
+
+    def summary(self) -> Dict:
+        """Tóm tắt lần chạy: tổng theo nguồn/giai đoạn và danh sách span"""
+        with self.lock:
+            sources = {}
+            for name, stats in self.sources.items():
+                sources[name] = dict(stats, stages={
+                    stage: {'count': s['count'], 'total': round(s['total'], 4), 'max': round(s['max'], 4)}
+                    for stage, s in stats['stages'].items()
+                })
+            return {
+                'started_at': self.started_at,
+                'duration': round(self.clock() - self.started, 4),
+                'result_source': self.result_source,
+                'sources': sources,
+                'spans': sorted(self.spans, key=lambda span: span['start']),
+                'dropped_spans': self.dropped_spans
+            }
+
+    def write_summary(self, output_file: str = "data/run-timing.json") -> Dict:
+        """Ghi tóm tắt lần chạy ra file JSON"""
+        summary = self.summary()
+        path = Path(output_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+class TimingHistogram:
+    """Histogram thời gian theo nguồn và giai đoạn, cộng dồn qua nhiều lần chạy"""
+
+    def __init__(self, histogram_file: str = "data/timing-histogram.json"):
+        self.histogram_file = Path(histogram_file)
+        self.data = self.load()
+
+    def load(self) -> Dict:
+        """Tải histogram đã lưu; bucket khác cấu hình hiện tại thì bắt đầu lại"""
+        try:
+            with open(self.histogram_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        if not isinstance(data, dict) or data.get('bounds') != BUCKET_BOUNDS:
+            data = {'bounds': BUCKET_BOUNDS, 'runs': 0, 'series': {}}
+        return data
+
+    def add(self, key: str, duration: float):
+        """Thêm một giá trị vào chuỗi `key` (ví dụ 'XoSoDaiPhat/download')"""
+        counts = self.data['series'].setdefault(key, [0] * (len(BUCKET_BOUNDS) + 1))
+        counts[bisect_left(BUCKET_BOUNDS, duration)] += 1
+
+    def add_run(self, summary: Dict):
+        """Cộng dồn span và thời gian đến kết quả của một lần chạy"""
+        for span in summary.get('spans', []):
+            self.add(f"{span['source']}/{span['stage']}", span['duration'])
+        for source, stats in summary.get('sources', {}).items():
+            if stats.get('time_to_result') is not None:
+                self.add(f"{source}/time_to_result", stats['time_to_result'])
+        self.data['runs'] += 1
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Phân vị `q` (0-100) của chuỗi, xấp xỉ bằng cận trên của bucket
+
+        Giá trị vượt bucket lớn nhất được tính bằng cận trên của bucket lớn nhất.
+        """
+        counts = self.data['series'].get(key)
+        if not counts or not sum(counts):
+            return None
+        target = sum(counts) * q / 100
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return BUCKET_BOUNDS[min(i, len(BUCKET_BOUNDS) - 1)]
+        return None
+
+    def report(self) -> Dict[str, Dict]:
+        """p50/p95 và số mẫu của từng chuỗi"""
+        return {
+            key: {
+                'count': sum(counts),
+                'p50': self.percentile(key, 50),
+                'p95': self.percentile(key, 95)
+            }
+            for key, counts in sorted(self.data['series'].items())
+        }
+
+    def save(self) -> bool:
+        """Ghi histogram kèm báo cáo p50/p95"""
+        try:
+            self.histogram_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.histogram_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(self.data, report=self.report()), f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            logger.error("Lỗi lưu histogram thời gian", error=str(e))
+            return False
@@ -18,22 +18,30 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
+from run_timing import RunTimer
+from source_registry import JS_SOURCE_SPECS, SourceRegistry
+
 logger = structlog.get_logger()
 
+XOSO123 = SourceRegistry(JS_SOURCE_SPECS).get('xoso123')
+
 
 class SeleniumLotteryCollector:
     """Thu thập dữ liệu xổ số sử dụng Selenium cho JavaScript sites"""
     
-    def __init__(self):
+    def __init__(self, timer: Optional[RunTimer] = None):
         self.driver = None
-        self.setup_driver()
+        # Đo thời gian khởi tạo driver và từng nguồn (dùng chung timer của LotteryCollector nếu có)
+        self.timer = timer or RunTimer()
+        with self.timer.context('Selenium'), self.timer.span('selenium_setup'):
+            self.setup_driver()
         
         # JavaScript-heavy sources
         self.js_sources = [
             {
                 'name': 'XoSo123',
-                'url': 'https://xoso123.com/xsmb',
-                'wait_selector': '.kqxs-table',
+                'url': XOSO123.spec['url'],
+                'wait_selector': XOSO123.spec['wait_selector'],
                 'parser': self._parse_xoso123
             },
             {
@@ -93,28 +101,12 @@ class SeleniumLotteryCollector:
         logger.info("Starting Selenium data collection", date=date_str)
         
         for source in self.js_sources:
+            name = f"{source['name']} (Selenium)"
             try:
-                logger.info("Trying Selenium source", source_name=source['name'])
-                
-                # Navigate to page
-                self.driver.get(source['url'])
-                
-                # Wait for page to load
-                wait = WebDriverWait(self.driver, 20)
-                
-                # Wait for specific element
-                if source.get('wait_selector'):
-                    try:
-                        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, source['wait_selector'])))
-                    except:
-                        logger.warning("Wait selector not found, continuing anyway", selector=source['wait_selector'])
-                
-                # Additional wait for JavaScript to execute
-                time.sleep(5)
-                
-                # Get page source and parse
-                page_source = self.driver.page_source
-                result = source['parser'](page_source, date_str)
+                self.timer.record_attempt(name)
+                with self.timer.context(name, 1):
+                    result = self._fetch_source(source, date_str)
+                self.timer.record_result(name, result is not None)
                 
                 if result:
                     logger.info("Selenium collection successful", source=source['name'])
@@ -127,61 +119,44 @@ class SeleniumLotteryCollector:
         logger.error("All Selenium sources failed")
         return None
     
+    def _fetch_source(self, source: Dict, date_str: str) -> Optional[Dict]:
+        """Tải một trang bằng WebDriver, chờ JavaScript rồi parse page source"""
+        logger.info("Trying Selenium source", source_name=source['name'])
+        
+        # Navigate to page
+        with self.timer.span('download'):
+            self.driver.get(source['url'])
+        
+        with self.timer.span('sleep', reason='js_render'):
+            # Wait for page to load
+            wait = WebDriverWait(self.driver, 20)
+            
+            # Wait for specific element
+            if source.get('wait_selector'):
+                try:
+                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, source['wait_selector'])))
+                except:
+                    logger.warning("Wait selector not found, continuing anyway", selector=source['wait_selector'])
+            
+            # Additional wait for JavaScript to execute
+            time.sleep(5)
+        
+        # Get page source and parse
+        with self.timer.span('parse'):
+            page_source = self.driver.page_source
+            return source['parser'](page_source, date_str)
+    
     def _parse_xoso123(self, page_source: str, date_str: str) -> Optional[Dict]:
         """Parse dữ liệu từ XoSo123"""
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(page_source, 'html.parser')
-            
-            results = {}
-            
-            # Tìm bảng kết quả
-            tables = soup.find_all('table')
-            
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        prize_text = cells[0].get_text(strip=True)
-                        numbers_text = cells[1].get_text(strip=True)
-                        
-                        # Map prize names
-                        prize_mapping = {
-                            'ĐB': 'Giải Đặc Biệt',
-                            'G1': 'Giải Nhất',
-                            'G2': 'Giải Nhì',
-                            'G3': 'Giải Ba',
-                            'G4': 'Giải Tư',
-                            'G5': 'Giải Năm',
-                            'G6': 'Giải Sáu',
-                            'G7': 'Giải Bảy'
-                        }
-                        
-                        prize_name = prize_mapping.get(prize_text, None)
-                        if prize_name:
-                            numbers = re.findall(r'\d{2,5}', numbers_text)
-                            if numbers:
-                                results[prize_name] = numbers
-            
-            if len(results) >= 3:
-                return {
-                    'date': date_str,
-                    'source': 'XoSo123 (Selenium)',
-                    'results': results,
-                    'collected_at': datetime.now().isoformat()
-                }
-                
-        except Exception as e:
-            logger.error("Error parsing XoSo123", error=str(e))
-            
-        return None
+        from lottery_collector import make_soup
+        return XOSO123.parse(make_soup(page_source, tables_only=XOSO123.tables_only),
+                             date_str, datetime.now().isoformat())
     
     def _parse_soicaumb(self, page_source: str, date_str: str) -> Optional[Dict]:
         """Parse dữ liệu từ SoiCauMB"""
         try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(page_source, 'html.parser')
+            from lottery_collector import make_soup
+            soup = make_soup(page_source)
             
             results = {}
             
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module khai báo các nguồn thu thập kết quả XSMB
+Mỗi nguồn là một spec (URL, cách tìm bảng, bảng tên giải, regex số); bộ nhận dạng
+được dựng một lần khi khởi tạo thay vì tạo lại trong mỗi lần parse
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+import structlog
+
+from data_validator import CompiledRecordValidator
+
+logger = structlog.get_logger()
+
+# Bảng đủ 27 số hợp lệ (dùng để chọn bảng kết quả khi trang có nhiều bảng)
+is_complete_results = CompiledRecordValidator().is_complete
+
+PRIZE_ORDER = (
+    'Giải Đặc Biệt', 'Giải Nhất', 'Giải Nhì', 'Giải Ba',
+    'Giải Tư', 'Giải Năm', 'Giải Sáu', 'Giải Bảy'
+)
+
+# Ký hiệu ngắn dùng trên nhiều trang (ĐB, G1...G7)
+SHORT_LABELS = dict(zip(('ĐB', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'G7'), PRIZE_ORDER))
+
+# Từ khóa nhận dạng tên giải đầy đủ, xét theo thứ tự (giải đầu tiên khớp được chọn)
+PRIZE_KEYWORDS = (
+    ('Giải Đặc Biệt', ('đặc biệt', 'db')),
+    ('Giải Nhất', ('nhất', '1')),
+    ('Giải Nhì', ('nhì', '2')),
+    ('Giải Ba', ('ba', '3')),
+    ('Giải Tư', ('tư', '4')),
+    ('Giải Năm', ('năm', '5')),
+    ('Giải Sáu', ('sáu', '6')),
+    ('Giải Bảy', ('bảy', '7')),
+)
+
+# Số chữ số của mỗi giải theo thứ tự xuất hiện trên trang (dùng cho kind='sequence')
+SEQUENCE_LAYOUT = (
+    # (giải, số chữ số, vị trí bắt đầu, vị trí kết thúc, số lượng tối thiểu của nhóm)
+    ('Giải Đặc Biệt', 5, 0, 1, 8),
+    ('Giải Nhất', 5, 1, 2, 8),
+    ('Giải Nhì', 5, 2, 4, 8),
+    ('Giải Ba', 5, 4, 10, 8),
+    ('Giải Tư', 4, 0, 4, 10),
+    ('Giải Năm', 4, 4, 10, 10),
+    ('Giải Sáu', 3, 0, 3, 3),
+    ('Giải Bảy', 2, 0, 4, 4),
+)
+
+# kind:
+#   'table'    - đọc các dòng <tr>: ô đầu là tên giải, ô thứ hai là các số
+#   'text'     - tìm từng giải bằng regex trên toàn bộ text của trang
+#   'sequence' - lấy mọi số trên trang và chia theo số chữ số và thứ tự giải
+SOURCE_SPECS: List[Dict] = [
+    {
+        'key': 'xoso_com_vn',
+        'name': 'XoSo.com.vn',
+        'url': 'https://xoso.com.vn/xsmb-c1.html',
+        'date_url': 'https://xoso.com.vn/xsmb-%d-%m-%Y.html',
+        'kind': 'table',
+        'label_keywords': PRIZE_KEYWORDS,
+        'number_pattern': r'\d{2,5}',
+    },
+    {
+        'key': 'vtcnews',
+        'name': 'VTCNews',
+        'url': 'https://vtcnews.vn/xo-so/xsmb',
+        'kind': 'text',
+        'prize_patterns': {
+            'Giải Đặc Biệt': r'(?:đặc biệt|ĐB)[:\s]*(\d{5})',
+            'Giải Nhất': r'(?:giải nhất|G1)[:\s]*(\d{5})',
+            'Giải Nhì': r'(?:giải nhì|G2)[:\s]*(\d{5}(?:\s*-\s*\d{5})*)',
+            'Giải Ba': r'(?:giải ba|G3)[:\s]*(\d{5}(?:\s*-\s*\d{5})*)',
+            'Giải Tư': r'(?:giải tư|G4)[:\s]*(\d{4}(?:\s*-\s*\d{4})*)',
+            'Giải Năm': r'(?:giải năm|G5)[:\s]*(\d{4}(?:\s*-\s*\d{4})*)',
+            'Giải Sáu': r'(?:giải sáu|G6)[:\s]*(\d{3}(?:\s*-\s*\d{3})*)',
+            'Giải Bảy': r'(?:giải bảy|G7)[:\s]*(\d{2}(?:\s*-\s*\d{2})*)'
+        },
+    },
+    {
+        'key': 'xosodaiphat',
+        'name': 'XoSoDaiPhat',
+        'url': 'https://xosodaiphat.com/xsmb-xo-so-mien-bac.html',
+        'date_url': 'https://xosodaiphat.com/xsmb-%d-%m-%Y.html',
+        'kind': 'table',
+        'table_keywords': ('xsmb', 'miền bắc'),
+        'labels': SHORT_LABELS,
+        'number_pattern': r'\d{2,5}',
+    },
+    {
+        'key': 'xosoyenbai',
+        'name': 'XoSoYenBai',
+        'url': 'https://xosoyenbai.vn/index.php/ketqua',
+        'kind': 'sequence',
+    },
+]
+
+
+# Nguồn cần render JavaScript (SeleniumLotteryCollector), parse trên page source
+JS_SOURCE_SPECS: List[Dict] = [
+    {
+        'key': 'xoso123',
+        'name': 'XoSo123 (Selenium)',
+        'url': 'https://xoso123.com/xsmb',
+        'wait_selector': '.kqxs-table',
+        'kind': 'table',
+        'labels': SHORT_LABELS,
+        'number_pattern': r'\d{2,5}',
+    },
+]
+
+def table_mentions(table, keywords: Tuple[str, ...]) -> bool:
+    """Bảng có chứa từ khóa trong nội dung hoặc thuộc tính (không serialize lại HTML)"""
+    parts = [table.get_text(' ')]
+    for tag in (table, *table.find_all(True)):
+        for value in tag.attrs.values():
+            parts.append(' '.join(value) if isinstance(value, list) else str(value))
+    haystack = ' '.join(parts).lower()
+    return any(keyword in haystack for keyword in keywords)
+
+
+def page_shows_date(soup, date_str: str) -> bool:
+    """Trang có ghi ngày quay `date_str` (dd/mm/YYYY, dd-mm-YYYY, dd.mm.YYYY, có thể bỏ số 0 đầu)"""
+    day, month, year = (int(part) for part in date_str.split('/'))
+    pattern = rf'(?<!\d)0?{day}[/.-]0?{month}[/.-]{year}(?!\d)'
+    return re.search(pattern, soup.get_text(' ')) is not None
+
+
+class CompiledSource:
+    """Spec nguồn đã dựng sẵn regex và bộ nhận dạng tên giải"""
+
+    def __init__(self, spec: Dict):
+        self.spec = spec
+        self.key = spec['key']
+        self.name = spec['name']
+        self.kind = spec.get('kind', 'table')
+        self.min_prizes = spec.get('min_prizes', 3)
+        # Chỉ nguồn đọc bảng mới có thể parse riêng các thẻ <table>
+        self.tables_only = self.kind == 'table'
+
+        self.labels: Dict[str, str] = dict(spec.get('labels', {}))
+        self.label_keywords = tuple(spec.get('label_keywords', ()))
+        self.table_keywords = tuple(spec.get('table_keywords', ()))
+        self.table_selector: Optional[str] = spec.get('table_selector')
+        self.number_regex = re.compile(spec.get('number_pattern', r'\d{2,5}'))
+        self.prize_regexes = {
+            prize: re.compile(pattern, re.IGNORECASE)
+            for prize, pattern in spec.get('prize_patterns', {}).items()
+        }
+
+        # Kết quả nhận dạng theo nguyên văn ô tên giải: mỗi nhãn chỉ phân loại một lần
+        self._label_cache: Dict[str, Optional[str]] = {}
+
+    def classify(self, label: str) -> Optional[str]:
+        """Tên giải chuẩn cho nhãn trên trang, None nếu không phải dòng giải thưởng"""
+        try:
+            return self._label_cache[label]
+        except KeyError:
+            pass
+
+        prize = self.labels.get(label)
+        if prize is None and self.label_keywords:
+            lowered = label.lower()
+            prize = next(
+                (name for name, keywords in self.label_keywords
+                 if any(keyword in lowered for keyword in keywords)),
+                None
+            )
+        self._label_cache[label] = prize
+        return prize
+
+    def parse_table(self, table) -> Dict[str, List[str]]:
+        """Đọc các dòng giải thưởng của một bảng; {} nếu bảng không phải bảng kết quả"""
+        results = {}
+        # Kiểm tra xem table có chứa dữ liệu xổ số không
+        if self.table_keywords and not table_mentions(table, self.table_keywords):
+            return results
+
+        for row in table.find_all('tr'):
+            cells = row.find_all(['td', 'th'])
+            if len(cells) < 2:
+                continue
+            prize_name = self.classify(cells[0].get_text(strip=True))
+            if prize_name:
+                numbers = self.number_regex.findall(cells[1].get_text(strip=True))
+                if numbers:
+                    results[prize_name] = numbers
+        return results
+
+    def _parse_tables(self, soup) -> Dict[str, List[str]]:
+        """Đọc các dòng giải thưởng trong bảng kết quả
+
+        Bảng đầu tiên tự nó đủ 27 số được chọn (trang thường đặt kỳ mới nhất trước các
+        kỳ cũ); nếu không bảng nào đủ thì gộp mọi bảng, dòng sau ghi đè dòng trước.
+        Tải theo luồng dựa vào quy tắc này để dừng ngay sau bảng đủ số đầu tiên.
+        """
+        results = {}
+        tables = soup.select(self.table_selector) if self.table_selector else soup.find_all('table')
+
+        for table in tables:
+            found = self.parse_table(table)
+            if is_complete_results(found):
+                return found
+            results.update(found)
+        return results
+
+    def _parse_text(self, soup) -> Dict[str, List[str]]:
+        """Tìm từng giải bằng regex trên text của trang"""
+        results = {}
+        text_content = soup.get_text()
+        for prize_name, regex in self.prize_regexes.items():
+            match = regex.search(text_content)
+            if match:
+                numbers = re.findall(r'\d+', match.group(1))
+                if numbers:
+                    results[prize_name] = numbers
+        return results
+
+    def _parse_sequence(self, soup) -> Dict[str, List[str]]:
+        """Chia các số trên trang theo số chữ số và thứ tự giải XSMB"""
+        results = {}
+        by_digits: Dict[int, List[str]] = {2: [], 3: [], 4: [], 5: []}
+        for number in self.number_regex.findall(soup.get_text()):
+            by_digits[len(number)].append(number)
+
+        for prize_name, digits, start, end, minimum in SEQUENCE_LAYOUT:
+            group = by_digits[digits]
+            if len(group) >= minimum:
+                results[prize_name] = group[start:end]
+        return results
+
+    def parse(self, soup, date_str: str, collected_at: str, source_name: Optional[str] = None,
+              min_prizes: Optional[int] = None) -> Optional[Dict]:
+        """Parse trang nguồn thành bản ghi, None nếu không đủ giải thưởng
+
+        `min_prizes` thay ngưỡng của spec (ví dụ 1 khi đọc kết quả đang quay dở).
+        """
+        try:
+            if self.kind == 'text':
+                results = self._parse_text(soup)
+            elif self.kind == 'sequence':
+                results = self._parse_sequence(soup)
+            else:
+                results = self._parse_tables(soup)
+
+            if results and len(results) >= (self.min_prizes if min_prizes is None else min_prizes):
+                return {
+                    'date': date_str,
+                    'source': source_name or self.name,
+                    'results': results,
+                    'collected_at': collected_at
+                }
+
+        except Exception as e:
+            logger.error(f"Lỗi parse {self.name}", error=str(e))
+
+        return None
+
+
+class SourceRegistry:
+    """Danh sách nguồn đã biên dịch, tra cứu theo key"""
+
+    def __init__(self, specs: Optional[List[Dict]] = None):
+        self.sources: Dict[str, CompiledSource] = {}
+        for spec in specs if specs is not None else SOURCE_SPECS:
+            self.register(spec)
+
+    def register(self, spec: Dict) -> CompiledSource:
+        """Thêm (hoặc thay) một nguồn từ spec"""
+        compiled = CompiledSource(spec)
+        self.sources[compiled.key] = compiled
+        return compiled
+
+    def get(self, key: str) -> CompiledSource:
+        return self.sources[key]
+
+    def __iter__(self):
+        return iter(self.sources.values())
+
+    def __len__(self) -> int:
+        return len(self.sources)
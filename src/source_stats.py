@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module thống kê độ tin cậy của từng nguồn thu thập
+Lưu độ trễ và tỷ lệ thành công (EWMA) để sắp xếp nguồn và ngắt mạch nguồn hỏng lâu ngày
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+import structlog
+
+logger = structlog.get_logger()
+
+# Giá trị ban đầu lạc quan cho nguồn chưa có thống kê, để nguồn mới vẫn được thử
+DEFAULT_LATENCY = 5.0
+DEFAULT_SUCCESS = 1.0
+MIN_SUCCESS = 0.05
+
+
+class SourceStats:
+    """Thống kê theo nguồn: EWMA độ trễ, EWMA tỷ lệ thành công và circuit breaker"""
+
+    def __init__(self, stats_file: str = "data/source-stats.json", alpha: float = 0.3,
+                 failure_threshold: int = 3, cooldown_seconds: float = 6 * 3600,
+                 clock=time.time):
+        self.stats_file = Path(stats_file)
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.sources: Dict[str, Dict] = self.load()
+
+    def load(self) -> Dict[str, Dict]:
+        """Tải thống kê đã lưu"""
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self) -> bool:
+        """Ghi thống kê ra file nếu có thay đổi"""
+        with self.lock:
+            if not self.dirty:
+                return True
+            try:
+                self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.stats_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.sources, f, ensure_ascii=False, indent=2)
+                self.dirty = False
+                return True
+            except Exception as e:
+                logger.error("Lỗi lưu thống kê nguồn", error=str(e))
+                return False
+
+    def record(self, name: str, success: bool, latency: float):
+        """Ghi nhận kết quả một lần thu thập từ nguồn"""
+        now = self.clock()
+        with self.lock:
+            stats = self.sources.setdefault(name, {
+                'attempts': 0,
+                'successes': 0,
+                'ewma_latency': None,
+                'ewma_success': DEFAULT_SUCCESS,
+                'consecutive_failures': 0,
+                'last_success_at': None,
+                'last_failure_at': None,
+                'open_until': None
+            })
+            stats['attempts'] += 1
+            stats['ewma_success'] = (1 - self.alpha) * stats['ewma_success'] + self.alpha * float(success)
+
+            if success:
+                stats['successes'] += 1
+                stats['consecutive_failures'] = 0
+                stats['last_success_at'] = now
+                stats['open_until'] = None
+                # Độ trễ chỉ tính trên lần thành công (thời gian đến khi có kết quả hợp lệ)
+                previous = stats['ewma_latency']
+                stats['ewma_latency'] = latency if previous is None else (
+                    (1 - self.alpha) * previous + self.alpha * latency
+                )
+            else:
+                stats['consecutive_failures'] += 1
+                stats['last_failure_at'] = now
+                if stats['consecutive_failures'] >= self.failure_threshold:
+                    # Mỗi lần thất bại thêm khi đã ngắt mạch thì thời gian nghỉ tăng gấp đôi
+                    extra = stats['consecutive_failures'] - self.failure_threshold
+                    stats['open_until'] = now + self.cooldown_seconds * (2 ** min(extra, 5))
+                    logger.warning("Ngắt mạch nguồn", source=name,
+                                   consecutive_failures=stats['consecutive_failures'])
+            self.dirty = True
+
+    def score(self, name: str) -> float:
+        """Thời gian kỳ vọng đến khi có kết quả hợp lệ (càng nhỏ càng tốt)"""
+        stats = self.sources.get(name)
+        if not stats:
+            return DEFAULT_LATENCY / DEFAULT_SUCCESS
+        latency = stats['ewma_latency'] if stats['ewma_latency'] is not None else DEFAULT_LATENCY
+        return latency / max(stats['ewma_success'], MIN_SUCCESS)
+
+    def is_available(self, name: str) -> bool:
+        """Nguồn không bị ngắt mạch (hoặc đã hết thời gian nghỉ, cho thử lại)"""
+        stats = self.sources.get(name)
+        if not stats or not stats.get('open_until'):
+            return True
+        return self.clock() >= stats['open_until']
+
+    def order(self, sources: List[Dict]) -> List[Dict]:
+        """Sắp xếp nguồn theo điểm, bỏ nguồn đang ngắt mạch
+
+        Nếu mọi nguồn đều đang ngắt mạch thì vẫn thử tất cả theo điểm.
+        """
+        ranked = sorted(sources, key=lambda source: self.score(source['name']))
+        available = [source for source in ranked if self.is_available(source['name'])]
+        skipped = [source['name'] for source in ranked if source not in available]
+        if skipped:
+            logger.info("Bỏ qua nguồn đang ngắt mạch", sources=skipped)
+        return available or ranked
+
+    def summary(self) -> List[Dict]:
+        """Tóm tắt thống kê các nguồn theo thứ tự điểm"""
+        return [
+            {
+                'source': name,
+                'score': round(self.score(name), 3),
+                'success_rate': round(stats['successes'] / stats['attempts'], 3) if stats['attempts'] else None,
+                'ewma_latency': stats['ewma_latency'],
+                'available': self.is_available(name)
+            }
+            for name, stats in sorted(self.sources.items(), key=lambda item: self.score(item[0]))
+        ]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Response và session HTTP giả dùng chung cho các test collector
+"""
+
+import threading
+import requests
+
+
+class FakeResponse:
+    """Response giả với status, body và header; `chunks` cho body tải theo luồng"""
+
+    def __init__(self, status_code=200, content=b'<html></html>', headers=None, chunks=None,
+                 elapsed=None):
+        self.status_code = status_code
+        self.chunks = list(chunks) if chunks is not None else [content]
+        self.content = b''.join(self.chunks)
+        self.headers = headers or {}
+        self.elapsed = elapsed
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Session giả ghi lại URL, header và chế độ stream của từng request
+
+    Response lấy từ `handler(url, headers)` nếu có, ngược lại lần lượt từ `responses`
+    (response cuối cùng được trả cho mọi request sau đó).
+    """
+
+    def __init__(self, *responses, handler=None):
+        self.responses = list(responses)
+        self.handler = handler
+        self.response = self.responses[0] if self.responses else None
+        self.calls = []
+        self.requests = []
+        self.streamed = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        with self.lock:
+            self.calls.append(url)
+            self.requests.append(dict(headers or {}))
+            self.streamed.append(stream)
+        if self.handler is not None:
+            return self.handler(url, dict(headers or {}))
+        with self.lock:
+            if len(self.responses) > 1:
+                self.response = self.responses.pop(0)
+            else:
+                self.response = self.responses[0]
+            return self.response
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module thu thập bù dữ liệu lịch sử
+"""
+
+import pytest
+import json
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backfill import HistoricalBackfill, draw_dates
+from data_storage import DataStorage
+
+
+class FakeCollector:
+    """Collector giả: trả kết quả cho mọi ngày trừ các ngày trong `missing`"""
+
+    def __init__(self, missing=(), interrupt_on=None):
+        self.missing = set(missing)
+        self.interrupt_on = interrupt_on
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch_historical(self, target_date):
+        date_str = target_date.strftime('%d/%m/%Y')
+        with self.lock:
+            self.fetched.append(date_str)
+        if date_str == self.interrupt_on:
+            raise KeyboardInterrupt
+        if date_str in self.missing:
+            return None
+        return {
+            'date': date_str,
+            'source': 'Test',
+            'results': {'Giải Đặc Biệt': ['12345']},
+            'collected_at': datetime.now().isoformat()
+        }
+
+
+class TestHistoricalBackfill:
+    """Test backfill có checkpoint"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.storage = DataStorage(self.temp_dir)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_backfill(self, collector):
+        return HistoricalBackfill(collector, self.storage, max_workers=2, batch_size=2)
+
+    def test_draw_dates_skip_tet(self):
+        """Test bỏ các ngày nghỉ Tết khỏi lịch quay"""
+        dates = draw_dates(datetime(2025, 1, 27), datetime(2025, 2, 2))
+        assert [d.strftime('%d/%m') for d in dates] == ['27/01', '01/02', '02/02']
+
+    def test_backfill_writes_batches_and_resumes(self):
+        """Test ghi theo batch, lưu tiến độ và chạy tiếp không tải lại"""
+        collector = FakeCollector(missing={'03/03/2025'})
+        stats = self.make_backfill(collector).run_range(datetime(2025, 3, 1), datetime(2025, 3, 5))
+        assert stats == {'pending': 5, 'collected': 4, 'failed': 1, 'saved': 4}
+
+        with open(self.storage.json_file, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        assert [r['date'] for r in saved] == ['05/03/2025', '04/03/2025', '02/03/2025', '01/03/2025']
+        with open(self.storage.csv_file, 'r', encoding='utf-8') as f:
+            assert len(f.readlines()) == 5
+
+        checkpoint = self.make_backfill(collector).load_checkpoint()
+        assert len(checkpoint['done']) == 4
+        assert checkpoint['failed'] == {'03/03/2025': 1}
+
+        # Chạy lại: chỉ thử lại ngày thất bại
+        collector = FakeCollector()
+        stats = self.make_backfill(collector).run_range(datetime(2025, 3, 1), datetime(2025, 3, 5))
+        assert collector.fetched == ['03/03/2025']
+        assert stats['collected'] == 1
+
+    def test_interrupted_backfill_keeps_progress(self):
+        """Test bị ngắt giữa chừng vẫn lưu các ngày đã thu thập"""
+        backfill = HistoricalBackfill(FakeCollector(interrupt_on='04/03/2025'), self.storage,
+                                      max_workers=1, batch_size=10)
+        with pytest.raises(KeyboardInterrupt):
+            backfill.run_range(datetime(2025, 3, 1), datetime(2025, 3, 6))
+
+        assert backfill.load_checkpoint()['done'] == {'01/03/2025', '02/03/2025', '03/03/2025'}
+
+        collector = FakeCollector()
+        self.make_backfill(collector).run_range(datetime(2025, 3, 1), datetime(2025, 3, 6))
+        assert sorted(collector.fetched) == ['04/03/2025', '05/03/2025', '06/03/2025']
+
+    def test_failed_flush_is_not_retried_in_finally(self):
+        """Test lỗi ghi batch được báo nguyên vẹn, không ghi lại batch lỗi khi dọn dẹp"""
+        calls = []
+
+        def failing_save_batch(records):
+            calls.append(len(records))
+            return None
+
+        self.storage.save_batch = failing_save_batch
+        with pytest.raises(RuntimeError, match="Không thể ghi batch"):
+            self.make_backfill(FakeCollector()).run_range(datetime(2025, 3, 1), datetime(2025, 3, 5))
+        assert calls == [2]
+        assert not self.make_backfill(FakeCollector()).checkpoint_file.exists()
+
+    def test_save_batch_skips_existing(self):
+        """Test lưu batch bỏ qua bản ghi đã có"""
+        record = FakeCollector().fetch_historical(datetime(2025, 3, 1))
+        assert self.storage.save_batch([record]) == 1
+        assert self.storage.save_batch([record, dict(record, date='02/03/2025')]) == 1
+        assert self.storage.get_statistics()['total_records'] == 2
+
+    def test_save_batch_writes_both_files_or_neither(self):
+        """Test lỗi khi ghi JSON thì CSV được trả về như cũ"""
+        record = FakeCollector().fetch_historical(datetime(2025, 3, 1))
+        assert self.storage.save_batch([record]) == 1
+        json_before = self.storage.json_file.read_bytes()
+        csv_before = self.storage.csv_file.read_bytes()
+
+        import data_storage
+        original_replace = data_storage.os.replace
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+
+        data_storage.os.replace = failing_replace
+        try:
+            assert self.storage.save_batch([dict(record, date='02/03/2025')]) is None
+        finally:
+            data_storage.os.replace = original_replace
+        assert self.storage.json_file.read_bytes() == json_before
+        assert self.storage.csv_file.read_bytes() == csv_before
+        assert not list(self.storage.data_dir.glob('*.tmp'))
+
+
+def test_fetch_historical_uses_dated_urls():
+    """Test collector chỉ dùng nguồn có trang theo ngày, xoay vòng thứ tự nguồn và ghi thống kê riêng"""
+    from lottery_collector import LotteryCollector
+    from source_stats import SourceStats
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        # Nguồn theo ngày đang ngắt mạch trong thống kê hằng ngày vẫn được dùng cho ngày cũ
+        collector.source_stats = SourceStats(os.path.join(temp_dir, 'stats.json'), failure_threshold=1)
+        collector.source_stats.record('XoSo.com.vn', False, 1.0)
+        collector.source_stats.record('XoSoDaiPhat', False, 1.0)
+        collector.historical_stats = SourceStats(os.path.join(temp_dir, 'historical.json'))
+
+        urls = []
+
+        def fetch(source, date_str, max_retries, deadline=None, url=None, historical=False):
+            assert historical
+            urls.append(url)
+            return None
+
+        collector._fetch_from_source = fetch
+
+        assert collector.fetch_historical(datetime(2025, 3, 1)) is None
+        assert collector.fetch_historical(datetime(2025, 3, 2)) is None
+        assert sorted(urls[:2]) == ['https://xoso.com.vn/xsmb-01-03-2025.html',
+                                    'https://xosodaiphat.com/xsmb-01-03-2025.html']
+        assert urls[0].split('/')[2] != urls[2].split('/')[2]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_historical_failures_do_not_trip_daily_breaker():
+    """Test lỗi khi thu thập ngày cũ không làm ngắt mạch nguồn của lần chạy hằng ngày"""
+    from lottery_collector import LotteryCollector
+    from source_stats import SourceStats
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        collector.http_cache = None
+        collector.source_stats = SourceStats(os.path.join(temp_dir, 'stats.json'), failure_threshold=1)
+        collector.historical_stats = SourceStats(os.path.join(temp_dir, 'historical.json'),
+                                                 failure_threshold=1)
+        collector._fetch_with_retries = lambda *args, **kwargs: None
+
+        assert collector.fetch_historical(datetime(2025, 3, 1)) is None
+        assert collector.source_stats.sources == {}
+        assert not collector.historical_stats.is_available('XoSoDaiPhat')
+        assert collector._ordered_sources() == collector.sources
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_fetch_historical_rejects_page_of_another_date():
+    """Test trang ngày cũ bị chuyển hướng về kết quả ngày khác không được nhận"""
+    from lottery_collector import LotteryCollector
+
+    rows = ''.join(f'<tr><td>{label}</td><td>{numbers}</td></tr>' for label, numbers in [
+        ('ĐB', '48213'), ('G1', '90576'), ('G2', '13740 - 62918'),
+        ('G3', '05831 - 77412 - 39065 - 84120 - 26397 - 51048'), ('G4', '4821 - 0937 - 6610 - 2384'),
+        ('G5', '1297 - 8053 - 3746 - 5902 - 7418 - 0665'), ('G6', '318 - 742 - 096'),
+        ('G7', '27 - 81 - 45 - 63'),
+    ])
+
+    def page(date_text):
+        return (f'<html><body><h1>XSMB ngày {date_text}</h1><table class="table-xsmb">{rows}</table>'
+                '</body></html>').encode('utf-8')
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        collector.http_cache = None
+        collector.historical_stats = None
+        collector.rate_limiter.rate = 1000
+        collector.sources = [s for s in collector.sources if s['key'] == 'xosodaiphat']
+        downloads = []
+
+        def download(url, headers, timeout):
+            downloads.append(url)
+            content = page('19-10-2026' if len(downloads) == 1 else '01-03-2025')
+            return 200, content, str(hash(content))
+
+        collector._download = download
+
+        # Trang trả về kết quả hôm nay: bỏ nguồn ngay, không retry
+        assert collector.fetch_historical(datetime(2025, 3, 1)) is None
+        assert len(downloads) == 1
+
+        record = collector.fetch_historical(datetime(2025, 3, 1))
+        assert record['date'] == '01/03/2025'
+        assert record['results']['Giải Đặc Biệt'] == ['48213']
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
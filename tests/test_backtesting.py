@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module kiểm thử chiến lược
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backtesting import (
+    StrategyBacktester, evaluate_picks, parameter_grid,
+    pick_most_overdue
+)
+
+
+def make_record(date, special, lo):
+    """Tạo bản ghi test với giải đặc biệt và danh sách lô giải bảy"""
+    return {
+        'date': date,
+        'source': 'Test',
+        'results': {'Giải Đặc Biệt': [special], 'Giải Bảy': lo}
+    }
+
+
+class TestStrategyBacktester:
+    """Test kiểm thử chiến lược"""
+
+    def setup_method(self):
+        self.backtester = StrategyBacktester(stake=1.0, payout=3.5)
+        self.backtester.load([
+            make_record('03/01/2025', '00045', ['45', '45', '07']),
+            make_record('01/01/2025', '00012', ['34', '56']),
+            make_record('02/01/2025', '00045', ['12', '99']),
+        ])
+
+    def test_load_orders_by_date(self):
+        """Test nạp dữ liệu theo thứ tự ngày"""
+        assert self.backtester.dates == ['01/01/2025', '02/01/2025', '03/01/2025']
+        assert self.backtester.special_tails.tolist() == [12, 45, 45]
+        assert self.backtester.counts[2, 45] == 3
+
+    def test_previous_special_strategy(self):
+        """Test chiến lược chơi lô giải đặc biệt hôm trước"""
+        result = self.backtester.run('previous_special', lag=1)
+
+        # Ngày 2 chơi 12 (về 1 nháy), ngày 3 chơi 45 (về 3 nháy)
+        assert result['total_picks'] == 2
+        assert result['winning_picks'] == 2
+        assert result['total_hits'] == 4
+        assert result['hit_rate'] == 100.0
+        assert result['roi'] == 600.0
+
+    def test_previous_special_skips_missing_draws(self):
+        """Test không ghép giải đặc biệt qua ngày thiếu dữ liệu, nghỉ Tết vẫn là kỳ liền nhau"""
+        self.backtester.load([
+            make_record('01/01/2025', '00012', ['12']),
+            make_record('02/01/2025', '00034', ['34']),
+            make_record('04/01/2025', '00056', ['34']),
+            make_record('27/01/2025', '00078', ['78']),
+            make_record('01/02/2025', '00090', ['78']),
+        ])
+
+        picks = self.backtester.run('previous_special', lag=1)
+        # Chỉ 02/01 (chơi 12) và 01/02 (chơi 78, sau kỳ nghỉ Tết); 04/01 thiếu 03/01 nên bỏ
+        assert picks['days_played'] == 2
+        assert picks['total_hits'] == 1
+
+        assert self.backtester.run('previous_special', lag=2)['days_played'] == 0
+
+    def test_most_overdue_uses_only_past_days(self):
+        """Test chiến lược số lâu chưa về không nhìn trước kết quả"""
+        counts = self.backtester.counts
+        picks = pick_most_overdue(counts, self.backtester.special_tails, self.backtester.draw_index, k=2)
+
+        assert not picks[0].any()
+        # Ngày 2: các số chưa về lần nào có khoảng cách lớn nhất, số nhỏ được ưu tiên
+        assert np.flatnonzero(picks[1]).tolist() == [0, 1]
+
+    def test_sweep_matches_single_runs(self):
+        """Test sweep song song cho kết quả giống chạy tuần tự"""
+        specs = parameter_grid('hot', k=[1, 3], window=[1, 2]) + [('previous_special', {'lag': 1})]
+        parallel = self.backtester.sweep(specs, max_workers=2)
+        sequential = [self.backtester.run(name, **params) for name, params in specs]
+
+        assert parallel == sequential
+
+    def test_unknown_strategy(self):
+        """Test chiến lược không tồn tại"""
+        assert 'error' in self.backtester.run('khong_ton_tai')
+        with pytest.raises(ValueError):
+            self.backtester.sweep([('khong_ton_tai', {})])
+
+
+def test_evaluate_picks_without_picks():
+    """Test đánh giá khi không chơi số nào"""
+    counts = np.ones((3, 100), dtype=np.int32)
+    result = evaluate_picks(counts, np.zeros((3, 100), dtype=bool))
+    assert result['total_picks'] == 0
+    assert result['roi'] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module cache HTTP
+"""
+
+import pytest
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from http_cache import HttpCache
+from lottery_collector import LotteryCollector
+from fakes import FakeResponse, FakeSession
+
+
+def conditional_session(pages):
+    """Server giả hỗ trợ ETag: trả 304 khi If-None-Match khớp"""
+
+    def respond(url, headers):
+        body, etag = pages[url]
+        if headers.get('If-None-Match') == etag:
+            return FakeResponse(304, b'')
+        return FakeResponse(200, body, {'ETag': etag})
+
+    return FakeSession(handler=respond)
+
+
+class TestHttpCache:
+    """Test cache HTTP trên đĩa"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = HttpCache(self.temp_dir, max_bytes=10)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_conditional_request_and_304(self):
+        """Test gửi If-None-Match và dùng body đã lưu khi nhận 304"""
+        session = conditional_session({'https://a.vn': (b'abc', '"v1"')})
+
+        first = self.cache.fetch(session, 'https://a.vn')
+        assert not first.not_modified
+        assert 'If-None-Match' not in session.requests[0]
+
+        second = self.cache.fetch(session, 'https://a.vn')
+        assert second.not_modified
+        assert second.content == b'abc'
+        assert second.content_hash == first.content_hash
+        assert session.requests[1]['If-None-Match'] == '"v1"'
+
+        # Chỉ mục được lưu khi flush và đọc lại
+        self.cache.flush()
+        assert HttpCache(self.temp_dir).conditional_headers('https://a.vn') == {'If-None-Match': '"v1"'}
+
+    def test_index_written_on_flush_not_on_every_hit(self):
+        """Test lưu/dùng lại mục chỉ đánh dấu chỉ mục cần ghi, flush mới ghi ra đĩa"""
+        cache = HttpCache(self.temp_dir)
+        cache.store('https://a.vn', b'abc', '"v1"', None)
+        cache.touch('https://a.vn')
+        assert cache.dirty
+        assert not cache.index_file.exists()
+
+        cache.flush()
+        assert not cache.dirty
+        written = cache.index_file.stat().st_mtime_ns
+        cache.flush()
+        assert cache.index_file.stat().st_mtime_ns == written
+        assert HttpCache(self.temp_dir).load_body('https://a.vn') == b'abc'
+
+    def test_size_based_eviction(self):
+        """Test xóa mục dùng lâu nhất khi vượt dung lượng"""
+        self.cache.store('https://a.vn', b'aaaa', '"a"', None)
+        self.cache.store('https://b.vn', b'bbbb', '"b"', None)
+        self.cache.touch('https://a.vn')
+        self.cache.store('https://c.vn', b'cccc', '"c"', None)
+
+        assert set(self.cache.index) == {'https://a.vn', 'https://c.vn'}
+        assert self.cache.total_bytes == 8
+        assert len(os.listdir(self.temp_dir)) == 3  # 2 body + index
+        # Xóa mục thì chỉ mục được ghi ngay
+        assert set(HttpCache(self.temp_dir).index) == {'https://a.vn', 'https://c.vn'}
+
+    def test_response_without_validators_not_stored(self):
+        """Test không lưu response không có ETag/Last-Modified"""
+        self.cache.store('https://a.vn', b'abc', None, None)
+        assert self.cache.index == {}
+
+
+def test_collector_skips_reparse_of_unchanged_page():
+    """Test collector không parse lại trang có nội dung không đổi"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        collector.http_cache = HttpCache(temp_dir)
+        collector.source_stats = None
+        collector.session = conditional_session({'https://a.vn': (b'<table></table>', '"v1"')})
+        collector._pause = lambda seconds, cancel_event=None: False
+
+        parsed = []
+
+        def parser(soup, date_str):
+            parsed.append(date_str)
+            return {'date': date_str, 'source': 'A', 'results': {
+                'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222']
+            }}
+
+        collector.sources = [{'name': 'A', 'url': 'https://a.vn', 'parser': parser}]
+        for _ in range(2):
+            result = collector.fetch_lottery_data(datetime(2025, 1, 8), concurrent=False)
+            assert result['source'] == 'A'
+        assert parsed == ['08/01/2025']
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module HTTP transport dùng chung
+"""
+
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import requests
+from requests.adapters import HTTPAdapter
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import http_transport
+from http_transport import DEFAULT_TIMEOUT, create_session, shared_session, close_shared_session
+from lottery_collector import LotteryCollector
+from notification_system import NotificationSystem
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Adapter giả: ghi lại request và timeout thay vì gửi ra mạng"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.method, request.url, kwargs.get('timeout')))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'ok'
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class TestHttpTransport:
+    """Test cấu hình pool, retry và timeout của session"""
+
+    def teardown_method(self):
+        close_shared_session()
+
+    def test_pool_and_retry_configuration(self):
+        """Test adapter có pool đã chỉnh, retry lỗi kết nối và 429/503 nhưng không retry lỗi đọc"""
+        session = create_session(pool_connections=4, pool_maxsize=12)
+        adapter = session.get_adapter('https://xoso.com.vn/')
+        assert adapter is session.get_adapter('http://example.com/')
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 12
+        assert adapter.max_retries.connect == 2
+        assert adapter.max_retries.status == 2
+        assert adapter.max_retries.read == 0
+        assert set(adapter.max_retries.status_forcelist) == {429, 503}
+        assert adapter.max_retries.is_retry('POST', 503)
+
+        no_retry = create_session(max_retries=http_transport.connection_retry(connect=0, status=0))
+        assert no_retry.get_adapter('https://a.vn/').max_retries.total == 0
+
+    def test_default_timeout_applied(self):
+        """Test request không truyền timeout dùng timeout mặc định"""
+        session = create_session()
+        adapter = RecordingAdapter()
+        session.mount('https://', adapter)
+
+        session.get('https://a.vn/')
+        session.post('https://a.vn/hook', json={}, timeout=3)
+        assert adapter.sent[0][2] == DEFAULT_TIMEOUT
+        assert adapter.sent[1][:2] == ('POST', 'https://a.vn/hook')
+        assert adapter.sent[1][2] == 3
+
+    def test_collector_and_notifier_share_pool(self):
+        """Test collector (không retry) và webhook (có retry) dùng chung pool kết nối"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            session = shared_session()
+            assert shared_session() is session
+            collector_session = LotteryCollector().session
+            assert collector_session is shared_session(retries=False)
+            assert collector_session is not session
+            assert collector_session.get_adapter('https://a.vn/').max_retries.total == 0
+            assert session.get_adapter('https://a.vn/').max_retries.connect == 2
+            assert (collector_session.get_adapter('https://a.vn/').poolmanager
+                    is session.get_adapter('https://a.vn/').poolmanager)
+
+            adapter = RecordingAdapter()
+            session.mount('https://', adapter)
+            notifier = NotificationSystem(temp_dir)
+            notifier.webhook_urls['discord'] = 'https://discord.test/hook'
+            assert notifier.send_webhook_notification('Kết quả mới')
+            assert notifier.send_webhook_notification('Kết quả mới')
+            assert [sent[0] for sent in adapter.sent] == ['POST', 'POST']
+
+            # Header trình duyệt của collector không gắn vào session dùng chung
+            assert 'Upgrade-Insecure-Requests' not in collector_session.headers
+        finally:
+            shutil.rmtree(temp_dir)
+
+        close_shared_session()
+        assert http_transport._shared_sessions == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module theo dõi trực tiếp buổi quay
+"""
+
+import pytest
+import json
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from live_draw import LiveDrawPoller
+from lottery_collector import LotteryCollector
+
+ROWS = [
+    ('ĐB', '48213'),
+    ('G1', '90576'),
+    ('G2', '13740 - 62918'),
+    ('G3', '05831 - 77412 - 39065 - 84120 - 26397 - 51048'),
+    ('G4', '4821 - 0937 - 6610 - 2384'),
+    ('G5', '1297 - 8053 - 3746 - 5902 - 7418 - 0665'),
+    ('G6', '318 - 742 - 096'),
+    ('G7', '27 - 81 - 45 - 63'),
+]
+
+# Thứ tự quay thực tế: từ giải Nhất đến giải Bảy, giải Đặc Biệt quay cuối
+DRAW_ORDER = ['G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'G7', 'ĐB']
+
+
+# Kết quả kỳ trước, vẫn hiển thị trên trang trước giờ quay
+YESTERDAY_ROWS = [
+    ('ĐB', '70215'),
+    ('G1', '33108'),
+    ('G2', '59024 - 18376'),
+    ('G3', '62051 - 09743 - 85310 - 47196 - 20638 - 91482'),
+    ('G4', '7305 - 1948 - 5562 - 8019'),
+    ('G5', '4471 - 2086 - 9153 - 6320 - 0894 - 3617'),
+    ('G6', '527 - 064 - 819'),
+    ('G7', '52 - 09 - 74 - 31'),
+]
+
+
+def page(drawn, partial=None, rows_source=ROWS, heading='Xổ số miền Bắc'):
+    """Trang XoSoDaiPhat khi mới quay xong các giải trong `drawn`, giải `partial` đang quay"""
+    rows = []
+    for label, numbers in rows_source:
+        if label in drawn:
+            rows.append(f'<tr><td>{label}</td><td>{numbers}</td></tr>')
+        elif label == partial:
+            # Số đầu đã có, số thứ hai mới lộ 1 chữ số
+            shown = numbers.split(' - ')[0] + ' - ' + numbers[0] if ' - ' in numbers else numbers[:3]
+            rows.append(f'<tr><td>{label}</td><td>{shown}</td></tr>')
+    return (f'<html><body><table class="table-xsmb"><tr><th>{heading}</th></tr>'
+            + ''.join(rows) + '</table></body></html>').encode('utf-8')
+
+
+class FakeClock:
+    """Thời gian giả (giờ Việt Nam), tăng khi poller ngủ"""
+
+    def __init__(self, start):
+        self.current = start
+        self.sleeps = []
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.current += timedelta(seconds=seconds)
+
+
+class TestLiveDrawPoller:
+    """Test poll trong lúc quay và phát sự kiện theo giải"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.collector = LotteryCollector()
+        self.collector.http_cache = None
+        self.collector.source_stats = None
+        self.collector.rate_limiter.rate = 1000
+        self.collector.sources = [s for s in self.collector.sources if s['key'] == 'xosodaiphat']
+
+        # Mỗi vòng poll trang có thêm một giải, giải kế tiếp đang quay dở
+        self.pages = [page([], partial='G1')]
+        for i in range(len(DRAW_ORDER)):
+            self.pages.append(page(DRAW_ORDER[:i + 1], partial=DRAW_ORDER[i + 1] if i + 1 < len(DRAW_ORDER) else None))
+        self.downloads = 0
+
+        def download(url, headers, timeout):
+            content = self.pages[min(self.downloads, len(self.pages) - 1)]
+            self.downloads += 1
+            return 200, content, str(hash(content))
+
+        self.collector._download = download
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_poller(self, start, **kwargs):
+        self.clock = FakeClock(start)
+        self.events = []
+        return LiveDrawPoller(self.collector, interval=5, on_prize=self.events.append,
+                              now=self.clock.now, sleep=self.clock.sleep, **kwargs)
+
+    def test_emits_each_prize_and_stops_at_27_numbers(self):
+        """Test phát sự kiện cho từng giải mới và dừng khi đủ 27 số"""
+        events_file = os.path.join(self.temp_dir, 'events.jsonl')
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 5), events_file=events_file)
+        record = poller.run()
+
+        # Chờ đến 18:10 rồi poll mỗi 5 giây
+        assert self.clock.sleeps[0] == 300
+        assert [e['prize'] for e in self.events] == [
+            'Giải Nhất', 'Giải Nhì', 'Giải Ba', 'Giải Tư', 'Giải Năm', 'Giải Sáu', 'Giải Bảy', 'Giải Đặc Biệt'
+        ]
+        assert poller.polls == len(DRAW_ORDER) + 1
+        assert self.downloads == poller.polls
+
+        assert record['date'] == '08/01/2025'
+        assert record['source'] == 'XoSoDaiPhat'
+        assert sum(len(numbers) for numbers in record['results'].values()) == 27
+        assert list(record['results']) == [
+            'Giải Đặc Biệt', 'Giải Nhất', 'Giải Nhì', 'Giải Ba', 'Giải Tư', 'Giải Năm', 'Giải Sáu', 'Giải Bảy'
+        ]
+        assert self.collector.record_validator.check_record(record) == []
+
+        with open(events_file, 'r', encoding='utf-8') as f:
+            saved = [json.loads(line) for line in f]
+        assert saved[0]['prize'] == 'Giải Nhất' and saved[0]['numbers'] == ['90576']
+
+    def test_partial_prize_not_emitted_and_window_end(self):
+        """Test giải đang quay dở không phát sự kiện; hết giờ thì trả về None"""
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 44, 56))
+        assert poller.run() is None
+        assert self.events == []
+        assert poller.polls == 1 and poller.completed == {}
+
+    def test_previous_draw_is_not_saved_as_today(self):
+        """Test bảng kỳ trước còn trên trang lúc 18:10 không được lưu thành kết quả hôm nay"""
+        yesterday = page([label for label, _ in YESTERDAY_ROWS], rows_source=YESTERDAY_ROWS)
+        # Trang giữ bảng cũ vài vòng, rồi thay dần từng dòng bằng kết quả mới
+        self.pages = [yesterday, yesterday]
+        for i in range(len(DRAW_ORDER)):
+            drawn = set(DRAW_ORDER[:i + 1])
+            rows = [row if row[0] in drawn else old for row, old in zip(ROWS, YESTERDAY_ROWS)]
+            self.pages.append(page([label for label, _ in rows], rows_source=rows))
+
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 10, 30))
+        record = poller.run()
+
+        assert 'Giải Nhất' in poller.baseline['XoSoDaiPhat']
+        assert self.events[0]['prize'] == 'Giải Nhất' and self.events[0]['numbers'] == ['90576']
+        assert len(self.events) == 8
+        assert record['results']['Giải Đặc Biệt'] == ['48213']
+        assert record['results']['Giải Bảy'] == ['27', '81', '45', '63']
+
+    def test_dated_page_accepted_without_baseline(self):
+        """Test trang ghi đúng ngày quay được nhận ngay ở vòng poll đầu"""
+        self.pages = [page([label for label, _ in ROWS], heading='XSMB ngày 08-01-2025')]
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 40))
+        record = poller.run()
+        assert poller.polls == 1
+        assert record['source'] == 'XoSoDaiPhat'
+        assert record['results']['Giải Nhất'] == ['90576']
+
+    def test_record_comes_from_single_source(self):
+        """Test bản ghi cuối lấy từ một nguồn đủ giải, không ghép giải của nhiều nguồn"""
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 30))
+        full = {prize: numbers for prize, numbers in zip(
+            ['Giải Đặc Biệt', 'Giải Nhất', 'Giải Nhì', 'Giải Ba', 'Giải Tư', 'Giải Năm', 'Giải Sáu', 'Giải Bảy'],
+            [numbers.split(' - ') for _, numbers in ROWS]
+        )}
+        without_special = {prize: numbers for prize, numbers in full.items() if prize != 'Giải Đặc Biệt'}
+        poller.merge({'source': 'A', 'results': without_special}, '08/01/2025')
+        poller.merge({'source': 'B', 'results': {'Giải Đặc Biệt': ['48213']}}, '08/01/2025')
+        assert len(poller.completed) == 8
+        assert poller.record('08/01/2025') is None
+
+        poller.merge({'source': 'B', 'results': full}, '08/01/2025')
+        assert poller.record('08/01/2025')['source'] == 'B'
+
+    def test_conflicting_source_does_not_override(self):
+        """Test nguồn khác báo số khác không ghi đè giải đã phát"""
+        poller = self.make_poller(datetime(2025, 1, 8, 18, 20))
+        first = poller.merge({'source': 'A', 'results': {'Giải Nhất': ['11111']}}, '08/01/2025')
+        second = poller.merge({'source': 'B', 'results': {'Giải Nhất': ['22222']}}, '08/01/2025')
+        assert len(first) == 1 and second == []
+        assert poller.completed['Giải Nhất'] == {'numbers': ['11111'], 'source': 'A'}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -8,7 +8,9 @@ import pytest
 import json
 import tempfile
 import os
+from collections import Counter
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 import sys
 
@@ -18,8 +20,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 from lottery_collector import LotteryCollector
 from data_storage import DataStorage
 from data_validator import DataValidator
-from analytics import LotteryAnalytics
+from analytics import LotteryAnalytics, CalendarGroupBy
 from notification_system import NotificationSystem
+from fakes import FakeResponse, FakeSession
 
 
 class TestLotteryCollector:
@@ -60,6 +63,184 @@ class TestLotteryCollector:
         
         assert self.collector.validate_lottery_data(invalid_data) == False
 
+    def test_concurrent_fetch_first_valid_wins(self):
+        """Test thu thập song song lấy kết quả hợp lệ đầu tiên và hủy các nguồn khác"""
+        import threading
+        import time as time_module
+
+        def respond(url, headers):
+            if url == 'slow':
+                time_module.sleep(0.2)
+            return FakeResponse()
+
+        def make_parser(name, valid):
+            def parser(soup, date_str):
+                if not valid:
+                    return None
+                return {'date': date_str, 'source': name, 'results': {
+                    'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222']
+                }}
+            return parser
+
+        self.collector.session = FakeSession(handler=respond)
+        self.collector.http_cache = None
+        self.collector.source_stats = None
+        self.collector._pause = lambda seconds, cancel_event=None: (
+            cancel_event.wait(0.01) if cancel_event else False
+        )
+        self.collector.sources = [
+            {'name': 'Slow', 'url': 'slow', 'parser': make_parser('Slow', True)},
+            {'name': 'Broken', 'url': 'broken', 'parser': make_parser('Broken', False)},
+            {'name': 'Fast', 'url': 'fast', 'parser': make_parser('Fast', True)},
+        ]
+
+        result = self.collector.fetch_lottery_data(datetime(2025, 1, 8), max_retries=50)
+        assert result['source'] == 'Fast'
+        assert result['date'] == '08/01/2025'
+
+        # Nguồn lỗi dừng retry sau khi đã có kết quả
+        time_module.sleep(0.3)
+        assert self.collector.session.calls.count('broken') < 50
+
+        sequential = self.collector.fetch_lottery_data(datetime(2025, 1, 8), concurrent=False)
+        assert sequential['source'] == 'Slow'
+
+    def test_cancelled_sources_do_not_touch_stats_after_save(self):
+        """Test nguồn thua xong request sau khi đã có kết quả không ghi thống kê, timer hay bộ nhớ parse"""
+        import threading
+        from source_stats import SourceStats
+
+        release = threading.Event()
+
+        def respond(url, headers):
+            if url == 'slow':
+                # Request của nguồn thua chỉ xong sau khi nguồn thắng đã được lưu
+                release.wait(5)
+            return FakeResponse()
+
+        def make_parser(name):
+            def parser(soup, date_str):
+                return {'date': date_str, 'source': name, 'results': {
+                    'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222']
+                }}
+            return parser
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_file = os.path.join(temp_dir, 'stats.json')
+            self.collector.session = FakeSession(handler=respond)
+            self.collector.http_cache = None
+            self.collector.source_stats = SourceStats(stats_file)
+            self.collector.sources = [
+                {'name': 'Slow', 'url': 'slow', 'parser': make_parser('Slow')},
+                {'name': 'Fast', 'url': 'fast', 'parser': make_parser('Fast')},
+            ]
+
+            result = self.collector.fetch_lottery_data(datetime(2025, 1, 8))
+            assert result['source'] == 'Fast'
+
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name.startswith('source'):
+                    thread.join(5)
+
+            # Nguồn thua vẫn parse được kết quả hợp lệ nhưng không ghi gì thêm
+            assert list(self.collector.source_stats.sources) == ['Fast']
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                assert list(json.load(f)) == ['Fast']
+            assert 'slow' not in self.collector._parsed
+            timer = self.collector.timer
+            assert not timer.sources['Slow']['success']
+            assert [span['stage'] for span in timer.spans if span['source'] == 'Slow'] == []
+
+    def test_fast_parse_path_matches_html_parser(self):
+        """Test parse bằng lxml chỉ dựng bảng cho kết quả giống html.parser"""
+        from lottery_collector import make_soup
+
+        html = '''
+        <html><body>
+        <div class="news">Tin tức <table><tr><td>Giải nhất</td><td>00000</td></tr></table></div>
+        <table class="kqxsmb">
+          <tr><th>ĐB</th><td>12345</td></tr>
+          <tr><td>G1</td><td>67890</td></tr>
+          <tr><td>G2</td><td><span>11111</span><span>22222</span></td></tr>
+          <tr><td>G7</td><td>12 34 56 78</td></tr>
+        </table>
+        </body></html>
+        '''
+        for key in ('xosodaiphat', 'xoso_com_vn'):
+            parser = partial(self.collector._parse_registered, key)
+            expected = parser(make_soup(html, backend='html.parser'), '08/01/2025')
+            fast = parser(make_soup(html, tables_only=True, backend='lxml'), '08/01/2025')
+            assert fast['results'] == expected['results']
+
+        result = self.collector._parse_registered('xosodaiphat', make_soup(html, tables_only=True), '08/01/2025')
+        assert result['results'] == {
+            'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222'],
+            'Giải Bảy': ['12', '34', '56', '78']
+        }
+
+    def test_streaming_stops_after_complete_table(self):
+        """Test tải theo luồng dừng đọc khi bảng đủ 27 số, đọc hết trang khi bảng thiếu"""
+        fixture = Path(__file__).parent.parent / 'benchmarks' / 'fixtures' / 'xosodaiphat.html'
+        page = fixture.read_bytes()
+        head, tail = page.split(b'</table>')
+
+        self.collector.http_cache = None
+        self.collector.source_stats = None
+        source = next(s for s in self.collector.sources if s['key'] == 'xosodaiphat')
+
+        # Bảng đủ giải nằm ở chunk thứ hai, sau đó là phần trang dài
+        filler = [b'<div>' + b'tin tuc ' * 2000 + b'</div>'] * 50
+        self.collector.session = FakeSession(FakeResponse(chunks=[head[:200], head[200:] + b'</table>'] + filler + [tail]))
+        result = self.collector._fetch_from_source(source, '08/01/2025', max_retries=1)
+        assert self.collector.session.streamed == [True]
+        assert self.collector.record_validator.is_complete(result['results'])
+        assert self.collector.session.response.read == 2
+        assert self.collector.session.response.closed
+
+        # Bảng thiếu giải: đọc hết trang rồi parse như bình thường
+        partial = head.replace(b'<tr><td>G7</td><td>27 - 81 - 45 - 63</td></tr>', b'')
+        self.collector.session = FakeSession(FakeResponse(chunks=[partial, b'</table>', tail]))
+        result = self.collector._fetch_from_source(source, '08/01/2025', max_retries=1)
+        assert 'Giải Bảy' not in result['results']
+        assert self.collector.session.response.read == 3
+
+    def test_streaming_matches_full_page_parse(self):
+        """Test tải theo luồng chọn cùng bảng với parse cả trang và parse mỗi bảng một lần"""
+        from lottery_collector import make_soup
+        from http_cache import HttpCache
+
+        fixture = Path(__file__).parent.parent / 'benchmarks' / 'fixtures' / 'xosodaiphat.html'
+        head, tail = fixture.read_bytes().split(b'</table>')
+        # Bảng kỳ cũ (số khác) đặt sau bảng kỳ mới nhất
+        older = head[head.index(b'<table'):].replace(b'48213', b'99999') + b'</table>'
+        page = head + b'</table>' + older + tail
+
+        self.collector.source_stats = None
+        self.collector.http_cache = None
+        source = next(s for s in self.collector.sources if s['key'] == 'xosodaiphat')
+        full = source['parser'](make_soup(page, tables_only=True), '08/01/2025')
+        assert full['results']['Giải Đặc Biệt'] == ['48213']
+
+        self.collector.session = FakeSession(FakeResponse(chunks=[page[:300], page[300:]]))
+        streamed = self.collector._fetch_from_source(source, '08/01/2025', max_retries=1)
+        assert streamed['results'] == full['results']
+        partial_parses = [span for span in self.collector.timer.summary()['spans'] if span.get('partial')]
+        assert len(partial_parses) == 1
+
+        # 304 nhưng cache mất body: tải lại không điều kiện thay vì dùng body rỗng
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.collector.http_cache = HttpCache(temp_dir)
+            self.collector.http_cache.store(source['url'], page, '"v1"', None)
+            for body_file in Path(temp_dir).glob('*.html'):
+                body_file.unlink()
+            self.collector.session = FakeSession(FakeResponse(304, chunks=[]),
+                                                 FakeResponse(chunks=[page], headers={'ETag': '"v2"'}))
+            refetched = self.collector._fetch_from_source(source, '08/01/2025', max_retries=1)
+        assert refetched['results'] == full['results']
+        assert 'If-None-Match' in self.collector.session.requests[0]
+        assert 'If-None-Match' not in self.collector.session.requests[1]
+
 
 class TestDataStorage:
     """Test module lưu trữ dữ liệu"""
@@ -163,6 +344,271 @@ class TestDataValidator:
         is_valid, errors = self.validator.validate_json_file()
         assert is_valid == True
         assert len(errors) == 0
+    
+    def test_validate_single_record_errors(self):
+        """Test thông báo lỗi của bản ghi không hợp lệ"""
+        record = {
+            'date': '32/01/2025',
+            'source': 'Test',
+            'results': {
+                'Giải Nhì': ['1234', 'abcde', 12345],
+                'Giải X': ['1'],
+                'Giải Ba': 'không phải danh sách'
+            }
+        }
+        is_valid, errors = self.validator.validate_single_record(record)
+        
+        assert is_valid == False
+        assert errors == [
+            'Thiếu trường bắt buộc: collected_at',
+            'Format ngày không hợp lệ: 32/01/2025',
+            'Giải Nhì: Số lượng không đúng. Mong đợi 2, nhận được 3',
+            'Giải Nhì: Số thứ 1 không hợp lệ: 1234. Mong đợi 5 chữ số',
+            'Giải Nhì: Số thứ 2 không hợp lệ: abcde. Mong đợi 5 chữ số',
+            'Giải thưởng không hợp lệ: Giải X',
+            'Giải Ba: Danh sách số phải là array'
+        ]
+    
+    def test_compiled_validator_fast_path(self):
+        """Test đường nhanh không bỏ sót số sai trong bản ghi đầy đủ"""
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        compiled = self.validator.compiled
+        assert compiled.check_record(record) == []
+        
+        record['results']['Giải Nhì'] = ['11111,2222', '3']
+        assert ('bad_number', 'Giải Nhì', 1, '11111,2222', 5) in compiled.check_record(record)
+        
+        # Một phần tử chứa dấu phân cách không được gộp thành hai số hợp lệ
+        record['results']['Giải Nhì'] = ['11111,11111']
+        errors = compiled.check_record(record)
+        assert ('bad_count', 'Giải Nhì', 2, 1) in errors
+        assert ('bad_number', 'Giải Nhì', 1, '11111,11111', 5) in errors
+        
+        record['results']['Giải Nhì'] = ['11111', '２２２２２']
+        assert compiled.check_record(record) == []
+        
+        record['results']['Giải Nhì'] = ['11111', 22222]
+        assert compiled.check_record(record) == []
+        assert compiled.is_valid_date('1/2/2025')
+        assert not compiled.is_valid_date('29/02/2025')
+    
+    def test_incremental_validation(self):
+        """Test validation tăng dần theo checkpoint"""
+        storage = DataStorage(self.temp_dir)
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        storage.save_to_csv(record)
+        
+        # Lần đầu: kiểm tra toàn bộ và lưu checkpoint
+        assert self.validator.validate_all(incremental=True)
+        assert self.validator.checkpoint_file.exists()
+        
+        # Thêm bản ghi mới: chỉ bản ghi mới được kiểm tra
+        newer = dict(record, date='09/01/2025')
+        storage.save_data(newer)
+        data = json.loads(self.validator.json_file.read_text(encoding='utf-8'))
+        fingerprints = [self.validator._record_fingerprint(r) for r in data]
+        assert self.validator._json_pending(fingerprints, self.validator._load_checkpoint()['json']) == [0]
+        assert self.validator.validate_all(incremental=True)
+        assert self.validator._load_checkpoint()['csv']['rows'] == 2
+        
+        # Bản ghi mới có lỗi vẫn bị phát hiện và checkpoint không tiến lên
+        broken = dict(record, date='10/01/2025', results={'Giải Nhất': ['1']})
+        storage.save_data(broken)
+        is_valid, errors = self.validator.validate_json_file(incremental=True)
+        assert not is_valid
+        assert errors[0].startswith('Bản ghi 1: ')
+        is_valid, errors = self.validator.validate_csv_file(incremental=True)
+        assert errors == ['Dòng 3, giai_nhat: Số không hợp lệ: 1']
+    
+    def test_incremental_validation_detects_changed_prefix(self):
+        """Test kiểm tra lại toàn bộ khi dữ liệu cũ bị sửa"""
+        assert self.validator.validate_json_file(incremental=True)[0]
+        
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data[0]['results']['Giải Nhất'] = ['1']
+        with open(self.validator.json_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        
+        is_valid, errors = self.validator.validate_json_file(incremental=True)
+        assert not is_valid
+        assert len(errors) == 1
+    
+    def test_incremental_validation_ignores_layout_and_order(self):
+        """Test checkpoint JSON không phụ thuộc định dạng file hay thứ tự bản ghi"""
+        storage = DataStorage(self.temp_dir)
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        storage.save_data(dict(record, date='09/01/2025'))
+        assert self.validator.validate_json_file(incremental=True)[0]
+        
+        # Ghi lại cũ nhất trước, không thụt lề, bản ghi mới (lỗi) ở cuối file
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)[::-1]
+        data.append(dict(record, date='10/01/2025', results={'Giải Nhất': ['1']}))
+        with open(self.validator.json_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        
+        fingerprints = [self.validator._record_fingerprint(r) for r in data]
+        assert self.validator._json_pending(fingerprints, self.validator._load_checkpoint()['json']) == [2]
+        is_valid, errors = self.validator.validate_json_file(incremental=True)
+        assert not is_valid
+        assert all(error.startswith('Bản ghi 3: ') for error in errors)
+    
+    def test_incremental_csv_reads_only_new_rows(self):
+        """Test CSV chỉ băm phần đã kiểm tra rồi đọc tiếp phần mới, checkpoint khớp toàn file"""
+        import hashlib
+        storage = DataStorage(self.temp_dir)
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        storage.save_to_csv(record)
+        assert self.validator.validate_csv_file(incremental=True)[0]
+        
+        storage.save_to_csv(dict(record, date='09/01/2025'))
+        assert self.validator.validate_csv_file(incremental=True)[0]
+        checkpoint = self.validator._load_checkpoint()['csv']
+        content = self.validator.csv_file.read_bytes()
+        assert checkpoint['rows'] == 2
+        assert checkpoint['offset'] == len(content)
+        assert checkpoint['prefix_hash'] == hashlib.sha256(content).hexdigest()
+        
+        # Phần đã kiểm tra bị sửa: kiểm tra lại từ đầu
+        self.validator.csv_file.write_bytes(content.replace(b'08/01/2025', b'32/01/2025'))
+        is_valid, errors = self.validator.validate_csv_file(incremental=True)
+        assert errors == ['Dòng 1: Format ngày không hợp lệ: 32/01/2025']
+    
+    def test_validate_csv_file_errors(self):
+        """Test thông báo lỗi CSV"""
+        storage = DataStorage(self.temp_dir)
+        storage.save_to_csv({
+            'date': '8/13/2025',
+            'source': 'Test',
+            'results': {'Giải Đặc Biệt': ['1234a'], 'Giải Nhì': ['11111']},
+            'collected_at': ''
+        })
+        is_valid, errors = self.validator.validate_csv_file()
+        
+        assert is_valid == False
+        assert errors == [
+            'Dòng 1: Format ngày không hợp lệ: 8/13/2025',
+            'Dòng 1, giai_dac_biet: Số không hợp lệ: 1234a',
+            'Dòng 1, giai_nhi: Số lượng không đúng. Mong đợi 2, có 1'
+        ]
+
+    def test_parallel_chunked_validation(self, monkeypatch):
+        """Test kiểm tra song song theo chunk giống kiểm tra tuần tự"""
+        storage = DataStorage(self.temp_dir)
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        broken = dict(record, results=dict(record['results'], **{'Giải Nhất': ['1']}))
+        data = [
+            dict(broken if i % 3 == 0 else record, date=f'{i + 1:02d}/02/2025')
+            for i in range(12)
+        ]
+        with open(self.validator.json_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        for item in data:
+            storage.save_to_csv(item)
+
+        for validate in (self.validator.validate_json_file, self.validator.validate_csv_file):
+            sequential = validate(workers=1)
+            seen = []
+            parallel = validate(workers=2, chunk_size=5,
+                                progress=lambda checked, total: seen.append(checked))
+            assert parallel == sequential
+            assert len(sequential[1]) == 4
+            assert seen == [5, 10, 12]
+
+        # Giới hạn số lỗi thu thập nhưng vẫn báo tổng số lỗi
+        is_valid, errors = self.validator.validate_json_file(workers=1, chunk_size=5, max_errors=2)
+        assert not is_valid
+        assert errors[0].startswith('Bản ghi 1: ')
+        assert errors[1].startswith('Bản ghi 4: ')
+        assert errors[2] == 'Đã dừng thu thập sau 2 lỗi, tổng số lỗi: 4'
+
+        # File CSV nhỏ (không biết trước số dòng) không dựng process pool
+        import data_validator
+        monkeypatch.setattr(data_validator.os, 'cpu_count', lambda: 4)
+        monkeypatch.setattr(data_validator, 'ProcessPoolExecutor', None)
+        assert self.validator.validate_csv_file(chunk_size=10) == self.validator.validate_csv_file(workers=1)
+
+    def test_json_csv_consistency(self, monkeypatch):
+        """Test đối chiếu JSON và CSV theo (date, source)"""
+        storage = DataStorage(self.temp_dir)
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        storage.save_to_csv(record)
+        assert self.validator.check_consistency()[0]
+
+        # Kỳ chỉ có trong JSON, kỳ chỉ có trong CSV và kỳ có kết quả khác nhau
+        storage.save_to_json(dict(record, date='09/01/2025'))
+        storage.save_to_csv(dict(record, date='10/01/2025'))
+        changed = dict(record, date='11/01/2025')
+        storage.save_to_json(changed)
+        storage.save_to_csv(dict(changed, results=dict(record['results'], **{'Giải Nhất': ['00000']})))
+
+        is_consistent, report = self.validator.check_consistency()
+        assert not is_consistent
+        assert report['matched'] == 1
+        assert report['missing_in_csv'] == [{'date': '09/01/2025', 'source': 'Test'}]
+        assert report['missing_in_json'] == [{'row': 2, 'date': '10/01/2025', 'source': 'Test'}]
+        assert report['mismatched'] == [{'row': 3, 'date': '11/01/2025', 'source': 'Test'}]
+        assert self.validator.validate_consistency()[1][0] == 'Thiếu trong CSV: 09/01/2025 (Test)'
+        assert self.validator.validate_all(incremental=False)
+
+        # Mọi bước dùng chung dữ liệu JSON đã parse một lần
+        import data_validator
+        loads = []
+        original_load_json = self.validator.load_json
+        self.validator.load_json = lambda: loads.append(1) or original_load_json()
+        monkeypatch.setattr(data_validator.json, 'load', None)
+        assert not self.validator.validate_all(incremental=False, check_consistency=True,
+                                               check_calendar=True)
+        assert loads == [1]
+
+    def test_calendar_anomalies(self):
+        """Test phát hiện ngày thiếu, ngày trùng mâu thuẫn và dữ liệu fallback"""
+        with open(self.validator.json_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        other = dict(record, source='Khác', results=dict(record['results'], **{'Giải Nhất': ['00000']}))
+        data = [
+            dict(record, date='25/01/2025'),
+            dict(record, date='26/01/2025'),
+            dict(record, date='27/01/2025'),
+            # 28/01 - 31/01 nghỉ Tết, 01/02 thiếu
+            dict(record, date='02/02/2025'),
+            dict(record, date='03/02/2025', is_fallback=True),
+            dict(record, date='04/02/2025'),
+            dict(other, date='04/02/2025'),
+            dict(record, date='05/02/2025'),
+            dict(record, date='05/02/2025', source='Khác'),
+        ]
+
+        report = self.validator.detect_calendar_anomalies(data, end_date='07/02/2025')
+        assert report['missing_dates'] == ['01/02/2025', '03/02/2025', '06/02/2025', '07/02/2025']
+        assert report['gaps'] == [
+            {'start': '01/02/2025', 'end': '01/02/2025', 'days': 1},
+            {'start': '03/02/2025', 'end': '03/02/2025', 'days': 1},
+            {'start': '06/02/2025', 'end': '07/02/2025', 'days': 2},
+        ]
+        assert report['conflicting_duplicates'] == [{'date': '04/02/2025', 'sources': ['Test', 'Khác']}]
+        assert report['fallback_records'] == [{'date': '03/02/2025', 'source': 'Test'}]
+        assert report['expected_draws'] == 10
+
+        path = self.validator.export_gaps(report)
+        with open(path, 'r', encoding='utf-8') as f:
+            exported = json.load(f)
+        assert exported['dates'] == report['missing_dates']
+        assert exported['conflicting_dates'] == ['04/02/2025']
+
+    def test_latest_draw_date(self):
+        """Test kỳ gần nhất: hôm nay sau giờ quay xong, hôm qua nếu chưa quay"""
+        from data_validator import VN_TZ, latest_draw_date
+        assert latest_draw_date(VN_TZ.localize(datetime(2025, 2, 7, 18, 0))) == '06/02/2025'
+        assert latest_draw_date(VN_TZ.localize(datetime(2025, 2, 7, 19, 0))) == '07/02/2025'
+        assert latest_draw_date(VN_TZ.localize(datetime(2025, 3, 1, 9, 0))) == '28/02/2025'
 
 
 class TestLotteryAnalytics:
@@ -224,6 +670,236 @@ class TestLotteryAnalytics:
         assert 'unique_numbers' in result
         assert 'most_common' in result
         assert result['total_numbers_drawn'] == 4
+    
+    def test_analyze_by_prize(self):
+        """Test phân tích theo giải giữ nguyên số 0 ở đầu"""
+        data = self.analytics.load_data()
+        result = self.analytics.analyze_by_prize(data)
+        
+        assert list(result) == ['Giải Đặc Biệt', 'Giải Nhất']
+        assert result['Giải Nhất']['total_numbers'] == 2
+        assert {'number': '09876', 'count': 1, 'percentage': 50.0} in result['Giải Nhất']['most_common']
+    
+    def test_analyze_slots(self):
+        """Test thống kê theo vị trí cố định"""
+        data = [
+            {'date': '01/01/2025', 'results': {'Giải Ba': ['11111', '22222', '33333', '44445']}},
+            {'date': '02/01/2025', 'results': {'Giải Ba': ['11111', '22222', '33333', '12345', 'abcde']}}
+        ]
+        result = self.analytics.analyze_slots(data)
+        
+        assert self.analytics.layout.labels[7] == 'G3.4'
+        assert result['G3.4']['draws'] == 2
+        assert result['G3.4']['most_common_tails'] == [{'number': '45', 'count': 2}]
+        assert 'G3.5' not in result
+    
+    def test_tail_counts_one_record_per_day(self):
+        """Test ngày có hai nguồn chỉ được đếm một lần, ưu tiên bản ghi đủ số hơn"""
+        data = [
+            {'date': '01/01/2025', 'source': 'A', 'results': {'Giải Bảy': ['12']}},
+            {'date': '01/01/2025', 'source': 'B', 'results': {'Giải Bảy': ['12', '34']}},
+            {'date': '02/01/2025', 'source': 'A', 'results': {'Giải Bảy': ['56']}},
+            {'date': '02/01/2025', 'source': 'B', 'results': {'Giải Bảy': ['78']}}
+        ]
+        dates, counts, _ = self.analytics.build_tail_counts(data)
+        assert dates == ['01/01/2025', '02/01/2025']
+        assert counts[0, 12] == 1 and counts[0, 34] == 1
+        assert counts[1, 56] == 1 and counts[1, 78] == 0
+        assert counts.sum() == 3
+    
+    def test_prize_and_slot_stats_one_record_per_day(self):
+        """Test thống kê theo giải/vị trí đếm mỗi ngày một lần và báo số bị bỏ"""
+        record = {'date': '01/01/2025', 'source': 'A', 'results': {
+            'Giải Nhất': ['12345'], 'Giải Bảy': ['12', '7', 'ab'], 'Giải Phụ': ['999']
+        }}
+        data = [record, dict(record, source='B')]
+        
+        by_prize = self.analytics.analyze_by_prize(data)
+        assert by_prize['Giải Nhất']['total_numbers'] == 1
+        assert by_prize['Giải Bảy']['total_numbers'] == 3
+        assert by_prize['Giải Bảy']['invalid_numbers'] == 2
+        assert by_prize['Giải Phụ']['most_common'] == [{'number': '999', 'count': 1, 'percentage': 100.0}]
+        
+        slots = self.analytics.analyze_slots(data)
+        assert slots['G1']['draws'] == 1
+        assert slots['G7.1']['most_common_tails'] == [{'number': '12', 'count': 1}]
+    
+    def test_special_tail_transitions(self):
+        """Test ma trận chuyển trạng thái lô giải đặc biệt"""
+        data = [
+            {'date': '01/01/2025', 'results': {'Giải Đặc Biệt': ['00012']}},
+            {'date': '02/01/2025', 'results': {'Giải Đặc Biệt': ['00034']}},
+            {'date': '03/01/2025', 'results': {'Giải Đặc Biệt': ['11112']}},
+            {'date': '04/01/2025', 'results': {'Giải Đặc Biệt': ['22256']}},
+            {'date': '20/01/2025', 'results': {'Giải Đặc Biệt': ['33399']}}
+        ]
+        weights, probabilities = self.analytics.special_tail_transitions(data)
+        
+        assert weights.shape == (100, 100)
+        # 04/01 -> 20/01 cách quá xa nên không được tính
+        assert weights.sum() == 3
+        assert probabilities[12, 34] == 0.5
+        assert probabilities[12, 56] == 0.5
+        
+        # Kết quả được cache theo dấu vân tay dữ liệu
+        again = self.analytics.special_tail_transitions(data)
+        assert again[0] is weights
+        
+        decayed, _ = self.analytics.special_tail_transitions(data, half_life=1)
+        assert decayed[12, 56] == 0.5 ** 16
+        
+        head, _ = self.analytics.special_tail_transitions(data, order=2, key='head')
+        assert head.shape == (100, 10)
+        assert head[1 * 10 + 3, 1] == 1
+    
+    def test_transitions_use_tet_aware_gaps(self):
+        """Test cặp kỳ qua nghỉ Tết vẫn liên tiếp, ngày thiếu dữ liệu thì cắt như chuỗi lô"""
+        data = [
+            {'date': '05/01/2025', 'results': {'Giải Đặc Biệt': ['00012']}},
+            # 06/01 thiếu dữ liệu
+            {'date': '07/01/2025', 'results': {'Giải Đặc Biệt': ['00034']}},
+            # 28/01 - 31/01/2025 nghỉ Tết
+            {'date': '27/01/2025', 'results': {'Giải Đặc Biệt': ['00056']}},
+            {'date': '01/02/2025', 'results': {'Giải Đặc Biệt': ['00078']}}
+        ]
+        weights, _ = self.analytics.special_tail_transitions(data)
+        assert weights.sum() == 1
+        assert weights[56, 78] == 1
+        assert weights[12, 34] == 0
+    
+    def test_head_tail_matrices(self):
+        """Test ma trận đầu/đuôi tổng hợp và theo ngày"""
+        data = [
+            {'date': '01/01/2025', 'results': {'Giải Bảy': ['12', '12', '90']}},
+            {'date': '02/01/2025', 'results': {'Giải Sáu': ['345'], 'Giải Bảy': ['07']}},
+            {'date': '03/01/2025', 'results': {'Giải Bảy': ['99']}}
+        ]
+        matrix = self.analytics.head_tail_matrix(data, end_date='02/01/2025')
+        assert matrix.shape == (10, 10)
+        assert matrix[1, 2] == 2
+        assert matrix[4, 5] == 1
+        assert matrix[9, 9] == 0
+        assert matrix.sum() == 5
+        
+        dates, cube = self.analytics.head_tail_cube(data, start_date='02/01/2025')
+        assert dates == ['02/01/2025', '03/01/2025']
+        assert cube.shape == (2, 10, 10)
+        assert cube[0, 0, 7] == 1
+        assert cube[1, 9, 9] == 1
+        
+        latest = self.analytics.analyze_head_tail(data)['latest_draw']
+        assert latest['heads']['9'] == ['9']
+    
+    def test_head_tail_one_record_per_day(self):
+        """Test ngày lưu từ hai nguồn không bị đếm gấp đôi trong bảng đầu/đuôi"""
+        record = {'date': '01/01/2025', 'source': 'A', 'results': {'Giải Bảy': ['12', '34']}}
+        data = [record, dict(record, source='B')]
+        
+        assert self.analytics.head_tail_matrix(data).sum() == 2
+        _, cube = self.analytics.head_tail_cube(data)
+        assert cube.shape == (1, 10, 10) and cube[0, 1, 2] == 1
+        assert self.analytics.analyze_head_tail(data)['latest_draw']['heads']['1'] == ['2']
+    
+    def test_analyze_streaks(self):
+        """Test phân tích chuỗi ngày liên tiếp"""
+        data = [
+            {'date': '03/01/2025', 'results': {'Giải Bảy': ['12', '34']}},
+            {'date': '01/01/2025', 'results': {'Giải Bảy': ['12', '56']}},
+            {'date': '02/01/2025', 'results': {'Giải Sáu': ['112'], 'Giải Bảy': ['34']}},
+            {'date': '04/01/2025', 'results': {'Giải Bảy': ['34']}}
+        ]
+        result = self.analytics.analyze_streaks(data)
+        
+        assert result['total_days'] == 4
+        assert result['longest_streaks'][0] == {
+            'number': '34', 'length': 3,
+            'start_date': '02/01/2025', 'end_date': '04/01/2025'
+        }
+        assert result['current_streaks'] == {'34': 3}
+        assert result['length_distribution'] == {'1': 1, '3': 2}
+    
+    def test_streaks_break_on_missing_days_but_not_tet(self):
+        """Test ngày thiếu dữ liệu cắt chuỗi, kỳ nghỉ Tết thì không"""
+        data = [
+            {'date': '05/01/2025', 'results': {'Giải Bảy': ['12']}},
+            {'date': '06/01/2025', 'results': {'Giải Bảy': ['12']}},
+            # 07/01 thiếu dữ liệu
+            {'date': '08/01/2025', 'results': {'Giải Bảy': ['12']}},
+            # 28/01 - 31/01/2025 nghỉ Tết
+            {'date': '27/01/2025', 'results': {'Giải Bảy': ['34']}},
+            {'date': '01/02/2025', 'results': {'Giải Bảy': ['34']}}
+        ]
+        result = self.analytics.analyze_streaks(data)
+        
+        assert result['total_streaks'] == 3
+        assert result['length_distribution'] == {'1': 1, '2': 2}
+        assert result['longest_streaks'][0] == {
+            'number': '34', 'length': 2,
+            'start_date': '27/01/2025', 'end_date': '01/02/2025'
+        }
+        assert result['longest_streaks'][1]['end_date'] == '06/01/2025'
+        assert result['current_streaks'] == {'34': 2}
+    
+    def test_calendar_groupby(self):
+        """Test đếm theo nhóm lịch cộng dồn từng kỳ quay"""
+        engine = CalendarGroupBy()
+        engine.add_record({'date': '06/01/2025', 'results': {'Giải Bảy': ['12', '34', '12']}})
+        engine.add_record({'date': '13/01/2025', 'results': {'Giải Sáu': ['512']}})
+        engine.add_record({'date': 'sai ngày', 'results': {'Giải Bảy': ['99']}})
+        
+        # 06/01 và 13/01/2025 đều là thứ 2
+        assert engine.buckets('weekday') == [0]
+        assert engine.draws['weekday'][0] == 2
+        assert engine.top_k('weekday', 0, k=2) == [('12', 3), ('34', 1)]
+        assert engine.distribution('month', 1).sum() == 4
+        assert engine.buckets('day_of_month') == [6, 13]
+    
+    def test_calendar_groupby_number_space_counts_invalid(self):
+        """Test đếm số đầy đủ bằng Counter thưa và đếm riêng số không hợp lệ"""
+        engine = CalendarGroupBy(dimensions=('year_month',), code_space='number')
+        engine.add_record({'date': '06/01/2025', 'results': {
+            'Giải Nhất': ['012', '12', '012'], 'Giải Bảy': ['7', 'ab', '123456']
+        }})
+        
+        assert isinstance(engine.counts['year_month']['2025-01'], Counter)
+        summary = engine.bucket_summary('year_month', '2025-01')
+        assert summary['total_numbers'] == 6
+        assert summary['invalid_numbers'] == 3
+        assert summary['unique_numbers'] == 2
+        assert summary['most_common'] == [('012', 2), ('12', 1)]
+        assert engine.distribution('year_month', '2025-01').sum() == 3
+    
+    def test_calendar_stats_one_record_per_day(self):
+        """Test thống kê lịch và theo tháng đếm mỗi ngày một lần, lô phải toàn chữ số"""
+        record = {'date': '06/01/2025', 'source': 'A', 'results': {'Giải Bảy': ['12', 'ab34']}}
+        data = [record, dict(record, source='B')]
+        
+        weekday = self.analytics.analyze_calendar(data)['weekday']['Thứ 2']
+        assert weekday['draws_count'] == 1
+        assert weekday['total_numbers'] == 2
+        assert weekday['invalid_numbers'] == 1
+        assert weekday['most_common'] == [{'number': '12', 'count': 1, 'percentage': 50.0}]
+        
+        trends = self.analytics.analyze_time_trends(data)
+        assert trends['total_draws'] == 1
+        assert trends['monthly_analysis']['2025-01']['draws_count'] == 1
+        assert trends['monthly_analysis']['2025-01']['total_numbers'] == 2
+    
+    def test_time_trends_monthly_counts(self):
+        """Test thống kê theo tháng giữ nguyên số chữ số"""
+        data = self.analytics.load_data()
+        monthly = self.analytics.analyze_time_trends(data)['monthly_analysis']
+        
+        assert monthly['2025-01']['draws_count'] == 2
+        assert monthly['2025-01']['total_numbers'] == 4
+        assert ('09876', 1) in monthly['2025-01']['most_common']
+    
+    def test_sort_by_date_reuses_result(self):
+        """Test dùng lại kết quả sắp xếp theo ngày"""
+        data = self.analytics.load_data()
+        first = self.analytics.sort_by_date(data)
+        assert self.analytics.sort_by_date(data) is first
+        assert first[0]['date'] == '07/01/2025'
 
 
 class TestNotificationSystem:
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module chấm điểm trực tuyến
+"""
+
+import pytest
+import json
+import tempfile
+import os
+import sys
+import shutil
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from number_scoring import OnlineNumberScorer
+from analytics import LotteryAnalytics
+
+
+def make_record(date, numbers, **extra):
+    """Tạo bản ghi test với các số giải bảy/giải ba"""
+    record = {'date': date, 'source': 'Test', 'results': {'Giải Ba': numbers}}
+    record.update(extra)
+    return record
+
+
+class TestOnlineNumberScorer:
+    """Test chấm điểm trực tuyến"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.scorer = OnlineNumberScorer(self.temp_dir, half_lives=(1, 10))
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_update_decays_counts(self):
+        """Test bộ đếm giảm theo chu kỳ bán rã"""
+        assert self.scorer.update(make_record('01/01/2025', ['11112', '22212']))
+        assert self.scorer.counts['tail'][:, 12].tolist() == [2.0, 2.0]
+        assert self.scorer.counts['ending'][:, 112].tolist() == [1.0, 1.0]
+
+        assert self.scorer.update(make_record('03/01/2025', ['33333']))
+        assert self.scorer.counts['tail'][0, 12] == pytest.approx(0.5)
+        assert self.scorer.counts['tail'][1, 12] == pytest.approx(2 * 0.5 ** 0.2)
+        assert self.scorer.last_date == '03/01/2025'
+
+    def test_ignores_old_and_fallback_draws(self):
+        """Test bỏ qua kỳ cũ và dữ liệu giả lập"""
+        self.scorer.update(make_record('02/01/2025', ['11112']))
+        assert not self.scorer.update(make_record('01/01/2025', ['22222']))
+        assert not self.scorer.update(make_record('03/01/2025', ['33333'], is_fallback=True))
+        assert self.scorer.draws_seen == 1
+
+    def test_top_prefers_recent_hits(self):
+        """Test số về gần đây có điểm cao hơn"""
+        self.scorer.update(make_record('01/01/2025', ['11145']))
+        self.scorer.update(make_record('05/01/2025', ['11178']))
+
+        top = self.scorer.top('tail', 2)
+        assert [item['number'] for item in top] == ['78', '45']
+        assert self.scorer.top('ending', 1)[0]['number'] == '178'
+
+    def test_record_draw_persists_state(self):
+        """Test lưu trạng thái và cập nhật từ file"""
+        with open(self.scorer.json_file, 'w', encoding='utf-8') as f:
+            json.dump([make_record('01/01/2025', ['11112'])], f)
+
+        # Chưa có trạng thái: dựng từ lịch sử
+        assert self.scorer.record_draw(make_record('01/01/2025', ['11112']))
+        assert self.scorer.state_file.exists()
+
+        scorer = OnlineNumberScorer(self.temp_dir, half_lives=(1, 10))
+        assert scorer.record_draw(make_record('02/01/2025', ['99999']))
+
+        reloaded = OnlineNumberScorer(self.temp_dir, half_lives=(1, 10))
+        assert reloaded.load()
+        assert reloaded.draws_seen == 2
+        assert reloaded.counts['tail'][0, 12] == pytest.approx(0.5)
+
+    def test_truncated_state_is_rebuilt(self):
+        """Test file trạng thái thiếu khóa hoặc sai kích thước được dựng lại từ lịch sử"""
+        with open(self.scorer.json_file, 'w', encoding='utf-8') as f:
+            json.dump([make_record('01/01/2025', ['11112'])], f)
+
+        for state in ({'half_lives': [1, 10], 'last_date': '01/01/2025'},
+                      {'half_lives': [1, 10], 'counts': {'tail': [1], 'ending': [1]},
+                       'last_seen': {'tail': [1], 'ending': [1]}}):
+            with open(self.scorer.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            scorer = OnlineNumberScorer(self.temp_dir, half_lives=(1, 10))
+            assert not scorer.load()
+            assert scorer.record_draw(make_record('01/01/2025', ['11112']))
+            assert scorer.load() and scorer.draws_seen == 1
+
+    def test_backdated_draw_triggers_rebuild(self):
+        """Test kỳ quay cũ hơn trạng thái (ngày bổ sung) làm dựng lại điểm số"""
+        records = [make_record('01/01/2025', ['11112']), make_record('03/01/2025', ['33333'])]
+        self.scorer.rebuild(records)
+        self.scorer.save()
+
+        # Ngày 02/01 được bổ sung vào dữ liệu sau khi đã chấm 03/01
+        records.append(make_record('02/01/2025', ['22245']))
+        with open(self.scorer.json_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+
+        scorer = OnlineNumberScorer(self.temp_dir, half_lives=(1, 10))
+        assert scorer.record_draw(records[-1])
+        assert scorer.draws_seen == 3
+        assert scorer.last_date == '03/01/2025'
+        assert scorer.counts['tail'][0, 45] == pytest.approx(0.5)
+
+    def test_rebuild_skips_malformed_dates(self):
+        """Test bản ghi có ngày sai định dạng bị bỏ qua thay vì làm dừng việc dựng điểm số"""
+        records = [
+            make_record('02/01/2025', ['11145']),
+            make_record('2025-01-03', ['22278']),
+            {'source': 'Test', 'results': {}},
+            make_record('01/01/2025', ['11112']),
+        ]
+        with open(self.scorer.json_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+
+        assert self.scorer.record_draw(make_record('02/01/2025', ['11145']))
+        assert self.scorer.draws_seen == 2
+        assert self.scorer.last_date == '02/01/2025'
+
+    def test_insights_report_top_scorers(self):
+        """Test insight hiển thị số điểm cao từ trạng thái đã lưu"""
+        scorer = OnlineNumberScorer(self.temp_dir)
+        scorer.update(make_record('01/01/2025', ['11145']))
+        scorer.save()
+
+        insights = LotteryAnalytics(self.temp_dir).get_insights({})
+        assert any('45' in insight and '01/01/2025' in insight for insight in insights)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho parser nguồn trên trang HTML mẫu viết tay (benchmarks/fixtures)
+"""
+
+import pytest
+import os
+import sys
+
+# Thêm benchmarks vào Python path (harness tự thêm src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from parsers import BACKENDS, build_parsers, load_fixtures, run_parser, run_benchmarks
+
+FIXTURES = load_fixtures(large_blocks=50)
+
+
+@pytest.fixture(scope='module')
+def parsers(tmp_path_factory):
+    """Parser của mọi nguồn; collector tạo thư mục data/ trong thư mục tạm, không phải cwd"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('parsers'))
+    try:
+        yield build_parsers()
+    finally:
+        os.chdir(previous)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('fixture', FIXTURES, ids=lambda f: f"{f['name']}-{f['size']}")
+def test_parser_extracts_fixture(parsers, fixture, backend):
+    """Test mỗi parser trích xuất đúng kết quả từ trang mẫu với mọi backend"""
+    result = run_parser(parsers[fixture['name']], fixture['html'], backend)
+    assert result is not None
+    assert result['date'] == '08/01/2025'
+    assert result['results'] == fixture['expected']
+
+
+def test_benchmark_report_rows(tmp_path, monkeypatch):
+    """Test harness trả về số liệu cho từng tổ hợp nguồn × cỡ × backend"""
+    monkeypatch.chdir(tmp_path)
+    rows = run_benchmarks(repeat=1, backends=('lxml',), sources=['xosodaiphat'], large_blocks=10)
+    assert [(row['size'], row['backend']) for row in rows] == [('small', 'lxml'), ('large', 'lxml')]
+    assert all(row['correct'] and row['peak_kib'] > 0 for row in rows)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
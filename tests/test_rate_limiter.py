@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module giới hạn tốc độ request
+"""
+
+import pytest
+import os
+import sys
+import random
+from datetime import datetime, timezone
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rate_limiter import Deadline, TokenBucket, HostRateLimiter, backoff_delay, parse_retry_after
+from lottery_collector import LotteryCollector
+from fakes import FakeResponse, FakeSession
+
+
+class FakeClock:
+    """Đồng hồ giả để điều khiển thời gian trong test"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test token bucket theo host"""
+
+    def test_burst_then_wait(self):
+        """Test dùng hết burst thì phải chờ theo tốc độ nạp"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=0.5, capacity=2, clock=clock)
+
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(2.0)
+
+        clock.now += 1
+        assert bucket.try_acquire() == pytest.approx(1.0)
+        clock.now += 1
+        assert bucket.try_acquire() == 0
+
+    def test_acquire_respects_deadline(self):
+        """Test không chờ lượt quá ngân sách thời gian"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=0.1, capacity=1, clock=clock)
+        assert bucket.acquire(deadline=Deadline(5, clock=clock))
+        assert not bucket.acquire(deadline=Deadline(5, clock=clock))
+
+    def test_hosts_have_separate_buckets(self):
+        """Test mỗi host có bucket riêng"""
+        limiter = HostRateLimiter(rate=0.5, burst=1, clock=FakeClock())
+        assert limiter.bucket('https://a.vn/x') is limiter.bucket('https://a.vn/y')
+        assert limiter.bucket('https://a.vn/x') is not limiter.bucket('https://b.vn/x')
+
+
+def test_backoff_delay_is_bounded():
+    """Test backoff có jitter nằm trong giới hạn hàm mũ"""
+    rng = random.Random(1)
+    for retry in range(8):
+        delay = backoff_delay(retry, base=1, cap=10, rng=rng)
+        assert 0 <= delay <= min(10, 2 ** retry)
+
+
+def test_parse_retry_after():
+    """Test đọc Retry-After dạng số giây và HTTP-date"""
+    now = datetime(2025, 1, 8, 12, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('Wed, 08 Jan 2025 12:00:30 GMT', now=now) == 30.0
+    assert parse_retry_after('không hợp lệ') is None
+    assert parse_retry_after(None) is None
+
+
+def test_collector_honours_retry_after_and_budget():
+    """Test collector chờ theo Retry-After và dừng retry khi hết ngân sách"""
+
+    collector = LotteryCollector()
+    collector.session = FakeSession(FakeResponse(503, headers={'Retry-After': '1'}))
+    collector.rate_limiter = HostRateLimiter(rate=100, burst=100)
+    waits = []
+    collector._pause = lambda seconds, cancel_event=None: waits.append(seconds) or False
+
+    source = {'name': 'Throttled', 'url': 'https://throttled.vn', 'parser': lambda soup, date: None}
+    assert collector._fetch_from_source(source, '08/01/2025', max_retries=3) is None
+    assert waits == [1.0, 1.0]
+    assert len(collector.session.calls) == 3
+
+    # Ngân sách thời gian nhỏ hơn Retry-After: dừng ngay sau lần thử đầu tiên
+    collector.session = FakeSession(FakeResponse(503, headers={'Retry-After': '1'}))
+    waits.clear()
+    assert collector._fetch_from_source(source, '08/01/2025', max_retries=3,
+                                        deadline=Deadline(0.5)) is None
+    assert len(collector.session.calls) == 1
+    assert waits == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
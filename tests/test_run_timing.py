@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module đo thời gian các giai đoạn thu thập
+"""
+
+import pytest
+import json
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from run_timing import BUCKET_BOUNDS, RunTimer, TimingHistogram
+from lottery_collector import LotteryCollector, write_timing
+from fakes import FakeResponse, FakeSession
+
+
+class FakeClock:
+    """Đồng hồ giả, chỉ tăng khi test gọi advance()"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestRunTimer:
+    """Test ghi span và tóm tắt lần chạy"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.timer = RunTimer(max_spans=3, clock=self.clock)
+
+    def test_spans_use_thread_context(self):
+        """Test span lấy nguồn/lần thử từ context và được tổng hợp theo giai đoạn"""
+        with self.timer.context('A', 1):
+            with self.timer.span('download', bytes=10):
+                self.clock.advance(0.5)
+            self.timer.set_attempt(2)
+            with self.timer.span('download'):
+                self.clock.advance(0.25)
+        self.timer.record_result('A', True)
+        self.timer.record('storage_write', 0.1, source='storage')
+
+        summary = self.timer.summary()
+        assert [(s['source'], s['attempt'], s['duration']) for s in summary['spans']] == [
+            ('A', 1, 0.5), ('A', 2, 0.25), ('storage', None, 0.1)
+        ]
+        assert summary['spans'][0]['bytes'] == 10
+        assert summary['sources']['A']['stages']['download'] == {'count': 2, 'total': 0.75, 'max': 0.5}
+        assert summary['sources']['A']['time_to_result'] == 0.75
+
+        # Vượt giới hạn span: vẫn cộng vào tổng theo giai đoạn
+        self.timer.record('parse', 0.2, source='A')
+        summary = self.timer.summary()
+        assert summary['dropped_spans'] == 1
+        assert summary['sources']['A']['stages']['parse']['count'] == 1
+
+
+    def test_cancelled_context_drops_records(self):
+        """Test context đã bị hủy không ghi span, lần thử hay kết quả"""
+        import threading
+        cancel_event = threading.Event()
+        with self.timer.context('A', 1, cancel_event=cancel_event):
+            self.timer.record_attempt('A')
+            self.timer.cancel(cancel_event)
+            with self.timer.span('download'):
+                self.clock.advance(0.5)
+            self.timer.record_attempt('A')
+            self.timer.record_result('A', True)
+        self.timer.record('storage_write', 0.1, source='storage')
+
+        summary = self.timer.summary()
+        assert [span['source'] for span in summary['spans']] == ['storage']
+        assert summary['sources']['A'] == {'attempts': 1, 'success': False,
+                                           'time_to_result': None, 'stages': {}}
+
+class TestTimingHistogram:
+    """Test histogram cộng dồn qua nhiều lần chạy"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.histogram_file = os.path.join(self.temp_dir, 'histogram.json')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_percentiles_accumulate_across_runs(self):
+        """Test p50/p95 tính trên bucket và lưu qua nhiều lần chạy"""
+        for durations in ([0.1] * 9, [0.1, 3.0]):
+            histogram = TimingHistogram(self.histogram_file)
+            histogram.add_run({
+                'spans': [{'source': 'A', 'stage': 'download', 'duration': d} for d in durations],
+                'sources': {'A': {'time_to_result': sum(durations)}, 'B': {'time_to_result': None}}
+            })
+            assert histogram.save()
+
+        histogram = TimingHistogram(self.histogram_file)
+        assert histogram.data['runs'] == 2
+        report = histogram.report()
+        assert report['A/download']['count'] == 11
+        assert report['A/download']['p50'] == min(b for b in BUCKET_BOUNDS if b >= 0.1)
+        assert report['A/download']['p95'] == min(b for b in BUCKET_BOUNDS if b >= 3.0)
+        assert report['A/time_to_result']['count'] == 2
+        assert 'B/time_to_result' not in report
+
+        with open(self.histogram_file, 'r', encoding='utf-8') as f:
+            assert 'report' in json.load(f)
+
+
+def test_collector_records_stage_spans(monkeypatch):
+    """Test collector ghi span kết nối, tải, parse, validate và chờ theo nguồn và lần thử"""
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        collector.http_cache = None
+        collector.source_stats = None
+        elapsed = timedelta(milliseconds=20)
+        collector.session = FakeSession(FakeResponse(500, elapsed=elapsed), FakeResponse(200, elapsed=elapsed))
+        collector._pause = lambda seconds, cancel_event=None: False
+        valid = {'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222']}
+        collector.sources = [{'name': 'A', 'url': 'https://a.vn',
+                              'parser': lambda soup, date: {'date': date, 'source': 'A', 'results': valid}}]
+
+        assert collector.fetch_lottery_data(datetime(2025, 1, 8), concurrent=False)['source'] == 'A'
+
+        summary = collector.timer.summary()
+        stages = [(s['stage'], s['attempt']) for s in summary['spans'] if s['source'] == 'A']
+        assert ('sleep', 1) in stages
+        for stage in ('connect', 'download', 'parse', 'validate'):
+            assert (stage, 2) in stages
+        assert next(s for s in summary['spans'] if s['stage'] == 'connect')['duration'] == 0.02
+        assert summary['sources']['A']['attempts'] == 2
+        assert summary['sources']['A']['time_to_result'] is not None
+
+        histogram_file = os.path.join(temp_dir, 'histogram.json')
+        monkeypatch.setenv('XSMB_TIMING_HISTOGRAM', histogram_file)
+        write_timing(collector.timer, os.path.join(temp_dir, 'run-timing.json'))
+        assert 'A/time_to_result' in TimingHistogram(histogram_file).report()
+        with open(os.path.join(temp_dir, 'run-timing.json'), 'r', encoding='utf-8') as f:
+            assert json.load(f)['sources']['A']['attempts'] == 2
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
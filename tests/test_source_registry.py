@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho registry nguồn thu thập
+"""
+
+import pytest
+import os
+import sys
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from source_registry import SOURCE_SPECS, SHORT_LABELS, SourceRegistry
+from lottery_collector import LotteryCollector, make_soup
+
+
+class TestSourceRegistry:
+    """Test biên dịch spec nguồn và parse khai báo"""
+
+    def test_classify_memoizes_labels(self):
+        """Test nhãn được nhận dạng một lần rồi tra cứu từ cache"""
+        compiled = SourceRegistry().get('xoso_com_vn')
+        assert compiled.classify('Giải đặc biệt') == 'Giải Đặc Biệt'
+        assert compiled.classify('Giải ba') == 'Giải Ba'
+        assert compiled.classify('Ngày') is None
+
+        # Kết quả đã cache không tính lại từ từ khóa
+        compiled.label_keywords = ()
+        assert compiled.classify('Giải ba') == 'Giải Ba'
+        assert set(compiled._label_cache) == {'Giải đặc biệt', 'Giải ba', 'Ngày'}
+
+    def test_new_source_needs_only_a_spec(self):
+        """Test thêm nguồn mới chỉ bằng spec, không cần viết parser"""
+        registry = SourceRegistry([{
+            'key': 'moi',
+            'name': 'Nguồn Mới',
+            'url': 'https://moi.vn/xsmb',
+            'table_selector': 'table.kq',
+            'labels': dict(SHORT_LABELS, **{'Đặc biệt': 'Giải Đặc Biệt'}),
+            'number_pattern': r'\d{2,5}',
+        }])
+        html = '''
+        <table class="other"><tr><td>G1</td><td>00000</td></tr></table>
+        <table class="kq">
+          <tr><td>Đặc biệt</td><td>12345</td></tr>
+          <tr><td>G1</td><td>67890</td></tr>
+          <tr><td>G7</td><td>12 - 34 - 56 - 78</td></tr>
+        </table>
+        '''
+        result = registry.get('moi').parse(make_soup(html), '08/01/2025', 'now')
+        assert result == {
+            'date': '08/01/2025',
+            'source': 'Nguồn Mới',
+            'results': {
+                'Giải Đặc Biệt': ['12345'],
+                'Giải Nhất': ['67890'],
+                'Giải Bảy': ['12', '34', '56', '78']
+            },
+            'collected_at': 'now'
+        }
+
+    def test_collector_sources_built_from_specs(self):
+        """Test collector dựng danh sách nguồn từ registry"""
+        collector = LotteryCollector()
+        assert [s['key'] for s in collector.sources] == [spec['key'] for spec in SOURCE_SPECS]
+        by_key = {s['key']: s for s in collector.sources}
+        assert by_key['xoso_com_vn']['tables_only']
+        assert not by_key['vtcnews']['tables_only']
+        assert 'date_url' not in by_key['xosoyenbai']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
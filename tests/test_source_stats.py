@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test suite cho module thống kê nguồn thu thập
+"""
+
+import pytest
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+# Thêm src vào Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from source_stats import SourceStats
+from lottery_collector import LotteryCollector
+
+
+class FakeClock:
+    """Đồng hồ giả để điều khiển thời gian trong test"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSourceStats:
+    """Test thống kê EWMA và circuit breaker"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.stats = SourceStats(os.path.join(self.temp_dir, 'stats.json'), alpha=0.5,
+                                 failure_threshold=2, cooldown_seconds=100, clock=self.clock)
+        self.sources = [{'name': 'A'}, {'name': 'B'}, {'name': 'C'}]
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_orders_by_expected_time_to_result(self):
+        """Test nguồn nhanh và ổn định được xếp trước"""
+        self.stats.record('A', True, 8.0)
+        self.stats.record('B', True, 1.0)
+        self.stats.record('C', True, 1.0)
+        self.stats.record('C', False, 30.0)
+
+        # C: độ trễ 1s nhưng tỷ lệ thành công 0.5 -> điểm 2; nguồn mới mặc định 5
+        assert self.stats.score('C') == pytest.approx(2.0)
+        assert [s['name'] for s in self.stats.order(self.sources)] == ['B', 'C', 'A']
+        assert [s['name'] for s in self.stats.order(self.sources + [{'name': 'D'}])] == ['B', 'C', 'D', 'A']
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        """Test ngắt mạch sau nhiều lần thất bại và cho thử lại sau thời gian nghỉ"""
+        self.stats.record('A', False, 1.0)
+        assert self.stats.is_available('A')
+        self.stats.record('A', False, 1.0)
+        assert not self.stats.is_available('A')
+        assert 'A' not in [s['name'] for s in self.stats.order(self.sources)]
+
+        self.clock.now += 101
+        assert self.stats.is_available('A')
+
+        # Thất bại tiếp khi thử lại: thời gian nghỉ tăng gấp đôi
+        self.stats.record('A', False, 1.0)
+        self.clock.now += 150
+        assert not self.stats.is_available('A')
+
+        self.clock.now += 100
+        self.stats.record('A', True, 1.0)
+        assert self.stats.is_available('A')
+        assert self.stats.sources['A']['consecutive_failures'] == 0
+
+    def test_all_open_still_tries_everything(self):
+        """Test vẫn thử mọi nguồn nếu tất cả đều đang ngắt mạch"""
+        for source in self.sources:
+            for _ in range(2):
+                self.stats.record(source['name'], False, 1.0)
+        assert len(self.stats.order(self.sources)) == 3
+
+    def test_persistence(self):
+        """Test lưu và tải lại thống kê"""
+        self.stats.record('A', True, 2.0)
+        assert self.stats.save()
+        reloaded = SourceStats(self.stats.stats_file, clock=self.clock)
+        assert reloaded.sources['A']['ewma_latency'] == 2.0
+        assert reloaded.summary()[0]['source'] == 'A'
+
+
+def test_collector_records_source_outcomes():
+    """Test collector ghi nhận kết quả từng nguồn và bỏ qua nguồn bị ngắt mạch"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        collector = LotteryCollector()
+        collector.http_cache = None
+        collector.source_stats = SourceStats(os.path.join(temp_dir, 'stats.json'), failure_threshold=1)
+        collector._download = lambda url, headers, timeout: (200, b'<html></html>', url)
+        collector._pause = lambda seconds, cancel_event=None: False
+
+        valid = {'Giải Đặc Biệt': ['12345'], 'Giải Nhất': ['67890'], 'Giải Nhì': ['11111', '22222']}
+        collector.sources = [
+            {'name': 'Broken', 'url': 'https://broken.vn', 'parser': lambda soup, date: None},
+            {'name': 'Good', 'url': 'https://good.vn',
+             'parser': lambda soup, date: {'date': date, 'source': 'Good', 'results': valid}},
+        ]
+
+        result = collector.fetch_lottery_data(datetime(2025, 1, 8), max_retries=1, concurrent=False)
+        assert result['source'] == 'Good'
+        assert collector.source_stats.stats_file.exists()
+        assert not collector.source_stats.is_available('Broken')
+        assert [s['name'] for s in collector._ordered_sources()] == ['Good']
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])